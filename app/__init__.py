@@ -1,28 +1,22 @@
 # app/__init__.py
-import os
 import json
 from decimal import Decimal
-from flask import Flask, session
+from flask import Flask, g
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
 from flask_login import LoginManager
-from flask_admin import Admin
-from flask_babel import Babel
-from flask_migrate import Migrate
 from dotenv import load_dotenv
-import mercadopago
+from app.banco import SessaoComReplica
 
 # Carrega as variáveis de ambiente
 load_dotenv()
 
-# Inicialização das extensões (sem app)
-db = SQLAlchemy()
+# Inicialização das extensões (sem app). O Flask-Admin, o Flask-Babel e o
+# Flask-Migrate (com o Alembic) são importados em create_app, só quando o
+# modo da aplicação precisa deles.
+db = SQLAlchemy(session_options={'class_': SessaoComReplica})
 bcrypt = Bcrypt()
 login_manager = LoginManager()
-babel = Babel()
-migrate = Migrate()
-from app.admin_views import SecureAdminIndexView
-admin = Admin(name='Painel da Loja', template_mode='bootstrap4', index_view=SecureAdminIndexView(endpoint='admin_home'))
 
 class CustomJSONEncoder(json.JSONEncoder):
     def default(self, o):
@@ -30,10 +24,52 @@ class CustomJSONEncoder(json.JSONEncoder):
             return float(o)
         return super().default(o)
 
+def _em_linha_de_comandos():
+    # O comando 'flask' cria a aplicação dentro do contexto do click
+    import click
+    return click.get_current_context(silent=True) is not None
+
+
+def _registar_admin(app):
+    from flask_admin import Admin
+    from flask_babel import Babel
+    from app import models
+    from app.admin_views import (SecureAdminIndexView, SecureModelView, ProdutoView, UserView, PedidoView,
+                                 ItemPedidoView, MetricasView, RelatoriosView)
+
+    Babel(app)
+    admin = Admin(app, name='Painel da Loja', template_mode='bootstrap4',
+                  index_view=SecureAdminIndexView(endpoint='admin_home'))
+    admin.add_view(ProdutoView(models.Produto, db.session, name='Produtos'))
+    admin.add_view(UserView(models.User, db.session, name='Utilizadores'))
+    admin.add_view(PedidoView(models.Pedido, db.session, name='Pedidos'))
+    admin.add_view(ItemPedidoView(models.ItemPedido, db.session, name='Itens dos Pedidos'))
+    admin.add_view(SecureModelView(models.HistoricoStatusPedido, db.session, name='Histórico de Estados'))
+    admin.add_view(MetricasView(name='Métricas', endpoint='metricas'))
+    admin.add_view(RelatoriosView(name='Relatórios', endpoint='relatorios'))
+
+
 # Função de Criação da Aplicação (Application Factory)
-def create_app():
+def create_app(modo=None):
+    """Cria a aplicação no modo `modo` ('web' ou 'cli'; por omissão MODO_APP).
+
+    O modo 'cli' carrega só o banco, os modelos, os caches e os comandos,
+    sem rotas, painel de admin nem instrumentação.
+    """
     app = Flask(__name__, instance_relative_config=True)
     app.config.from_object('app.config.Config')
+    modo = modo or app.config['MODO_APP']
+    if modo not in ('web', 'cli'):
+        raise ValueError(f"MODO_APP desconhecido: {modo}")
+
+    # Opções do engine conforme o banco (WAL no SQLite, pool no Postgres) e
+    # bind da réplica de leitura, se configurada
+    from app.config import aplicar_perfil_banco
+    aplicar_perfil_banco(app.config)
+
+    # Workers gevent do Gunicorn: psycopg2 cooperativo (ver app/cooperativo.py)
+    from app.cooperativo import preparar_modo_cooperativo, criar_executor
+    preparar_modo_cooperativo(app)
     
     app.json_encoder = CustomJSONEncoder
 
@@ -41,43 +77,117 @@ def create_app():
     db.init_app(app)
     bcrypt.init_app(app)
     login_manager.init_app(app)
-    babel.init_app(app)
-    migrate.init_app(app, db)
-    admin.init_app(app)
+    # 'flask db ...' (o Gunicorn não precisa do Alembic)
+    if modo == 'cli' or _em_linha_de_comandos():
+        from flask_migrate import Migrate
+        from app.pesquisa import incluir_na_migracao
+        Migrate(app, db, include_object=incluir_na_migracao)
 
     login_manager.login_view = 'main.login' # <- Alterado para apontar para o blueprint
     login_manager.login_message = 'Por favor, faça login para aceder a esta página.'
     login_manager.login_message_category = 'info'
 
     with app.app_context():
+        from app.banco import ligar_pragmas_sqlite
+        for engine in db.engines.values():
+            ligar_pragmas_sqlite(engine, app.config)
+
         from app import models
-        from app.admin_views import SecureModelView
 
-        # Regista o Blueprint das rotas
-        from .routes import main_bp
-        app.register_blueprint(main_bp)
+        # Regista os comandos de linha de comando (flask <comando>)
+        from .commands import register_commands
+        register_commands(app)
+
+        # Caches em memória (por processo): produtos para o catálogo e o
+        # carrinho, identidades para o user_loader e HTML renderizado da
+        # página inicial
+        from app.cache import CacheProdutos, CacheUtilizadores, CachePaginas, ligar_invalidacao_catalogo
+        app.cache_produtos = CacheProdutos(
+            ttl=app.config['PRODUTO_CACHE_TTL'],
+            capacidade=app.config['PRODUTO_CACHE_CAPACIDADE'],
+        )
+        app.cache_utilizadores = CacheUtilizadores(
+            ttl=app.config['UTILIZADOR_CACHE_TTL'],
+            capacidade=app.config['UTILIZADOR_CACHE_CAPACIDADE'],
+        )
+        app.cache_paginas = CachePaginas(
+            ttl=app.config['PAGINA_CACHE_TTL'],
+            capacidade=app.config['PAGINA_CACHE_CAPACIDADE'],
+        )
+        ligar_invalidacao_catalogo()
+
+        # Vocabulário da pesquisa de produtos (trie para completar e corrigir
+        # palavras; o índice em si fica no banco, ver app/pesquisa.py)
+        from app.pesquisa import IndicePesquisa, ligar_atualizacao_vocabulario
+        app.pesquisa = IndicePesquisa(app, ttl=app.config['PESQUISA_VOCABULARIO_TTL'])
+        ligar_atualizacao_vocabulario()
 
         @login_manager.user_loader
         def load_user(user_id):
-            return models.User.query.get(int(user_id))
+            user = app.cache_utilizadores.obter(int(user_id))
+            if user is None:
+                return app.cache_utilizadores.carregar(int(user_id))
+            g.consultas_poupadas = g.get('consultas_poupadas', 0) + 1
+            return user
+
+        if app.debug:
+            # Em modo debug, mostra quantas consultas o cache poupou neste pedido
+            @app.after_request
+            def mostrar_consultas_poupadas(response):
+                response.headers['X-Consultas-Poupadas'] = str(g.get('consultas_poupadas', 0))
+                return response
+
+        # SDK do Mercado Pago (com pool de ligações, timeouts e circuit
+        # breaker, ver app/mercadopago_client.py), criado na primeira chamada
+        from app.sdk_preguicoso import SdkPreguicoso
+        app.sdk = SdkPreguicoso(app.config)
 
-        # Configuração do Painel de Admin
-        admin.add_view(SecureModelView(models.Produto, db.session, name='Produtos'))
-        admin.add_view(SecureModelView(models.User, db.session, name='Utilizadores'))
-        admin.add_view(SecureModelView(models.Pedido, db.session, name='Pedidos'))
-        admin.add_view(SecureModelView(models.ItemPedido, db.session, name='Itens dos Pedidos'))
+        # Instrumentação por pedido: latência, consultas SQL e tempo no SDK por
+        # endpoint (painel em /admin/metricas e texto do Prometheus em /metrics)
+        if modo == 'web':
+            from app.instrumentacao import init_instrumentacao, registar_tempo_sdk
+            init_instrumentacao(app)
+            app.sdk.ao_criar.append(lambda sdk: sdk.http_client.ouvintes.append(registar_tempo_sdk))
 
-        # Anexa o SDK do Mercado Pago ao app
-        ACCESS_TOKEN = os.getenv("MP_ACCESS_TOKEN")
-        if not ACCESS_TOKEN:
-            raise ValueError("A variável de ambiente MP_ACCESS_TOKEN não foi configurada.")
-        app.sdk = mercadopago.SDK(ACCESS_TOKEN)
+        # Serviço de senhas (bcrypt num pool limitado de threads reais)
+        from app.senhas import ServicoSenhas
+        app.senhas = ServicoSenhas(
+            rounds=app.config['BCRYPT_LOG_ROUNDS'],
+            timeout=app.config['SENHAS_TIMEOUT'],
+            executor=criar_executor(app.config['SENHAS_WORKERS'], 'senhas'),
+            antecipar_hash_ficticio=modo == 'web',
+        )
+
+        # Armazém dos carrinhos (em memória ou no banco, ver CART_BACKEND)
+        from app.carrinho import criar_armazem, contar_itens_carrinho
+        app.carrinho = criar_armazem(app.config)
 
         @app.context_processor
         def inject_cart_count():
-            count = 0
-            if 'cart' in session:
-                count = sum(session['cart'].values())
-            return dict(cart_item_count=count)
+            # Páginas guardadas em cache não levam a contagem: o badge é
+            # preenchido no browser a partir de main.contagem_carrinho
+            if g.get('badge_assincrono'):
+                return dict(cart_item_count=None)
+            return dict(cart_item_count=contar_itens_carrinho())
+
+        # Miniaturas das imagens dos produtos (geradas com 'flask gerar-miniaturas'
+        # ou ao guardar o produto no admin, ver app/imagens.py)
+        from flask import url_for
+        from app.imagens import ManifestoImagens
+        app.imagens = ManifestoImagens(app.static_folder)
+
+        @app.template_global()
+        def imagem_produto(imagem):
+            return app.imagens.atributos_img(
+                imagem,
+                url_variante=lambda ficheiro: url_for('main.imagem_variante', ficheiro=ficheiro),
+                url_static=lambda caminho: url_for('static', filename=caminho),
+            )
+
+        # Rotas da loja e painel de admin (não fazem falta aos comandos)
+        if modo == 'web':
+            from .routes import main_bp
+            app.register_blueprint(main_bp)
+            _registar_admin(app)
 
         return app
\ No newline at end of file
@@ -1,8 +1,11 @@
 # app/admin_views.py
-from flask import redirect, url_for, request
-from flask_admin import AdminIndexView
-from flask_admin.contrib.sqla import ModelView
+from flask import flash, g, redirect, url_for, request, current_app
+from flask_admin import AdminIndexView, BaseView, expose
+from flask_admin.actions import action
+from flask_admin.contrib.sqla import ModelView, filters as sqla_filters
 from flask_login import current_user
+from sqlalchemy import func, text
+from sqlalchemy.orm import joinedload
 
 # Classe para proteger a página principal do admin (/admin)
 class SecureAdminIndexView(AdminIndexView):
@@ -50,4 +53,255 @@ class SecureModelView(ModelView):
     # Esta função é chamada se a verificação acima falhar
     def inaccessible_callback(self, name, **kwargs):
         # CORRIGIDO AQUI
-        return redirect(url_for('main.login', next=request.url))
\ No newline at end of file
+        return redirect(url_for('main.login', next=request.url))
+
+    # --- Listas grandes (configuração por modelo, ver PedidoView) ---
+    # Com paginacao_keyset, a lista na ordem padrão (chave primária) pede a
+    # página seguinte com "WHERE id < último id visto" em vez de OFFSET: o
+    # link "seguinte" leva esse id no URL (?depois=<id>), por isso a página
+    # continua onde a anterior acabou mesmo que entrem pedidos novos, e não
+    # depende do worker. Os outros saltos de página usam OFFSET.
+    paginacao_keyset = False
+    ARGUMENTO_KEYSET = 'depois'
+    # Com contagem_exata_ate = N, tabelas com mais de N linhas (estimadas)
+    # mostram uma contagem aproximada; com filtros ou pesquisa conta-se no
+    # máximo até N e, acima disso, o Flask-Admin mostra o paginador simples.
+    contagem_exata_ate = None
+
+    # Relações (many-to-one) mostradas em cada linha, carregadas com JOIN na
+    # mesma consulta da lista em vez de uma consulta por linha
+    carregar_relacoes = ()
+
+    def get_query(self):
+        query = super().get_query()
+        for relacao in self.carregar_relacoes:
+            query = query.options(joinedload(getattr(self.model, relacao)))
+        return query
+
+    # Colunas cujo filtro só oferece "igual a" / "em lista", que usam o índice
+    # (o "contém" do Flask-Admin vira LIKE '%...%' e percorre a tabela toda);
+    # opcoes_filtros dá uma lista fechada de valores para o filtro
+    filtros_por_igualdade = ()
+    opcoes_filtros = {}
+
+    def scaffold_filters(self, name):
+        filtros = super().scaffold_filters(name)
+        if filtros and name in self.filtros_por_igualdade:
+            filtros = [f for f in filtros if isinstance(f, (sqla_filters.FilterEqual, sqla_filters.FilterInList))]
+        if filtros and name in self.opcoes_filtros:
+            for filtro in filtros:
+                filtro.options = [(valor, valor) for valor in self.opcoes_filtros[name]]
+        return filtros
+
+    def _lista_grande(self):
+        return self.paginacao_keyset or self.contagem_exata_ate is not None
+
+    def get_count_query(self):
+        # A contagem das listas grandes é feita em get_list
+        if self._lista_grande():
+            return None
+        return super().get_count_query()
+
+    def _estimar_linhas(self):
+        tabela = self.model.__table__
+        if self.session.get_bind().dialect.name == 'postgresql':
+            estimativa = self.session.execute(
+                text('SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:tabela AS regclass)'),
+                {'tabela': tabela.name},
+            ).scalar()
+            if estimativa is not None and estimativa >= 0:
+                return estimativa
+        # Sem estatísticas: o maior id (lido do índice da chave primária)
+        return self.session.query(func.max(self._chave_primaria())).scalar() or 0
+
+    def _chave_primaria(self):
+        return getattr(self.model, self._primary_key)
+
+    def _contar(self, query, filtrada):
+        limite = self.contagem_exata_ate
+        if limite is None:
+            return query.order_by(None).count()
+        if not filtrada:
+            estimativa = self._estimar_linhas()
+            if estimativa > limite:
+                return estimativa
+        ids = query.order_by(None).with_entities(self._chave_primaria()).limit(limite + 1).subquery()
+        contagem = self.session.query(func.count()).select_from(ids).scalar()
+        return contagem if contagem <= limite else None
+
+    def get_list(self, page, sort_column, sort_desc, search, filters, execute=True, page_size=None):
+        if not self._lista_grande():
+            return super().get_list(page, sort_column, sort_desc, search, filters, execute, page_size)
+
+        # Filtros, pesquisa, ordenação e eager loading do Flask-Admin, sem paginação
+        _, query = super().get_list(None, sort_column, sort_desc, search, filters, execute=False, page_size=0)
+        count = self._contar(query, filtrada=bool(search or filters))
+
+        page_size = self.page_size if page_size is None else page_size
+        page = page or 0
+        keyset = self.paginacao_keyset and sort_column is None and page_size
+        if keyset:
+            fronteira = request.args.get(self.ARGUMENTO_KEYSET, type=int) if page else None
+            if fronteira is not None:
+                pk = self._chave_primaria()
+                query = query.filter(pk < fronteira if self._ordem_descendente() else pk > fronteira)
+            elif page:
+                query = query.offset(page * page_size)
+            query = query.limit(page_size)
+        else:
+            query = self._apply_pagination(query, page, page_size)
+
+        if not execute:
+            return count, query
+        linhas = query.all()
+        if keyset and linhas:
+            # Lido por _get_list_url ao gerar o link da página seguinte
+            g.fronteira_keyset = (page, self.get_pk_value(linhas[-1]))
+        return count, linhas
+
+    def _get_list_url(self, view_args):
+        # A fronteira recebida só vale para a mesma página, na mesma ordem e
+        # tamanho (ex.: regresso depois de editar), e a do último id mostrado
+        # só para a página seguinte; os outros links ficam sem fronteira
+        extra_args = dict(view_args.extra_args)
+        recebida = extra_args.pop(self.ARGUMENTO_KEYSET, None)
+        fronteira = g.get('fronteira_keyset')
+        if fronteira is not None and view_args.page == fronteira[0] + 1:
+            extra_args[self.ARGUMENTO_KEYSET] = fronteira[1]
+        elif recebida is not None and fronteira is not None and view_args.page == fronteira[0] \
+                and view_args.sort is None and view_args.page_size == request.args.get('page_size', 0, type=int):
+            extra_args[self.ARGUMENTO_KEYSET] = recebida
+        return super()._get_list_url(view_args.clone(extra_args=extra_args))
+
+    def _ordem_descendente(self):
+        ordem = self.column_default_sort
+        return isinstance(ordem, tuple) and bool(ordem[1])
+
+
+# Pedidos e itens: listas que crescem sem limite. As relações mostradas em
+# cada linha vêm na mesma consulta (carregar_relacoes) e os filtros usam
+# colunas indexadas. O estado não se edita no formulário: muda pelas ações da
+# lista, que passam pela máquina de estados (transitar_status), para ficarem
+# registados o histórico, o estoque, os relatórios e as notificações.
+class PedidoView(SecureModelView):
+    column_list = ('id', 'user', 'data_pedido', 'status', 'total', 'preference_id')
+    form_excluded_columns = ('status',)
+    carregar_relacoes = ('user',)
+    column_default_sort = ('id', True)
+    column_filters = ('status', 'data_pedido', 'user_id')
+    filtros_por_igualdade = ('status', 'user_id')
+    opcoes_filtros = {'status': ('Pendente', 'Pago', 'Cancelado', 'Expirado', 'Reembolsado')}
+    paginacao_keyset = True
+    contagem_exata_ate = 10000
+    can_set_page_size = True
+
+    def _transitar(self, ids, status_novo):
+        from app.pedidos import transitar_status
+        from app.notificacoes import central_pagamentos
+
+        alterados = transitar_status([int(i) for i in ids], status_novo, 'admin')
+        self.session.commit()
+        for pedido_id in alterados:
+            central_pagamentos.publicar(pedido_id, status_novo)
+        ignorados = len(ids) - len(alterados)
+        flash(f"{len(alterados)} pedido(s) passaram a '{status_novo}'"
+              + (f"; {ignorados} ignorado(s) por não estarem num estado que o permita." if ignorados else "."),
+              'success' if not ignorados else 'warning')
+
+    @action('marcar_pago', "Marcar como 'Pago'", "Marcar os pedidos selecionados como pagos?")
+    def action_marcar_pago(self, ids):
+        self._transitar(ids, 'Pago')
+
+    @action('cancelar', "Cancelar", "Cancelar os pedidos selecionados?")
+    def action_cancelar(self, ids):
+        self._transitar(ids, 'Cancelado')
+
+    @action('expirar', "Marcar como 'Expirado'", "Expirar os pedidos selecionados?")
+    def action_expirar(self, ids):
+        self._transitar(ids, 'Expirado')
+
+    @action('reembolsar', "Marcar como 'Reembolsado'", "Marcar os pedidos selecionados como reembolsados?")
+    def action_reembolsar(self, ids):
+        self._transitar(ids, 'Reembolsado')
+
+
+class ItemPedidoView(SecureModelView):
+    column_list = ('id', 'pedido_id', 'produto', 'quantidade', 'preco_unitario')
+    carregar_relacoes = ('produto',)
+    column_default_sort = ('id', True)
+    column_filters = ('pedido_id', 'produto_id')
+    filtros_por_igualdade = ('pedido_id', 'produto_id')
+    paginacao_keyset = True
+    contagem_exata_ate = 10000
+
+
+# Produtos: os caches de produtos e de páginas são invalidados depois do
+# commit por ligar_invalidacao_catalogo (app/cache.py); aqui só geramos as
+# miniaturas da imagem (as que já existem são reaproveitadas).
+class ProdutoView(SecureModelView):
+    def after_model_change(self, form, model, is_created):
+        if model.imagem:
+            current_app.imagens.atualizar([model.imagem])
+
+
+# Utilizadores: as edições no painel invalidam o cache de identidades usado
+# pelo user_loader, para que mudanças como is_admin valham no pedido seguinte.
+class UserView(SecureModelView):
+    def after_model_change(self, form, model, is_created):
+        current_app.cache_utilizadores.invalidar(model.id)
+
+    def after_model_delete(self, model):
+        current_app.cache_utilizadores.invalidar(model.id)
+
+
+# Relatórios de vendas: lê só as tabelas de agregados de app/relatorios.py,
+# por isso o custo depende do número de dias mostrados e não do de pedidos.
+# Mostra também os produtos vendidos a mais (estoque negativo, app/estoque.py).
+class RelatoriosView(BaseView):
+    PERIODOS = (7, 30, 90, 365)
+
+    @expose('/')
+    def index(self):
+        from app.relatorios import resumo_vendas
+        from app.estoque import produtos_vendidos_a_mais
+
+        dias = request.args.get('dias', 30, type=int)
+        if dias not in self.PERIODOS:
+            dias = 30
+        return self.render('admin/relatorios.html', dias=dias, periodos=self.PERIODOS,
+                           vendidos_a_mais=produtos_vendidos_a_mais(), **resumo_vendas(dias))
+
+    def is_accessible(self):
+        return current_user.is_authenticated and current_user.is_admin
+
+    def inaccessible_callback(self, name, **kwargs):
+        return redirect(url_for('main.login', next=request.url))
+
+
+# Métricas por endpoint recolhidas por app/instrumentacao.py (por processo)
+class MetricasView(BaseView):
+    @expose('/')
+    def index(self):
+        metricas = current_app.extensions['metricas']
+        endpoints = sorted(metricas.endpoints().items(), key=lambda item: item[1]['duracao_ms'], reverse=True)
+        sdk = current_app.sdk
+        cliente_mp = getattr(sdk, 'http_client', None) if getattr(sdk, 'criado', True) else None
+        return self.render(
+            'admin/metricas.html',
+            endpoints=endpoints,
+            consultas_lentas=list(reversed(metricas.consultas_lentas)),
+            limite_sql_lento_ms=metricas.limite_sql_lento_ms,
+            perfis=list(metricas.perfis),
+            mercadopago=cliente_mp.estatisticas() if hasattr(cliente_mp, 'estatisticas') else None,
+            caches={
+                'Produtos': current_app.cache_produtos.estatisticas(),
+                'Utilizadores': current_app.cache_utilizadores.estatisticas(),
+                'Páginas': current_app.cache_paginas.estatisticas(),
+            },
+        )
+
+    def is_accessible(self):
+        return current_user.is_authenticated and current_user.is_admin
+
+    def inaccessible_callback(self, name, **kwargs):
+        return redirect(url_for('main.login', next=request.url))
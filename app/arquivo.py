@@ -0,0 +1,105 @@
+# app/arquivo.py
+# Manutenção das tabelas de pedidos ('flask limpar-pedidos', para correr
+# periodicamente, ex.: de hora a hora no cron):
+#   - pedidos 'Pendente' abandonados há mais de PEDIDO_PENDENTE_VALIDADE
+#     segundos, ou com reservas de estoque fora do prazo, passam a 'Expirado'
+#     (pela máquina de estados de app/pedidos.py, que liberta as reservas);
+#   - pedidos concluídos há mais de PEDIDO_RETENCAO_DIAS dias são movidos, com
+#     os itens e o histórico de estados, para as tabelas *_arquivado.
+# Tudo em lotes pequenos, cada um na sua transação, para não segurar locks
+# nem encher o log de transações de uma vez.
+import datetime
+import time
+from sqlalchemy import delete, insert, or_, select
+from app import db
+from app.models import (Pedido, ItemPedido, HistoricoStatusPedido,
+                        PedidoArquivado, ItemPedidoArquivado, HistoricoStatusPedidoArquivado)
+from app.pedidos import transitar_status
+from app.estoque import reservas_expiradas
+from app.relatorios import contar_arquivados
+
+# Estados finais: um pedido nestes estados pode ser arquivado. Um reembolso
+# de um pedido 'Pago' já arquivado deixa de ser aplicado pela loja.
+STATUS_CONCLUIDOS = ('Pago', 'Cancelado', 'Expirado', 'Reembolsado')
+
+# (tabela ativa, tabela de arquivo, coluna com o id do pedido), pela ordem em
+# que são copiadas; apagam-se pela ordem inversa por causa das chaves estrangeiras
+_TABELAS = (
+    (Pedido, PedidoArquivado, Pedido.id),
+    (ItemPedido, ItemPedidoArquivado, ItemPedido.pedido_id),
+    (HistoricoStatusPedido, HistoricoStatusPedidoArquivado, HistoricoStatusPedido.pedido_id),
+)
+
+
+def _em_lotes(proximo_lote, processar, tamanho_lote, max_lotes, pausa):
+    total = 0
+    for _ in range(max_lotes):
+        ids = proximo_lote(tamanho_lote)
+        if not ids:
+            break
+        total += processar(ids)
+        db.session.commit()
+        if len(ids) < tamanho_lote:
+            break
+        time.sleep(pausa)  # Dá vez às transações da loja entre lotes
+    return total
+
+
+def expirar_pendentes(validade, tamanho_lote=500, max_lotes=1000, pausa=0.0):
+    """Passa a 'Expirado' os pedidos 'Pendente' criados há mais de `validade`
+    segundos ou cuja reserva de estoque já passou do prazo.
+
+    Devolve quantos pedidos expiraram.
+    """
+    agora = datetime.datetime.utcnow()
+    expirado = or_(Pedido.data_pedido < agora - datetime.timedelta(seconds=validade), reservas_expiradas(agora))
+
+    def proximo_lote(n):
+        return db.session.scalars(
+            select(Pedido.id)
+            .where(Pedido.status == 'Pendente', expirado)
+            .order_by(Pedido.data_pedido)
+            .limit(n)
+        ).all()
+
+    def processar(ids):
+        # Um pedido pago entretanto já não está 'Pendente' e fica como está
+        return len(transitar_status(ids, 'Expirado', 'expiracao', expirado))
+
+    return _em_lotes(proximo_lote, processar, tamanho_lote, max_lotes, pausa)
+
+
+def arquivar_concluidos(retencao_dias, tamanho_lote=500, max_lotes=1000, pausa=0.0):
+    """Move para o arquivo os pedidos concluídos com mais de `retencao_dias` dias.
+
+    Cada lote copia pedidos, itens e histórico com INSERT ... SELECT e apaga-os
+    das tabelas ativas na mesma transação. Devolve quantos pedidos foram movidos.
+    """
+    limite = datetime.datetime.utcnow() - datetime.timedelta(days=retencao_dias)
+    # Os ids são mantidos no arquivo: as tabelas ativas usam AUTOINCREMENT no
+    # SQLite (sequências no Postgres), por isso nenhum volta a ser atribuído
+    condicoes = (
+        Pedido.status.in_(STATUS_CONCLUIDOS),
+        Pedido.data_pedido < limite,
+    )
+
+    def proximo_lote(n):
+        # No Postgres os pedidos do lote ficam bloqueados até ao commit, para
+        # uma transição concorrente não os alterar entre a cópia e o DELETE
+        return db.session.scalars(
+            select(Pedido.id).where(*condicoes).order_by(Pedido.id).limit(n)
+            .with_for_update(skip_locked=True)
+        ).all()
+
+    def processar(ids):
+        contar_arquivados(ids)
+        for ativa, arquivo, coluna in _TABELAS:
+            colunas = [c.name for c in ativa.__table__.columns]
+            db.session.execute(
+                insert(arquivo).from_select(colunas, select(*ativa.__table__.columns).where(coluna.in_(ids)))
+            )
+        for ativa, _, coluna in reversed(_TABELAS):
+            db.session.execute(delete(ativa).where(coluna.in_(ids)), execution_options={'synchronize_session': False})
+        return len(ids)
+
+    return _em_lotes(proximo_lote, processar, tamanho_lote, max_lotes, pausa)
@@ -0,0 +1,60 @@
+# app/banco.py
+import functools
+import sqlite3
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql.dml import UpdateBase
+
+BIND_REPLICA = 'replica'
+
+
+class SessaoComReplica(Session):
+    """Sessão que manda as leituras para a réplica quando o pedido foi marcado
+    com @somente_leitura.
+
+    Escritas (flush, insert/update/delete) vão sempre para o banco principal,
+    por isso uma rota marcada que precise de escrever continua a funcionar.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and self.info.get('usar_replica') and not self._flushing
+                and not isinstance(clause, UpdateBase)):
+            replica = self._db.engines.get(BIND_REPLICA)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def somente_leitura(view):
+    """Marca uma rota como só de leitura: as consultas dela usam a réplica.
+
+    A réplica pode estar ligeiramente atrasada em relação ao banco principal;
+    use-a apenas em páginas onde isso é aceitável.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        from app import db
+        db.session.info['usar_replica'] = True
+        try:
+            return view(*args, **kwargs)
+        finally:
+            db.session.info.pop('usar_replica', None)
+    return wrapper
+
+
+def ligar_pragmas_sqlite(engine, config):
+    """Aplica journal_mode, busy_timeout e synchronous a cada ligação SQLite."""
+    if engine.dialect.name != 'sqlite':
+        return
+    em_memoria = engine.url.database in (None, '', ':memory:')
+
+    @event.listens_for(engine, 'connect')
+    def configurar_ligacao(dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        if not em_memoria:
+            cursor.execute(f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}")
+        cursor.execute(f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}")
+        cursor.execute(f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}")
+        cursor.close()
@@ -0,0 +1,221 @@
+# app/cache.py
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, has_app_context
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.models import Produto, User
+
+
+class CacheTTL:
+    """Cache LRU em memória (por processo) com tempo de vida por entrada.
+
+    Guarda contadores de acertos e falhas para se poder medir o ganho.
+    """
+
+    def __init__(self, ttl=300, capacidade=10000):
+        self.ttl = ttl
+        self.capacidade = capacidade
+        self.acertos = 0
+        self.falhas = 0
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        agora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None or entrada[0] <= agora:
+                if entrada is not None:
+                    del self._entradas[chave]
+                self.falhas += 1
+                return None
+            self._entradas.move_to_end(chave)
+            self.acertos += 1
+            return entrada[1]
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._entradas[chave] = (time.monotonic() + self.ttl, valor)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.capacidade:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self, chave):
+        with self._lock:
+            self._entradas.pop(chave, None)
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def estatisticas(self):
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                'entradas': len(self._entradas),
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'taxa_acerto': self.acertos / consultas if consultas else 0.0,
+            }
+
+
+class ProdutoSnapshot:
+    """Cópia imutável e compacta dos dados de um Produto usados nas páginas."""
+
+    __slots__ = ('id', 'nome', 'preco', 'imagem')
+
+    def __init__(self, id, nome, preco, imagem):
+        object.__setattr__(self, 'id', id)
+        object.__setattr__(self, 'nome', nome)
+        object.__setattr__(self, 'preco', preco)
+        object.__setattr__(self, 'imagem', imagem)
+
+    def __setattr__(self, nome, valor):
+        raise AttributeError('ProdutoSnapshot é imutável')
+
+    def __repr__(self):
+        return f'<ProdutoSnapshot {self.nome}>'
+
+
+class CacheProdutos(CacheTTL):
+    """Read-through cache de produtos por id.
+
+    Os commits que alteram produtos invalidam as entradas afetadas (ver
+    ligar_invalidacao_catalogo); noutros processos a entrada expira ao fim do TTL.
+    Por isso só serve as páginas de catálogo: o carrinho e o checkout, que
+    mostram e cobram o preço, usam carregar(), que lê sempre do banco.
+    """
+
+    def obter_varios(self, ids):
+        """Devolve {id: ProdutoSnapshot}, buscando as falhas numa só consulta."""
+        encontrados = {}
+        em_falta = []
+        for produto_id in ids:
+            snapshot = self.obter(produto_id)
+            if snapshot is None:
+                em_falta.append(produto_id)
+            else:
+                encontrados[produto_id] = snapshot
+        if em_falta:
+            encontrados.update(self.carregar(em_falta))
+        return encontrados
+
+    def carregar(self, ids):
+        """Lê os produtos diretamente do banco e atualiza o cache com eles."""
+        linhas = Produto.query.with_entities(
+            Produto.id, Produto.nome, Produto.preco, Produto.imagem
+        ).filter(Produto.id.in_(list(ids))).all()
+        carregados = {}
+        for linha in linhas:
+            snapshot = ProdutoSnapshot(*linha)
+            self.guardar(snapshot.id, snapshot)
+            carregados[snapshot.id] = snapshot
+        return carregados
+
+
+class UtilizadorSnapshot(UserMixin):
+    """Identidade do utilizador autenticado, sem ligação à sessão do banco.
+
+    É o que o user_loader devolve quando o utilizador está no cache; só tem
+    os campos usados pelas rotas e templates (não guarda o hash da senha).
+    """
+
+    __slots__ = ('id', 'username', 'email', 'is_admin')
+
+    def __init__(self, id, username, email, is_admin):
+        object.__setattr__(self, 'id', id)
+        object.__setattr__(self, 'username', username)
+        object.__setattr__(self, 'email', email)
+        object.__setattr__(self, 'is_admin', bool(is_admin))
+
+    def __setattr__(self, nome, valor):
+        raise AttributeError('UtilizadorSnapshot é imutável')
+
+    def __repr__(self):
+        return f'<UtilizadorSnapshot {self.username}>'
+
+
+class CacheUtilizadores(CacheTTL):
+    """Cache de identidades para o user_loader do Flask-Login.
+
+    O TTL é curto de propósito; as edições de utilizadores no painel de admin
+    invalidam a entrada logo (ver UserView).
+    """
+
+    def carregar(self, user_id):
+        linha = User.query.with_entities(
+            User.id, User.username, User.email, User.is_admin
+        ).filter_by(id=user_id).first()
+        if linha is None:
+            return None
+        snapshot = UtilizadorSnapshot(*linha)
+        self.guardar(user_id, snapshot)
+        return snapshot
+
+
+class CachePaginas(CacheTTL):
+    """Cache de HTML renderizado (grade do catálogo e página inicial anónima).
+
+    As chaves incluem a `geracao` atual; qualquer alteração de produtos faz
+    `invalidar_tudo()`, que muda de geração. Um pedido que começou a renderizar
+    antes da alteração guarda o resultado na geração antiga, que já ninguém lê.
+    """
+
+    def __init__(self, ttl=300, capacidade=1000):
+        super().__init__(ttl=ttl, capacidade=capacidade)
+        self.geracao = 0
+
+    def invalidar_tudo(self):
+        with self._lock:
+            self.geracao += 1
+            self._entradas.clear()
+
+
+def _marcar_catalogo_alterado(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Produto):
+            session.info.setdefault('produtos_alterados', set()).add(obj.id)
+
+
+def _marcar_alteracao_em_massa(estado):
+    # insert()/update()/delete() sobre Produto executados diretamente na
+    # sessão: não sabemos que linhas mudaram, invalida-se tudo
+    if (estado.is_insert or estado.is_update or estado.is_delete) and estado.bind_mapper is not None \
+            and estado.bind_mapper.class_ is Produto:
+        estado.session.info['catalogo_em_massa'] = True
+
+
+def _invalidar_depois_do_commit(session):
+    alterados = session.info.pop('produtos_alterados', None)
+    em_massa = session.info.pop('catalogo_em_massa', False)
+    if not (alterados or em_massa) or not has_app_context():
+        return
+    cache_produtos = getattr(current_app, 'cache_produtos', None)
+    if cache_produtos is not None:
+        if em_massa:
+            cache_produtos.limpar()
+        else:
+            for produto_id in alterados:
+                cache_produtos.invalidar(produto_id)
+    cache_paginas = getattr(current_app, 'cache_paginas', None)
+    if cache_paginas is not None:
+        cache_paginas.invalidar_tudo()
+
+
+def _descartar_marcas(session):
+    session.info.pop('produtos_alterados', None)
+    session.info.pop('catalogo_em_massa', None)
+
+
+def ligar_invalidacao_catalogo():
+    """Invalida os caches de produtos e de páginas sempre que um commit altera
+    produtos, venha a alteração do admin, de um comando ou de outra rota."""
+    if event.contains(Session, 'after_commit', _invalidar_depois_do_commit):
+        return
+    event.listen(Session, 'after_flush', _marcar_catalogo_alterado)
+    event.listen(Session, 'do_orm_execute', _marcar_alteracao_em_massa)
+    event.listen(Session, 'after_commit', _invalidar_depois_do_commit)
+    event.listen(Session, 'after_rollback', _descartar_marcas)
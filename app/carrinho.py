@@ -0,0 +1,262 @@
+# app/carrinho.py
+import datetime
+import re
+import secrets
+import threading
+from collections import OrderedDict
+from flask import session, current_app
+from flask_login import current_user
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.models import Carrinho, ItemCarrinho, Produto
+
+# Chave do carrinho de um utilizador autenticado (ver _chave_utilizador)
+_CHAVE_UTILIZADOR = re.compile(r'u\d+')
+
+
+class ArmazemCarrinhoMemoria:
+    """Carrinhos guardados em memória, com despejo LRU.
+
+    Serve para um único processo (desenvolvimento ou um worker só). Cada
+    carrinho é um dict produto_id -> quantidade com a contagem de itens já
+    calculada, por isso contar() não percorre as linhas.
+    """
+
+    def __init__(self, capacidade=10000):
+        self.capacidade = capacidade
+        self._carrinhos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _usar(self, chave):
+        # Chamado com o lock; devolve o carrinho e marca-o como o mais recente
+        entrada = self._carrinhos.get(chave)
+        if entrada is None:
+            entrada = self._carrinhos[chave] = [{}, 0]
+            while len(self._carrinhos) > self.capacidade:
+                self._carrinhos.popitem(last=False)
+        else:
+            self._carrinhos.move_to_end(chave)
+        return entrada
+
+    def obter(self, chave):
+        with self._lock:
+            entrada = self._carrinhos.get(chave)
+            if entrada is None:
+                return {}
+            self._carrinhos.move_to_end(chave)
+            return dict(entrada[0])
+
+    def contar(self, chave):
+        with self._lock:
+            entrada = self._carrinhos.get(chave)
+            return entrada[1] if entrada else 0
+
+    def adicionar(self, chave, produto_id, quantidade=1):
+        with self._lock:
+            entrada = self._usar(chave)
+            entrada[0][produto_id] = entrada[0].get(produto_id, 0) + quantidade
+            entrada[1] += quantidade
+
+    def definir(self, chave, produto_id, quantidade):
+        with self._lock:
+            entrada = self._usar(chave)
+            entrada[1] += quantidade - entrada[0].get(produto_id, 0)
+            entrada[0][produto_id] = quantidade
+
+    def remover(self, chave, produto_id):
+        with self._lock:
+            entrada = self._carrinhos.get(chave)
+            if entrada and produto_id in entrada[0]:
+                entrada[1] -= entrada[0].pop(produto_id)
+
+    def limpar(self, chave):
+        with self._lock:
+            self._carrinhos.pop(chave, None)
+
+    def mesclar(self, origem, destino):
+        with self._lock:
+            entrada_origem = self._carrinhos.pop(origem, None)
+            if not entrada_origem:
+                return
+            entrada = self._usar(destino)
+            for produto_id, quantidade in entrada_origem[0].items():
+                entrada[0][produto_id] = entrada[0].get(produto_id, 0) + quantidade
+            entrada[1] += entrada_origem[1]
+
+
+class ArmazemCarrinhoBanco:
+    """Carrinhos guardados no banco, partilhados por todos os workers.
+
+    Cada alteração começa por um upsert da linha de `carrinho` (que fica
+    bloqueada até ao commit, por isso as alterações ao mesmo carrinho não se
+    cruzam), altera os itens com INSERT ... ON CONFLICT (duas adições ao
+    mesmo tempo somam-se, nenhuma se perde) e recalcula a contagem de itens
+    guardada na linha de `carrinho`, tudo na mesma transação.
+    """
+
+    def obter(self, chave):
+        linhas = db.session.query(ItemCarrinho.produto_id, ItemCarrinho.quantidade).filter_by(chave=chave)
+        return dict(linhas.all())
+
+    def contar(self, chave):
+        quantidade = db.session.query(Carrinho.quantidade_itens).filter_by(chave=chave).scalar()
+        return quantidade or 0
+
+    def _insert(self, modelo):
+        # INSERT com ON CONFLICT do dialeto do banco (SQLite ou Postgres)
+        if db.session.get_bind(mapper=modelo.__mapper__).dialect.name == 'postgresql':
+            return postgresql.insert(modelo)
+        return sqlite.insert(modelo)
+
+    def _tocar(self, chave):
+        agora = datetime.datetime.utcnow()
+        stmt = self._insert(Carrinho).values(chave=chave, quantidade_itens=0, atualizado_em=agora)
+        db.session.execute(stmt.on_conflict_do_update(index_elements=['chave'], set_={'atualizado_em': agora}))
+
+    def _gravar(self, chave):
+        soma = (
+            select(func.coalesce(func.sum(ItemCarrinho.quantidade), 0))
+            .where(ItemCarrinho.chave == chave)
+            .scalar_subquery()
+        )
+        db.session.execute(
+            update(Carrinho).where(Carrinho.chave == chave).values(quantidade_itens=soma),
+            execution_options={'synchronize_session': False},
+        )
+        db.session.commit()
+
+    def _somar(self, chave, quantidades):
+        # quantidades: {produto_id: quantidade a somar}
+        stmt = self._insert(ItemCarrinho)
+        db.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=['chave', 'produto_id'],
+                set_={'quantidade': ItemCarrinho.quantidade + stmt.excluded.quantidade},
+            ),
+            [{'chave': chave, 'produto_id': produto_id, 'quantidade': quantidade}
+             for produto_id, quantidade in sorted(quantidades.items())],
+        )
+
+    def adicionar(self, chave, produto_id, quantidade=1):
+        self._tocar(chave)
+        self._somar(chave, {produto_id: quantidade})
+        self._gravar(chave)
+
+    def definir(self, chave, produto_id, quantidade):
+        self._tocar(chave)
+        stmt = self._insert(ItemCarrinho).values(chave=chave, produto_id=produto_id, quantidade=quantidade)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['chave', 'produto_id'], set_={'quantidade': stmt.excluded.quantidade},
+        ))
+        self._gravar(chave)
+
+    def remover(self, chave, produto_id):
+        tocado = db.session.execute(
+            update(Carrinho).where(Carrinho.chave == chave).values(atualizado_em=datetime.datetime.utcnow()),
+            execution_options={'synchronize_session': False},
+        ).rowcount
+        if not tocado:
+            db.session.commit()
+            return
+        ItemCarrinho.query.filter_by(chave=chave, produto_id=produto_id).delete()
+        self._gravar(chave)
+
+    def limpar(self, chave):
+        ItemCarrinho.query.filter_by(chave=chave).delete()
+        Carrinho.query.filter_by(chave=chave).delete()
+        db.session.commit()
+
+    def mesclar(self, origem, destino):
+        # Só os produtos que ainda existem (a chave estrangeira recusaria os outros)
+        itens = dict(
+            db.session.query(ItemCarrinho.produto_id, ItemCarrinho.quantidade)
+            .join(Produto, Produto.id == ItemCarrinho.produto_id)
+            .filter(ItemCarrinho.chave == origem)
+            .all()
+        )
+        if itens:
+            self._tocar(destino)
+            self._somar(destino, itens)
+        ItemCarrinho.query.filter_by(chave=origem).delete()
+        Carrinho.query.filter_by(chave=origem).delete()
+        if itens:
+            self._gravar(destino)
+        else:
+            db.session.commit()
+
+
+def expirar_carrinhos_anonimos(validade_dias, tamanho_lote=500, max_lotes=1000):
+    """Apaga os carrinhos anónimos sem alterações há mais de `validade_dias` dias.
+
+    Os carrinhos dos utilizadores autenticados ficam. Devolve quantos
+    carrinhos foram apagados.
+    """
+    limite = datetime.datetime.utcnow() - datetime.timedelta(days=validade_dias)
+    total = 0
+    depois_de = ''
+    for _ in range(max_lotes):
+        chaves = db.session.scalars(
+            select(Carrinho.chave)
+            .where(Carrinho.atualizado_em < limite, Carrinho.chave > depois_de)
+            .order_by(Carrinho.chave)
+            .limit(tamanho_lote)
+        ).all()
+        if not chaves:
+            break
+        depois_de = chaves[-1]
+        anonimas = [chave for chave in chaves if not _CHAVE_UTILIZADOR.fullmatch(chave)]
+        if anonimas:
+            # A data volta a ser verificada: o carrinho pode ter sido usado entretanto
+            expirados = select(Carrinho.chave).where(Carrinho.chave.in_(anonimas), Carrinho.atualizado_em < limite)
+            db.session.execute(delete(ItemCarrinho).where(ItemCarrinho.chave.in_(expirados)),
+                               execution_options={'synchronize_session': False})
+            total += db.session.execute(delete(Carrinho).where(Carrinho.chave.in_(expirados)),
+                                        execution_options={'synchronize_session': False}).rowcount
+        db.session.commit()
+        if len(chaves) < tamanho_lote:
+            break
+    return total
+
+
+def criar_armazem(config):
+    backend = config['CART_BACKEND']
+    if backend == 'memoria':
+        return ArmazemCarrinhoMemoria(capacidade=config['CART_MEMORIA_CAPACIDADE'])
+    if backend == 'banco':
+        return ArmazemCarrinhoBanco()
+    raise ValueError(f"CART_BACKEND desconhecido: {backend!r} (use 'memoria' ou 'banco').")
+
+
+# --- Ligação entre o armazém e a sessão do utilizador ---
+# A sessão (cookie) guarda apenas a chave do carrinho anónimo; utilizadores
+# autenticados usam uma chave derivada do seu id.
+
+def _chave_utilizador(user_id):
+    return f'u{user_id}'
+
+
+def chave_carrinho(criar=False):
+    if current_user.is_authenticated:
+        return _chave_utilizador(current_user.id)
+    chave = session.get('cart_id')
+    if chave is None and criar:
+        chave = session['cart_id'] = secrets.token_urlsafe(16)
+    return chave
+
+
+def itens_carrinho():
+    chave = chave_carrinho()
+    return current_app.carrinho.obter(chave) if chave else {}
+
+
+def contar_itens_carrinho():
+    chave = chave_carrinho()
+    return current_app.carrinho.contar(chave) if chave else 0
+
+
+def mesclar_carrinho_anonimo(user_id):
+    """Junta o carrinho anónimo da sessão ao carrinho do utilizador (no login)."""
+    chave_anonima = session.pop('cart_id', None)
+    if chave_anonima:
+        current_app.carrinho.mesclar(chave_anonima, _chave_utilizador(user_id))
@@ -0,0 +1,111 @@
+# app/catalog.py
+import base64
+import json
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import and_, or_
+from app.models import Produto
+
+# Ordenações aceites pelo catálogo: nome -> (coluna, descendente?)
+# Todas desempatam pelo id, que é o que torna o cursor (keyset) estável.
+ORDENACOES = {
+    'id': (Produto.id, False),
+    'preco': (Produto.preco, False),
+    '-preco': (Produto.preco, True),
+    'nome': (Produto.nome, False),
+}
+ORDENACAO_PADRAO = 'id'
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+class PaginaCatalogo:
+    def __init__(self, produtos, ordem, proximo_cursor):
+        self.produtos = produtos
+        self.ordem = ordem
+        self.proximo_cursor = proximo_cursor
+
+    @property
+    def tem_proxima(self):
+        return self.proximo_cursor is not None
+
+
+def _codificar_cursor(produto, ordem):
+    coluna, _ = ORDENACOES[ordem]
+    valor = getattr(produto, coluna.key)
+    if isinstance(valor, Decimal):
+        valor = str(valor)
+    bruto = json.dumps([valor, produto.id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(bruto).decode('ascii').rstrip('=')
+
+
+def _decodificar_cursor(cursor, ordem):
+    try:
+        preenchimento = '=' * (-len(cursor) % 4)
+        valor, ultimo_id = json.loads(base64.urlsafe_b64decode(cursor + preenchimento))
+        ultimo_id = int(ultimo_id)
+        if ordem in ('preco', '-preco'):
+            valor = Decimal(valor)
+            if not valor.is_finite():  # 'NaN' e 'Infinity' passam no Decimal()
+                raise ValueError(valor)
+        elif ordem == 'id':
+            valor = int(valor)
+        else:
+            valor = str(valor)
+    except (ValueError, TypeError, InvalidOperation):
+        raise CursorInvalido(cursor)
+    return valor, ultimo_id
+
+
+def pagina_catalogo(ordem=None, cursor=None, por_pagina=24, cache=None):
+    """Devolve uma página do catálogo usando paginação por cursor (keyset).
+
+    Em vez de OFFSET, filtra a partir do último (valor, id) visto, o que
+    permite ao banco percorrer o índice composto e manter o custo de cada
+    página constante, independentemente do tamanho do catálogo.
+
+    Com um `cache` (CacheProdutos), a consulta só lê os ids da página e os
+    dados de cada produto vêm do cache.
+    """
+    if ordem not in ORDENACOES:
+        ordem = ORDENACAO_PADRAO
+    coluna, descendente = ORDENACOES[ordem]
+
+    query = Produto.query if cache is None else Produto.query.with_entities(Produto.id)
+    if cursor:
+        valor, ultimo_id = _decodificar_cursor(cursor, ordem)
+        if coluna is Produto.id:
+            query = query.filter(Produto.id > ultimo_id)
+        elif descendente:
+            query = query.filter(or_(coluna < valor, and_(coluna == valor, Produto.id < ultimo_id)))
+        else:
+            query = query.filter(or_(coluna > valor, and_(coluna == valor, Produto.id > ultimo_id)))
+
+    if coluna is Produto.id:
+        query = query.order_by(Produto.id)
+    elif descendente:
+        query = query.order_by(coluna.desc(), Produto.id.desc())
+    else:
+        query = query.order_by(coluna, Produto.id)
+
+    # Busca um registo a mais só para saber se existe uma próxima página
+    produtos = query.limit(por_pagina + 1).all()
+    if cache is not None:
+        ids = [linha.id for linha in produtos]
+        snapshots = cache.obter_varios(ids)
+        produtos = [snapshots[produto_id] for produto_id in ids if produto_id in snapshots]
+    proximo_cursor = None
+    if len(produtos) > por_pagina:
+        produtos = produtos[:por_pagina]
+        proximo_cursor = _codificar_cursor(produtos[-1], ordem)
+    return PaginaCatalogo(produtos, ordem, proximo_cursor)
+
+
+def produto_para_dict(produto):
+    return {
+        'id': produto.id,
+        'nome': produto.nome,
+        'preco': float(produto.preco),
+        'imagem': produto.imagem,
+    }
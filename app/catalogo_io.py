@@ -0,0 +1,206 @@
+# app/catalogo_io.py
+# Importação e exportação do catálogo em CSV ou JSONL (uma linha JSON por
+# produto), em streaming: os ficheiros são lidos e escritos linha a linha e
+# gravados em lotes, por isso a memória usada não depende do tamanho do
+# ficheiro. Usado por 'flask importar-produtos' / 'flask exportar-produtos' e
+# pelos benchmarks para semear o banco.
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import insert, select, update
+from app import db
+from app.models import Produto
+
+CAMPOS = ('id', 'nome', 'preco', 'imagem')
+FORMATOS = ('csv', 'jsonl')
+
+# Limites das colunas de Produto: nome String(100), imagem String(200) e
+# preco Numeric(10, 2)
+MAX_NOME = Produto.__table__.c.nome.type.length
+MAX_IMAGEM = Produto.__table__.c.imagem.type.length
+PRECO_MAXIMO = Decimal('99999999.99')
+
+
+class RegistoInvalido(ValueError):
+    pass
+
+
+def formato_do_ficheiro(nome):
+    for formato in FORMATOS:
+        if nome.lower().endswith('.' + formato):
+            return formato
+    return None
+
+
+def ler_registos(ficheiro, formato):
+    """Gera (número da linha, dict) a partir de um ficheiro de texto aberto.
+
+    Linhas JSON mal formadas geram um RegistoInvalido em vez do dict, para
+    serem contadas como inválidas sem interromper a leitura.
+    """
+    if formato == 'csv':
+        leitor = csv.DictReader(ficheiro)
+        for registo in leitor:
+            yield leitor.line_num, registo
+    elif formato == 'jsonl':
+        for numero, linha in enumerate(ficheiro, start=1):
+            if not linha.strip():
+                continue
+            try:
+                registo = json.loads(linha)
+            except ValueError as e:
+                yield numero, RegistoInvalido(f'JSON inválido: {e}')
+                continue
+            if not isinstance(registo, dict):
+                registo = RegistoInvalido('a linha não é um objeto JSON')
+            yield numero, registo
+    else:
+        raise ValueError(f"Formato desconhecido: {formato}")
+
+
+def normalizar_registo(registo):
+    """Valida um registo lido e devolve o dict pronto a gravar."""
+    if isinstance(registo, RegistoInvalido):
+        raise registo
+    nome = (registo.get('nome') or '').strip()
+    if not nome:
+        raise RegistoInvalido('nome em falta')
+    if len(nome) > MAX_NOME:
+        raise RegistoInvalido(f'nome com mais de {MAX_NOME} caracteres')
+    try:
+        preco = Decimal(str(registo.get('preco')))
+        # NaN e Infinity são Decimal válidos, mas não cabem na coluna
+        if not preco.is_finite():
+            raise InvalidOperation
+        preco = preco.quantize(Decimal('0.01'))
+        if preco < 0:
+            raise RegistoInvalido('preço negativo')
+        if preco > PRECO_MAXIMO:
+            raise RegistoInvalido(f'preço acima de {PRECO_MAXIMO}')
+    except (InvalidOperation, TypeError):
+        raise RegistoInvalido(f"preço inválido: {registo.get('preco')!r}")
+    imagem = registo.get('imagem') or None
+    if imagem is not None and len(str(imagem)) > MAX_IMAGEM:
+        raise RegistoInvalido(f'imagem com mais de {MAX_IMAGEM} caracteres')
+    normalizado = {'nome': nome, 'preco': preco, 'imagem': imagem}
+    produto_id = registo.get('id')
+    if produto_id not in (None, ''):
+        try:
+            normalizado['id'] = int(produto_id)
+        except (TypeError, ValueError):
+            raise RegistoInvalido(f"id inválido: {produto_id!r}")
+    return normalizado
+
+
+def _upsert(linhas):
+    """Insere ou atualiza (pelo id) um lote de produtos com id explícito."""
+    dialeto = db.session.get_bind(Produto.__mapper__).dialect.name
+    if dialeto in ('sqlite', 'postgresql'):
+        if dialeto == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as insert_dialeto
+        else:
+            from sqlalchemy.dialects.postgresql import insert as insert_dialeto
+        instrucao = insert_dialeto(Produto)
+        instrucao = instrucao.on_conflict_do_update(
+            index_elements=[Produto.id],
+            set_={campo: instrucao.excluded[campo] for campo in ('nome', 'preco', 'imagem')},
+        )
+        db.session.execute(instrucao, linhas)
+        return
+    # Outros bancos: separa as linhas que já existem (UPDATE em lote pela chave
+    # primária) das novas (INSERT em lote)
+    existentes = set(db.session.scalars(select(Produto.id).where(Produto.id.in_([l['id'] for l in linhas]))))
+    atualizar = [l for l in linhas if l['id'] in existentes]
+    inserir = [l for l in linhas if l['id'] not in existentes]
+    if atualizar:
+        db.session.execute(update(Produto), atualizar)
+    if inserir:
+        db.session.execute(insert(Produto), inserir)
+
+
+def _sincronizar_sequencia():
+    # No Postgres, ids explícitos não avançam a sequência do SERIAL
+    if db.session.get_bind(Produto.__mapper__).dialect.name == 'postgresql':
+        db.session.execute(db.text(
+            "SELECT setval(pg_get_serial_sequence('produto', 'id'), COALESCE((SELECT MAX(id) FROM produto), 1))"
+        ))
+        db.session.commit()
+
+
+def importar_produtos(registos, tamanho_lote=5000, max_erros=100, ao_progresso=None, ao_erro=None):
+    """Grava os registos (iterável de (linha, dict)) em lotes, com um commit por lote.
+
+    Registos com id fazem upsert; sem id são inseridos. `ao_progresso(resumo)`
+    é chamado depois de cada lote e `ao_erro(linha, mensagem)` por cada registo
+    inválido; ao fim de `max_erros` registos inválidos a importação pára com
+    RegistoInvalido (os lotes anteriores ficam gravados). Devolve o resumo.
+    """
+    resumo = {'lidos': 0, 'gravados': 0, 'invalidos': 0, 'segundos': 0.0}
+    inicio = time.perf_counter()
+    com_id, sem_id = [], []
+
+    def gravar():
+        if not (com_id or sem_id):
+            return
+        if com_id:
+            _upsert(com_id)
+        if sem_id:
+            db.session.execute(insert(Produto), sem_id)
+        db.session.commit()
+        resumo['gravados'] += len(com_id) + len(sem_id)
+        resumo['segundos'] = time.perf_counter() - inicio
+        com_id.clear()
+        sem_id.clear()
+        if ao_progresso:
+            ao_progresso(resumo)
+
+    for linha, registo in registos:
+        resumo['lidos'] += 1
+        try:
+            normalizado = normalizar_registo(registo)
+        except RegistoInvalido as e:
+            resumo['invalidos'] += 1
+            if ao_erro:
+                ao_erro(linha, str(e))
+            if resumo['invalidos'] >= max_erros:
+                gravar()
+                raise RegistoInvalido(f"Importação interrompida: {resumo['invalidos']} registos inválidos.")
+            continue
+        (com_id if 'id' in normalizado else sem_id).append(normalizado)
+        if len(com_id) + len(sem_id) >= tamanho_lote:
+            gravar()
+    gravar()
+    _sincronizar_sequencia()
+    return resumo
+
+
+def exportar_produtos(ficheiro, formato, tamanho_lote=5000, ao_progresso=None):
+    """Escreve todos os produtos (por ordem de id) em `ficheiro`, em streaming."""
+    consulta = (
+        select(Produto.id, Produto.nome, Produto.preco, Produto.imagem)
+        .order_by(Produto.id)
+        .execution_options(yield_per=tamanho_lote)
+    )
+    if formato == 'csv':
+        escritor = csv.writer(ficheiro)
+        escritor.writerow(CAMPOS)
+    elif formato not in FORMATOS:
+        raise ValueError(f"Formato desconhecido: {formato}")
+
+    resumo = {'escritos': 0, 'segundos': 0.0}
+    inicio = time.perf_counter()
+    for linha in db.session.execute(consulta):
+        if formato == 'csv':
+            escritor.writerow((linha.id, linha.nome, linha.preco, linha.imagem or ''))
+        else:
+            ficheiro.write(json.dumps(
+                {'id': linha.id, 'nome': linha.nome, 'preco': str(linha.preco), 'imagem': linha.imagem},
+                ensure_ascii=False,
+            ) + '\n')
+        resumo['escritos'] += 1
+        if ao_progresso and resumo['escritos'] % tamanho_lote == 0:
+            resumo['segundos'] = time.perf_counter() - inicio
+            ao_progresso(resumo)
+    resumo['segundos'] = time.perf_counter() - inicio
+    return resumo
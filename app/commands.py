@@ -0,0 +1,244 @@
+# app/commands.py
+import datetime
+import time
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+
+@click.command('processar-webhooks')
+@click.option('--threads', type=int, default=None, help='Consultas simultâneas ao Mercado Pago.')
+@click.option('--lote', type=int, default=100, show_default=True, help='Notificações reservadas por lote.')
+@click.option('--continuo', is_flag=True, help='Continua a consumir a fila até ser interrompido.')
+@click.option('--intervalo', type=float, default=2.0, show_default=True, help='Espera (s) quando a fila está vazia.')
+@with_appcontext
+def processar_webhooks_command(threads, lote, continuo, intervalo):
+    """Consome a fila de notificações do Mercado Pago."""
+    from app.fila_webhook import processar_fila
+
+    config = current_app.config
+    while True:
+        resumo = processar_fila(
+            current_app.sdk,
+            threads=threads or config['WEBHOOK_WORKER_THREADS'],
+            tamanho_lote=lote,
+            max_tentativas=config['WEBHOOK_MAX_TENTATIVAS'],
+            backoff_base=config['WEBHOOK_BACKOFF_BASE'],
+        )
+        if any(resumo.values()):
+            click.echo(f"Lote: {resumo}")
+        if not continuo:
+            break
+        if not any(resumo.values()):
+            time.sleep(intervalo)
+
+
+@click.command('mp-fake-server')
+@click.option('--host', default='127.0.0.1', show_default=True)
+@click.option('--porta', type=int, default=8001, show_default=True)
+@click.option('--latencia', type=float, default=0.0, show_default=True, help='Atraso (s) de cada resposta.')
+@click.option('--taxa-erro', type=click.FloatRange(0, 1), default=0.0, show_default=True, help='Fração das chamadas que responde 503.')
+def mp_fake_server_command(host, porta, latencia, taxa_erro):
+    """Servidor falso da API do Mercado Pago (use MP_API_BASE_URL para apontar para ele)."""
+    from werkzeug.serving import run_simple
+    from app.mercadopago_fake import criar_servidor_fake
+
+    run_simple(host, porta, criar_servidor_fake(latencia=latencia, taxa_erro=taxa_erro), threaded=True)
+
+
+@click.command('gerar-miniaturas')
+@click.option('--forcar', is_flag=True, help='Volta a gerar as variantes que já existem.')
+@with_appcontext
+def gerar_miniaturas_command(forcar):
+    """Gera as miniaturas (várias larguras, com WebP) das imagens dos produtos."""
+    from app import db
+    from app.models import Produto
+    from app.imagens import IMAGEM_PADRAO
+
+    imagens = {imagem for (imagem,) in db.session.query(Produto.imagem).distinct() if imagem}
+    imagens.add(IMAGEM_PADRAO)
+    inicio = time.perf_counter()
+    geradas = current_app.imagens.atualizar(sorted(imagens), forcar=forcar)
+    click.echo(f"{len(imagens)} imagens verificadas, {geradas} atualizadas em {time.perf_counter() - inicio:.1f} s.")
+
+
+def _abrir(caminho, modo):
+    # '-' lê do stdin / escreve no stdout
+    if caminho == '-':
+        return click.get_text_stream('stdin' if 'r' in modo else 'stdout')
+    return open(caminho, modo, encoding='utf-8', newline='')
+
+
+@click.command('importar-produtos')
+@click.argument('caminho')
+@click.option('--formato', type=click.Choice(['csv', 'jsonl']), help='Por omissão, deduzido da extensão.')
+@click.option('--lote', type=int, default=5000, show_default=True, help='Produtos gravados por commit.')
+@click.option('--max-erros', type=int, default=100, show_default=True, help='Registos inválidos tolerados.')
+@with_appcontext
+def importar_produtos_command(caminho, formato, lote, max_erros):
+    """Importa produtos de CSV/JSONL (upsert pelo id; sem id, insere)."""
+    from app.catalogo_io import importar_produtos, ler_registos, formato_do_ficheiro, RegistoInvalido
+
+    formato = formato or formato_do_ficheiro(caminho)
+    if formato is None:
+        raise click.UsageError('Indique --formato (csv ou jsonl).')
+
+    def progresso(resumo):
+        taxa = resumo['gravados'] / resumo['segundos'] if resumo['segundos'] else 0
+        click.echo(f"{resumo['gravados']} produtos gravados ({taxa:.0f}/s)", err=True)
+
+    def erro(linha, mensagem):
+        click.echo(f"Linha {linha}: {mensagem}", err=True)
+
+    with _abrir(caminho, 'r') as ficheiro:
+        try:
+            resumo = importar_produtos(
+                ler_registos(ficheiro, formato), tamanho_lote=lote, max_erros=max_erros,
+                ao_progresso=progresso, ao_erro=erro,
+            )
+        except RegistoInvalido as e:
+            raise click.ClickException(str(e))
+    taxa = resumo['gravados'] / resumo['segundos'] if resumo['segundos'] else 0
+    click.echo(f"Importação concluída: {resumo['lidos']} lidos, {resumo['gravados']} gravados, "
+               f"{resumo['invalidos']} inválidos em {resumo['segundos']:.1f} s ({taxa:.0f}/s).")
+
+
+@click.command('exportar-produtos')
+@click.argument('caminho')
+@click.option('--formato', type=click.Choice(['csv', 'jsonl']), help='Por omissão, deduzido da extensão.')
+@click.option('--lote', type=int, default=5000, show_default=True, help='Produtos lidos do banco de cada vez.')
+@with_appcontext
+def exportar_produtos_command(caminho, formato, lote):
+    """Exporta o catálogo para CSV/JSONL ('-' escreve no stdout)."""
+    from app.catalogo_io import exportar_produtos, formato_do_ficheiro
+
+    formato = formato or formato_do_ficheiro(caminho)
+    if formato is None:
+        raise click.UsageError('Indique --formato (csv ou jsonl).')
+
+    def progresso(resumo):
+        click.echo(f"{resumo['escritos']} produtos exportados", err=True)
+
+    with _abrir(caminho, 'w') as ficheiro:
+        resumo = exportar_produtos(ficheiro, formato, tamanho_lote=lote, ao_progresso=progresso)
+    taxa = resumo['escritos'] / resumo['segundos'] if resumo['segundos'] else 0
+    click.echo(f"Exportação concluída: {resumo['escritos']} produtos em {resumo['segundos']:.1f} s ({taxa:.0f}/s).", err=True)
+
+
+@click.command('recalcular-relatorios')
+@with_appcontext
+def recalcular_relatorios_command():
+    """Recalcula do zero os agregados de vendas a partir dos pedidos."""
+    from app.relatorios import recalcular_relatorios
+
+    inicio = time.perf_counter()
+    linhas = recalcular_relatorios()
+    detalhe = ', '.join(f"{tabela}: {total}" for tabela, total in linhas.items())
+    click.echo(f"Relatórios recalculados em {time.perf_counter() - inicio:.1f} s ({detalhe}).")
+
+
+@click.command('reindexar-pesquisa')
+@with_appcontext
+def reindexar_pesquisa_command():
+    """Cria (se faltar) e reconstrói o índice de pesquisa de produtos."""
+    from app.pesquisa import garantir_indice
+
+    inicio = time.perf_counter()
+    garantir_indice()
+    click.echo(f"Índice de pesquisa atualizado em {time.perf_counter() - inicio:.1f} s.")
+
+
+@click.command('limpar-pedidos')
+@click.option('--lote', type=int, default=None, help='Pedidos por transação (por omissão, ARQUIVO_LOTE).')
+@click.option('--max-lotes', type=int, default=1000, show_default=True, help='Lotes por execução de cada tarefa.')
+@click.option('--so-expirar', is_flag=True, help='Só expira os pedidos pendentes antigos.')
+@click.option('--so-arquivar', is_flag=True, help='Só move os pedidos concluídos para o arquivo.')
+@with_appcontext
+def limpar_pedidos_command(lote, max_lotes, so_expirar, so_arquivar):
+    """Expira pedidos pendentes abandonados, arquiva os pedidos concluídos antigos
+    e apaga os carrinhos anónimos abandonados.
+
+    Para correr periodicamente, ex.: no cron, de hora a hora:
+
+        0 * * * * cd /srv/loja && MODO_APP=cli flask limpar-pedidos
+    """
+    from app.arquivo import expirar_pendentes, arquivar_concluidos
+    from app.carrinho import expirar_carrinhos_anonimos
+
+    if so_expirar and so_arquivar:
+        raise click.UsageError('Use só uma de --so-expirar e --so-arquivar.')
+    config = current_app.config
+    parametros = {
+        'tamanho_lote': lote or config['ARQUIVO_LOTE'],
+        'max_lotes': max_lotes,
+        'pausa': config['ARQUIVO_PAUSA'],
+    }
+    if not so_arquivar:
+        inicio = time.perf_counter()
+        expirados = expirar_pendentes(config['PEDIDO_PENDENTE_VALIDADE'], **parametros)
+        click.echo(f"{expirados} pedidos pendentes expirados em {time.perf_counter() - inicio:.1f} s.")
+    if not so_expirar:
+        inicio = time.perf_counter()
+        arquivados = arquivar_concluidos(config['PEDIDO_RETENCAO_DIAS'], **parametros)
+        click.echo(f"{arquivados} pedidos concluídos arquivados em {time.perf_counter() - inicio:.1f} s.")
+    if not (so_expirar or so_arquivar):
+        inicio = time.perf_counter()
+        carrinhos = expirar_carrinhos_anonimos(
+            config['CART_ANONIMO_VALIDADE_DIAS'], tamanho_lote=parametros['tamanho_lote'], max_lotes=max_lotes,
+        )
+        click.echo(f"{carrinhos} carrinhos anónimos apagados em {time.perf_counter() - inicio:.1f} s.")
+
+
+@click.command('reconciliar-pagamentos')
+@click.option('--desde', type=click.DateTime(), default=None,
+              help='Pedidos criados a partir de (UTC; por omissão, há RECONCILIACAO_JANELA_HORAS horas).')
+@click.option('--ate', type=click.DateTime(), default=None,
+              help='Pedidos criados antes de (UTC; por omissão, há RECONCILIACAO_ATRASO s).')
+@click.option('--threads', type=int, default=None, help='Consultas simultâneas ao Mercado Pago.')
+@click.option('--taxa', type=float, default=None, help='Consultas por segundo ao Mercado Pago (0 sem limite).')
+@click.option('--lote', type=int, default=None, help='Pedidos por lote (por omissão, RECONCILIACAO_LOTE).')
+@click.option('--max-lotes', type=int, default=1000, show_default=True, help='Lotes por estado em cada execução.')
+@with_appcontext
+def reconciliar_pagamentos_command(desde, ate, threads, taxa, lote, max_lotes):
+    """Procura no Mercado Pago os pagamentos dos pedidos por pagar e aplica os aprovados.
+
+    Recupera os pedidos cujo webhook se perdeu; para correr periodicamente,
+    ex.: no cron, de 15 em 15 minutos:
+
+        */15 * * * * cd /srv/loja && MODO_APP=cli flask reconciliar-pagamentos
+    """
+    from app.reconciliacao import reconciliar_pagamentos
+
+    config = current_app.config
+    agora = datetime.datetime.utcnow()
+    desde = desde or agora - datetime.timedelta(hours=config['RECONCILIACAO_JANELA_HORAS'])
+    ate = ate or agora - datetime.timedelta(seconds=config['RECONCILIACAO_ATRASO'])
+
+    def progresso(resumo):
+        click.echo(f"{resumo['consultados'] + resumo['falhas']} pedidos verificados, {resumo['pagos']} pagos", err=True)
+
+    inicio = time.perf_counter()
+    resumo = reconciliar_pagamentos(
+        current_app.sdk, desde, ate,
+        threads=threads or config['RECONCILIACAO_THREADS'],
+        taxa=config['RECONCILIACAO_TAXA'] if taxa is None else taxa,
+        tamanho_lote=lote or config['RECONCILIACAO_LOTE'],
+        max_lotes=max_lotes,
+        ao_lote=progresso,
+    )
+    click.echo(f"Reconciliação de {desde:%Y-%m-%d %H:%M} a {ate:%Y-%m-%d %H:%M} concluída em "
+               f"{time.perf_counter() - inicio:.1f} s: {resumo}")
+    if resumo['interrompido']:
+        raise click.ClickException('Interrompida: o circuito do Mercado Pago está aberto.')
+
+
+def register_commands(app):
+    app.cli.add_command(processar_webhooks_command)
+    app.cli.add_command(mp_fake_server_command)
+    app.cli.add_command(gerar_miniaturas_command)
+    app.cli.add_command(importar_produtos_command)
+    app.cli.add_command(exportar_produtos_command)
+    app.cli.add_command(recalcular_relatorios_command)
+    app.cli.add_command(reindexar_pesquisa_command)
+    app.cli.add_command(limpar_pedidos_command)
+    app.cli.add_command(reconciliar_pagamentos_command)
@@ -2,9 +2,179 @@
 import os
 
 class Config:
+    # O que create_app carrega: 'web' (loja, painel de admin e instrumentação)
+    # ou 'cli', mais leve, para comandos e migrações (MODO_APP=cli flask db upgrade)
+    MODO_APP = os.environ.get('MODO_APP', 'web')
+
     # Define o caminho do banco de dados para a pasta 'instance' na raiz do projeto
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///../instance/loja.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Réplica só de leitura usada pelas rotas marcadas com @somente_leitura
+    # (homepage, minha_conta); sem ela, essas rotas leem do banco principal
+    DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+
+    # Perfil do engine para SQLite: modo do journal (WAL deixa leitores e um
+    # escritor trabalharem ao mesmo tempo), espera (ms) por um lock antes de
+    # falhar com "database is locked" e nível de sincronização com o disco
+    # (NORMAL é seguro em WAL e evita um fsync por commit)
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+
+    # Perfil do engine para Postgres: pool de ligações (tamanho, ligações
+    # extra em picos, espera por uma ligação livre e reciclagem em s), teste
+    # da ligação antes de a usar e tempo máximo (ms) de cada instrução
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1') == '1'
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 15000))
     
     # Chave secreta para segurança, importante para sessões e outras funcionalidades
-    SECRET_KEY = os.environ.get('SECRET_KEY') or 'uma-chave-secreta-bem-forte'
\ No newline at end of file
+    SECRET_KEY = os.environ.get('SECRET_KEY') or 'uma-chave-secreta-bem-forte'
+
+    # Quantidade de produtos por página no catálogo (homepage e /api/produtos)
+    CATALOGO_POR_PAGINA = int(os.environ.get('CATALOGO_POR_PAGINA', 24))
+
+    # Pesquisa de produtos: resultados por página, quantos resultados (pela
+    # ordem do índice) são ordenados por relevância, sugestões do autocompletar
+    # e de quanto em quanto tempo (s) o vocabulário em memória é reconstruído
+    PESQUISA_POR_PAGINA = int(os.environ.get('PESQUISA_POR_PAGINA', 24))
+    PESQUISA_CANDIDATOS = int(os.environ.get('PESQUISA_CANDIDATOS', 500))
+    PESQUISA_SUGESTOES = int(os.environ.get('PESQUISA_SUGESTOES', 8))
+    PESQUISA_VOCABULARIO_TTL = int(os.environ.get('PESQUISA_VOCABULARIO_TTL', 600))
+
+    # Quantidade de pedidos por página no histórico de /minha_conta
+    PEDIDOS_POR_PAGINA = int(os.environ.get('PEDIDOS_POR_PAGINA', 10))
+
+    # Limpeza de pedidos (flask limpar-pedidos): um pedido 'Pendente' expira
+    # passados PEDIDO_PENDENTE_VALIDADE s; os concluídos há mais de
+    # PEDIDO_RETENCAO_DIAS dias vão para o arquivo, ARQUIVO_LOTE pedidos por
+    # transação com ARQUIVO_PAUSA s de pausa entre lotes
+    PEDIDO_PENDENTE_VALIDADE = int(os.environ.get('PEDIDO_PENDENTE_VALIDADE', 86400))
+    PEDIDO_RETENCAO_DIAS = int(os.environ.get('PEDIDO_RETENCAO_DIAS', 365))
+    ARQUIVO_LOTE = int(os.environ.get('ARQUIVO_LOTE', 500))
+    ARQUIVO_PAUSA = float(os.environ.get('ARQUIVO_PAUSA', 0.1))
+
+    # Tempo (s) que as unidades ficam reservadas para um pedido 'Pendente'
+    # antes de 'flask limpar-pedidos' as devolver ao estoque
+    ESTOQUE_RESERVA_VALIDADE = int(os.environ.get('ESTOQUE_RESERVA_VALIDADE', 3600))
+
+    # Worker da fila de notificações do Mercado Pago (flask processar-webhooks)
+    WEBHOOK_WORKER_THREADS = int(os.environ.get('WEBHOOK_WORKER_THREADS', 4))
+    WEBHOOK_MAX_TENTATIVAS = int(os.environ.get('WEBHOOK_MAX_TENTATIVAS', 5))
+    WEBHOOK_BACKOFF_BASE = float(os.environ.get('WEBHOOK_BACKOFF_BASE', 2))
+
+    # Reconciliação dos pagamentos (flask reconciliar-pagamentos): pedidos por
+    # pagar criados nas últimas RECONCILIACAO_JANELA_HORAS horas, exceto os dos
+    # últimos RECONCILIACAO_ATRASO s (o webhook pode ainda estar a caminho);
+    # consultas simultâneas e por segundo ao Mercado Pago (com mais threads do
+    # que MP_TAMANHO_POOL as ligações HTTP não são reutilizadas)
+    RECONCILIACAO_JANELA_HORAS = int(os.environ.get('RECONCILIACAO_JANELA_HORAS', 72))
+    RECONCILIACAO_ATRASO = int(os.environ.get('RECONCILIACAO_ATRASO', 600))
+    RECONCILIACAO_THREADS = int(os.environ.get('RECONCILIACAO_THREADS', 8))
+    RECONCILIACAO_TAXA = float(os.environ.get('RECONCILIACAO_TAXA', 20))
+    RECONCILIACAO_LOTE = int(os.environ.get('RECONCILIACAO_LOTE', 500))
+
+    # Eventos de estado do pagamento (/eventos_pagamento). Cada ligação ocupa
+    # um worker enquanto está aberta, por isso só são usados com workers que
+    # atendem muitos pedidos ao mesmo tempo (gunicorn.conf.py liga-os para
+    # gevent/gthread); senão a página de pagamento faz polling. Duração
+    # máxima de cada ligação e intervalo entre verificações no banco
+    PAGAMENTO_SSE = os.environ.get('PAGAMENTO_SSE', '0') == '1'
+    PAGAMENTO_SSE_DURACAO = int(os.environ.get('PAGAMENTO_SSE_DURACAO', 20))
+    PAGAMENTO_SSE_INTERVALO_VERIFICACAO = int(os.environ.get('PAGAMENTO_SSE_INTERVALO_VERIFICACAO', 5))
+
+    # Onde ficam os carrinhos: 'memoria' (LRU no processo, só para um worker)
+    # ou 'banco' (tabelas carrinho/item_carrinho, partilhadas entre workers)
+    CART_BACKEND = os.environ.get('CART_BACKEND', 'banco')
+    CART_MEMORIA_CAPACIDADE = int(os.environ.get('CART_MEMORIA_CAPACIDADE', 10000))
+    # Carrinhos anónimos no banco sem alterações há mais destes dias são
+    # apagados por 'flask limpar-pedidos'
+    CART_ANONIMO_VALIDADE_DIAS = int(os.environ.get('CART_ANONIMO_VALIDADE_DIAS', 30))
+
+    # Cache de produtos em memória: validade (s) e número máximo de produtos
+    PRODUTO_CACHE_TTL = int(os.environ.get('PRODUTO_CACHE_TTL', 300))
+    PRODUTO_CACHE_CAPACIDADE = int(os.environ.get('PRODUTO_CACHE_CAPACIDADE', 10000))
+
+    # Cache de identidades do user_loader: validade curta (s) e capacidade
+    UTILIZADOR_CACHE_TTL = int(os.environ.get('UTILIZADOR_CACHE_TTL', 60))
+    UTILIZADOR_CACHE_CAPACIDADE = int(os.environ.get('UTILIZADOR_CACHE_CAPACIDADE', 10000))
+
+    # Senhas: custo do bcrypt (ao mudar, os hashes antigos são refeitos no
+    # próximo login), tamanho do pool de hashing e tempo máximo de espera (s)
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    SENHAS_WORKERS = int(os.environ.get('SENHAS_WORKERS', 4))
+    SENHAS_TIMEOUT = int(os.environ.get('SENHAS_TIMEOUT', 30))
+
+    # Checkout idempotente: durante quanto tempo (s) um pedido pendente com o
+    # mesmo carrinho é reutilizado, e quanto tempo (s) um pedido HTTP repetido
+    # espera pela preferência que outro ainda está a criar (no máximo 5 s, ver
+    # app/pedidos.py)
+    CHECKOUT_IDEMPOTENCIA_JANELA = int(os.environ.get('CHECKOUT_IDEMPOTENCIA_JANELA', 1800))
+    CHECKOUT_ESPERA_PREFERENCIA = float(os.environ.get('CHECKOUT_ESPERA_PREFERENCIA', 3))
+
+    # Cliente HTTP do Mercado Pago: URL da API (aponte para o servidor falso com
+    # 'flask mp-fake-server'), timeouts (s), repetições de GET, tamanho do pool
+    # de ligações e circuit breaker (falhas seguidas / segundos até novo teste)
+    MP_API_BASE_URL = os.environ.get('MP_API_BASE_URL', 'https://api.mercadopago.com')
+    MP_TIMEOUT_CONEXAO = float(os.environ.get('MP_TIMEOUT_CONEXAO', 3.05))
+    MP_TIMEOUT_LEITURA = float(os.environ.get('MP_TIMEOUT_LEITURA', 10))
+    MP_MAX_TENTATIVAS = int(os.environ.get('MP_MAX_TENTATIVAS', 2))
+    MP_TAMANHO_POOL = int(os.environ.get('MP_TAMANHO_POOL', 10))
+    MP_CIRCUITO_LIMITE_FALHAS = int(os.environ.get('MP_CIRCUITO_LIMITE_FALHAS', 5))
+    MP_CIRCUITO_TEMPO_REABERTURA = float(os.environ.get('MP_CIRCUITO_TEMPO_REABERTURA', 30))
+
+    # Instrumentação: consultas acima deste tempo (ms) vão para o log de SQL
+    # lento; fração dos pedidos perfilados com cProfile (0 desliga, os admins
+    # podem sempre pedir com ?_perfil=1) e pasta onde guardar os .prof; token
+    # opcional para o Prometheus ler /metrics sem sessão de admin
+    SQL_LENTO_MS = float(os.environ.get('SQL_LENTO_MS', 200))
+    PERFIL_AMOSTRAGEM = float(os.environ.get('PERFIL_AMOSTRAGEM', 0))
+    PERFIL_DIRETORIO = os.environ.get('PERFIL_DIRETORIO')
+    METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN')
+
+    # Cache do HTML da página inicial (grade do catálogo e página completa
+    # para visitantes anónimos): validade (s) e número máximo de páginas
+    PAGINA_CACHE_TTL = int(os.environ.get('PAGINA_CACHE_TTL', 300))
+    PAGINA_CACHE_CAPACIDADE = int(os.environ.get('PAGINA_CACHE_CAPACIDADE', 1000))
+
+
+def opcoes_engine(url, config, somente_leitura=False):
+    """SQLALCHEMY_ENGINE_OPTIONS para `url`, conforme o tipo de banco.
+
+    Os PRAGMAs do SQLite são por ligação e são aplicados no evento 'connect'
+    (ver app/banco.py); aqui só ficam as opções do pool e da ligação.
+    """
+    if url.startswith('sqlite'):
+        return {'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000}}
+    if url.startswith('postgresql'):
+        opcoes_servidor = f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}"
+        if somente_leitura:
+            opcoes_servidor += ' -c default_transaction_read_only=on'
+        return {
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+            'pool_recycle': config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': config['DB_POOL_PRE_PING'],
+            'connect_args': {'options': opcoes_servidor},
+        }
+    return {}
+
+
+def aplicar_perfil_banco(config):
+    """Preenche as opções do engine (e o bind da réplica) a partir da URL final.
+
+    Chamado por create_app() antes de db.init_app(); as opções definidas à
+    mão em SQLALCHEMY_ENGINE_OPTIONS ou SQLALCHEMY_BINDS prevalecem.
+    """
+    url = config['SQLALCHEMY_DATABASE_URI']
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = {**opcoes_engine(url, config), **config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+    replica = config.get('DATABASE_REPLICA_URL')
+    if replica:
+        binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+        binds.setdefault('replica', {'url': replica, **opcoes_engine(replica, config, somente_leitura=True)})
+        config['SQLALCHEMY_BINDS'] = binds
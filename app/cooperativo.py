@@ -0,0 +1,72 @@
+# app/cooperativo.py
+# Modo cooperativo (Gunicorn com workers gevent, ver gunicorn.conf.py): cada
+# worker atende centenas de pedidos ao mesmo tempo em greenlets, e enquanto
+# um pedido espera pelo Mercado Pago ou pelo banco os outros avançam.
+#
+# O Gunicorn aplica o monkey patching do gevent (sockets, threading, time)
+# antes de carregar a aplicação, o que chega para o requests/urllib3 do SDK.
+# Falta o que corre em C sem passar pelos sockets do Python:
+#   - o psycopg2, que passa a esperar pelo socket do Postgres através do hub
+#     do gevent (o mesmo que o pacote psycogreen faz);
+#   - o trabalho de CPU que solta o GIL (bcrypt), que tem de ir para threads
+#     reais do sistema, senão bloqueia todos os greenlets do worker.
+# O SQLite continua a bloquear o worker enquanto cada consulta corre; para
+# muitos escritores em simultâneo use o Postgres.
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+
+def modo_cooperativo_ativo():
+    """True se o processo corre com o monkey patching do gevent."""
+    # Sem importar o gevent quando ninguém o importou (workers sync/gthread)
+    if 'gevent' not in sys.modules:
+        return False
+    from gevent import monkey
+    return monkey.is_module_patched('socket')
+
+
+def _esperar_psycopg2(conexao, timeout=None):
+    import psycopg2
+    from psycopg2 import extensions
+    from gevent.socket import wait_read, wait_write
+
+    while True:
+        estado = conexao.poll()
+        if estado == extensions.POLL_OK:
+            break
+        elif estado == extensions.POLL_READ:
+            wait_read(conexao.fileno(), timeout=timeout)
+        elif estado == extensions.POLL_WRITE:
+            wait_write(conexao.fileno(), timeout=timeout)
+        else:
+            raise psycopg2.OperationalError(f"Estado inesperado do psycopg2 no poll(): {estado}")
+
+
+def ligar_psycopg2_gevent():
+    """Faz o psycopg2 ceder o controlo ao hub do gevent enquanto espera pelo Postgres."""
+    try:
+        from psycopg2 import extensions
+    except ImportError:
+        return False
+    extensions.set_wait_callback(_esperar_psycopg2)
+    return True
+
+
+def criar_executor(workers, nome):
+    """Pool para trabalho de CPU: threads reais, mesmo no modo cooperativo.
+
+    Com o monkey patching, um ThreadPoolExecutor corre as tarefas em
+    greenlets; o pool de threads do hub do gevent usa threads do sistema.
+    """
+    if modo_cooperativo_ativo():
+        from gevent.threadpool import ThreadPoolExecutor as ThreadPoolExecutorGevent
+        return ThreadPoolExecutorGevent(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix=nome)
+
+
+def preparar_modo_cooperativo(app):
+    """Chamado por create_app(): ajusta os drivers se o worker for gevent."""
+    app.config['MODO_COOPERATIVO'] = modo_cooperativo_ativo()
+    if app.config['MODO_COOPERATIVO']:
+        ligar_psycopg2_gevent()
+    return app.config['MODO_COOPERATIVO']
@@ -0,0 +1,149 @@
+# app/estoque.py
+# Estoque dos produtos e reservas dos pedidos pendentes.
+#
+# O checkout tira as unidades ao estoque no momento em que cria o pedido, com
+# um UPDATE condicional por produto (... SET estoque = estoque - n WHERE
+# estoque >= n): o próprio banco decide quem fica com as últimas unidades,
+# sem ler o estoque antes nem usar SELECT ... FOR UPDATE. O que foi tirado
+# fica registado em ReservaEstoque até o pedido mudar de estado:
+#   - 'Pago': a reserva é apagada (as unidades foram vendidas);
+#   - 'Expirado' / 'Cancelado': as unidades voltam ao estoque.
+# As reservas têm validade (ESTOQUE_RESERVA_VALIDADE); 'flask limpar-pedidos'
+# expira os pedidos cujas reservas passaram do prazo, o que as liberta.
+#
+# Um pagamento aprovado depois de o pedido expirar tira as unidades na mesma e
+# pode deixar o estoque negativo: fica no log ('loja.estoque') e na lista de
+# produtos vendidos a mais do painel de relatórios.
+import datetime
+import logging
+from sqlalchemy import bindparam, delete, func, insert, or_, select, update
+from app import db
+from app.models import Produto, Pedido, ItemPedido, ReservaEstoque
+
+logger_estoque = logging.getLogger('loja.estoque')
+
+
+class EstoqueInsuficiente(ValueError):
+    def __init__(self, produto_id):
+        super().__init__(f"Estoque insuficiente para o produto {produto_id}")
+        self.produto_id = produto_id
+
+
+def _retirar(produto_id, quantidade):
+    """Tira `quantidade` unidades ao produto se houver estoque para isso.
+
+    Devolve o estoque que ficou (None se o produto não tem controlo de
+    estoque) ou levanta EstoqueInsuficiente.
+    """
+    # Sobre a tabela, como em _somar_estoque: um update(Produto) seria visto
+    # pelos caches do catálogo e pela pesquisa como alteração em massa e cada
+    # checkout invalidava-os todos (o estoque não aparece em nenhum deles)
+    tabela = Produto.__table__
+    linha = db.session.execute(
+        update(tabela)
+        .where(tabela.c.id == produto_id, or_(tabela.c.estoque.is_(None), tabela.c.estoque >= quantidade))
+        .values(estoque=tabela.c.estoque - quantidade)
+        .returning(tabela.c.estoque)
+    ).first()
+    if linha is None:
+        raise EstoqueInsuficiente(produto_id)
+    return linha.estoque
+
+
+def _somar_estoque(quantidades):
+    # Um só UPDATE executado para todos os produtos (executemany)
+    if quantidades:
+        tabela = Produto.__table__
+        db.session.execute(
+            update(tabela)
+            .where(tabela.c.id == bindparam('produto'))
+            .values(estoque=tabela.c.estoque + bindparam('quantidade')),
+            [{'produto': produto_id, 'quantidade': quantidade} for produto_id, quantidade in sorted(quantidades)],
+        )
+
+
+def reservar_estoque(pedido_id, carrinho, validade):
+    """Reserva as unidades do `carrinho` ({produto_id: quantidade}) para o pedido.
+
+    Não faz commit: corre na transação que cria o pedido, que deve ser
+    desfeita se for levantada EstoqueInsuficiente.
+    """
+    expira_em = datetime.datetime.utcnow() + datetime.timedelta(seconds=validade)
+    reservas = []
+    # Sempre pela ordem dos ids, para duas compras com os mesmos produtos não
+    # se bloquearem uma à outra (deadlock) no Postgres
+    for produto_id in sorted(carrinho):
+        if _retirar(produto_id, carrinho[produto_id]) is not None:
+            reservas.append({
+                'pedido_id': pedido_id,
+                'produto_id': produto_id,
+                'quantidade': carrinho[produto_id],
+                'expira_em': expira_em,
+            })
+    if reservas:
+        db.session.execute(insert(ReservaEstoque), reservas)
+
+
+def liberar_reservas(pedido_ids):
+    """Devolve ao estoque as unidades reservadas pelos pedidos e apaga as reservas."""
+    linhas = db.session.execute(
+        select(ReservaEstoque.produto_id, func.sum(ReservaEstoque.quantidade))
+        .where(ReservaEstoque.pedido_id.in_(pedido_ids))
+        .group_by(ReservaEstoque.produto_id)
+    ).all()
+    _somar_estoque(linhas)
+    _apagar_reservas(pedido_ids)
+
+
+def _apagar_reservas(pedido_ids):
+    db.session.execute(
+        delete(ReservaEstoque).where(ReservaEstoque.pedido_id.in_(pedido_ids)),
+        execution_options={'synchronize_session': False},
+    )
+
+
+def reservas_expiradas(agora):
+    """Condição sobre Pedido: tem alguma reserva de estoque fora do prazo."""
+    return Pedido.id.in_(select(ReservaEstoque.pedido_id).where(ReservaEstoque.expira_em < agora))
+
+
+def aplicar_transicao(pedido_ids, status_anterior, status_novo):
+    """Acerta o estoque depois de `pedido_ids` passarem de um estado a outro.
+
+    Chamada por transitar_status, na mesma transação que o UPDATE dos pedidos.
+    Um reembolso não devolve unidades ao estoque (a mercadoria pode já ter
+    seguido); isso fica para o painel de administração.
+    """
+    if not pedido_ids:
+        return
+    if status_anterior == 'Pendente':
+        if status_novo == 'Pago':
+            _apagar_reservas(pedido_ids)
+        else:
+            liberar_reservas(pedido_ids)
+    elif status_anterior == 'Expirado' and status_novo == 'Pago':
+        # Pagamento aprovado depois de a reserva ser libertada: as unidades
+        # saem na mesma, mesmo que o estoque fique negativo (venda a mais
+        # que o painel mostra para ser resolvida à mão)
+        linhas = db.session.execute(
+            select(ItemPedido.produto_id, -func.sum(ItemPedido.quantidade))
+            .where(ItemPedido.pedido_id.in_(pedido_ids))
+            .group_by(ItemPedido.produto_id)
+        ).all()
+        _somar_estoque(linhas)
+        negativos = db.session.execute(
+            select(Produto.id, Produto.estoque)
+            .where(Produto.id.in_([linha[0] for linha in linhas]), Produto.estoque < 0)
+        ).all()
+        for produto_id, estoque in negativos:
+            logger_estoque.warning(
+                "Venda a mais: produto %s com estoque %s depois do pagamento tardio dos pedidos %s",
+                produto_id, estoque, sorted(pedido_ids),
+            )
+
+
+def produtos_vendidos_a_mais(limite=50):
+    """Produtos com estoque negativo (vendidos a mais), pelo índice parcial."""
+    return db.session.scalars(
+        select(Produto).where(Produto.estoque < 0).order_by(Produto.estoque, Produto.id).limit(limite)
+    ).all()
@@ -0,0 +1,165 @@
+# app/fila_webhook.py
+import json
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import select, update
+from app import db
+from app.models import NotificacaoWebhook
+from app.pedidos import transitar_status
+from app.notificacoes import central_pagamentos
+
+# Tempo durante o qual uma notificação reservada por um worker fica "presa" a ele.
+# Se o worker morrer a meio, ela volta a ficar disponível depois deste prazo.
+PRAZO_RESERVA = datetime.timedelta(minutes=5)
+
+
+class NotificacaoInvalida(ValueError):
+    """O pagamento consultado não pode ser aplicado (não vale a pena repetir)."""
+
+
+def enfileirar_notificacao(data):
+    """Guarda a notificação recebida para ser processada pelo worker.
+
+    Devolve a notificação criada, ou None se ela não for de pagamento ou se
+    já existir uma notificação pendente para o mesmo pagamento. Uma que já
+    esteja a ser processada não conta: o worker pode ter consultado o
+    pagamento antes da mudança de estado que esta notificação anuncia.
+    """
+    if not data or data.get("type") != "payment":
+        return None
+    payment_id = (data.get("data") or {}).get("id")
+    if not payment_id:
+        return None
+    payment_id = str(payment_id)
+
+    ja_pendente = db.session.query(
+        NotificacaoWebhook.query.filter(
+            NotificacaoWebhook.payment_id == payment_id,
+            NotificacaoWebhook.status == 'pendente',
+        ).exists()
+    ).scalar()
+    if ja_pendente:
+        return None
+
+    notificacao = NotificacaoWebhook(payment_id=payment_id, payload=json.dumps(data))
+    db.session.add(notificacao)
+    db.session.commit()
+    return notificacao
+
+
+def _reservar_lote(tamanho, agora):
+    disponivel = (
+        NotificacaoWebhook.status.in_(('pendente', 'processando')),
+        NotificacaoWebhook.proxima_tentativa <= agora,
+    )
+    candidatas = db.session.scalars(
+        select(NotificacaoWebhook.id)
+        .where(*disponivel)
+        .order_by(NotificacaoWebhook.proxima_tentativa, NotificacaoWebhook.id)
+        .limit(tamanho)
+    ).all()
+    if not candidatas:
+        db.session.commit()
+        return []
+    # O UPDATE volta a verificar a condição: se dois workers escolherem as
+    # mesmas notificações, só um fica com cada uma
+    ids = db.session.scalars(
+        update(NotificacaoWebhook)
+        .where(NotificacaoWebhook.id.in_(candidatas), *disponivel)
+        .values(status='processando', proxima_tentativa=agora + PRAZO_RESERVA)
+        .returning(NotificacaoWebhook.id),
+        execution_options={'synchronize_session': False},
+    ).all()
+    db.session.commit()
+    if not ids:
+        return []
+    return (
+        NotificacaoWebhook.query
+        .filter(NotificacaoWebhook.id.in_(ids))
+        .order_by(NotificacaoWebhook.proxima_tentativa, NotificacaoWebhook.id)
+        .all()
+    )
+
+
+def _consultar_pagamento(sdk, payment_id):
+    resposta = sdk.payment().get(payment_id)
+    if not resposta or resposta.get("status") != 200:
+        raise RuntimeError(f"Resposta inesperada do Mercado Pago: {resposta}")
+    return resposta.get("response", {})
+
+
+def aplicar_pagamento(payment_info):
+    """Marca o pedido como 'Pago' se o pagamento consultado estiver aprovado.
+
+    Devolve o id do pedido alterado, ou None se nada mudou. Levanta
+    NotificacaoInvalida se a external_reference não for de um pedido da loja.
+    """
+    if payment_info.get("status") != "approved" or not payment_info.get("external_reference"):
+        return None
+    try:
+        pedido_id = int(str(payment_info["external_reference"]).split('-')[0])
+    except ValueError:
+        raise NotificacaoInvalida(f"external_reference inválida: {payment_info['external_reference']!r}")
+    if transitar_status([pedido_id], 'Pago', 'webhook'):
+        print(f"✅ Pedido {pedido_id} atualizado para 'Pago' via Webhook.")
+        return pedido_id
+    return None
+
+
+def processar_fila(sdk, threads=4, tamanho_lote=100, max_tentativas=5, backoff_base=2):
+    """Processa um lote da fila de notificações e devolve um resumo.
+
+    As consultas ao Mercado Pago (a parte lenta) correm num pool limitado de
+    threads; o acesso ao banco fica todo na thread que chamou a função. As
+    notificações repetidas do mesmo pagamento geram uma única consulta.
+    """
+    agora = datetime.datetime.utcnow()
+    notificacoes = _reservar_lote(tamanho_lote, agora)
+    resumo = {'processadas': 0, 'duplicadas': 0, 'reagendadas': 0, 'falhas': 0}
+    if not notificacoes:
+        return resumo
+
+    por_pagamento = {}
+    for notificacao in notificacoes:
+        por_pagamento.setdefault(notificacao.payment_id, []).append(notificacao)
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        futuros = {
+            payment_id: executor.submit(_consultar_pagamento, sdk, payment_id)
+            for payment_id in por_pagamento
+        }
+
+    agora = datetime.datetime.utcnow()
+    for payment_id, futuro in futuros.items():
+        principal, *repetidas = por_pagamento[payment_id]
+        pedido_pago = None
+        try:
+            pedido_pago = aplicar_pagamento(futuro.result())
+        except Exception as e:
+            # Um erro do banco a meio deixa a transação inutilizável: desfaz e
+            # volta a ler a notificação antes de registar a falha
+            db.session.rollback()
+            db.session.refresh(principal)
+            principal.tentativas += 1
+            principal.ultimo_erro = str(e)
+            if isinstance(e, NotificacaoInvalida) or principal.tentativas >= max_tentativas:
+                principal.status = 'falhou'
+                resumo['falhas'] += 1
+                print(f"🚨 Notificação {principal.id} descartada após {principal.tentativas} tentativas: {e}")
+            else:
+                principal.status = 'pendente'
+                espera = backoff_base * 2 ** (principal.tentativas - 1)
+                principal.proxima_tentativa = agora + datetime.timedelta(seconds=espera)
+                resumo['reagendadas'] += 1
+        else:
+            principal.status = 'processada'
+            resumo['processadas'] += 1
+
+        for repetida in repetidas:
+            repetida.status = 'duplicada'
+            resumo['duplicadas'] += 1
+        db.session.commit()
+        if pedido_pago:
+            central_pagamentos.publicar(pedido_pago, 'Pago')
+
+    return resumo
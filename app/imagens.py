@@ -0,0 +1,172 @@
+# app/imagens.py
+# Miniaturas das imagens dos produtos. Para cada Produto.imagem (caminho
+# relativo a static/, ex.: 'img/camiseta.jpg') geramos versões redimensionadas
+# em várias larguras, no formato original e em WebP, com o hash do conteúdo no
+# nome do ficheiro:
+#
+#   static/img/variantes/camiseta-3f2a9c1b7e44-320.jpg
+#   static/img/variantes/camiseta-3f2a9c1b7e44-320.webp
+#
+# Como o nome muda quando a imagem muda, as variantes são servidas com cache
+# "immutable" de um ano (rota main.imagem_variante). O manifesto JSON na mesma
+# pasta diz ao template que variantes existem, sem ler o disco por pedido.
+import hashlib
+import json
+import os
+import threading
+import time
+
+LARGURAS = (320, 640, 960)
+QUALIDADE_JPEG = 82
+QUALIDADE_WEBP = 80
+PASTA_VARIANTES = os.path.join('img', 'variantes')
+IMAGEM_PADRAO = 'img/default.jpg'
+
+
+def hash_conteudo(caminho):
+    digest = hashlib.sha256()
+    with open(caminho, 'rb') as ficheiro:
+        for bloco in iter(lambda: ficheiro.read(65536), b''):
+            digest.update(bloco)
+    return digest.hexdigest()[:12]
+
+
+def gerar_variantes(pasta_static, imagem, larguras=LARGURAS, forcar=False):
+    """Gera as variantes de `imagem` e devolve a entrada do manifesto.
+
+    Não gera larguras maiores do que o original (o original já serve essas).
+    Devolve None se o ficheiro de origem não existir.
+    """
+    from PIL import Image
+
+    origem = os.path.join(pasta_static, imagem)
+    if not os.path.isfile(origem):
+        return None
+    versao = hash_conteudo(origem)
+    base, extensao = os.path.splitext(os.path.basename(imagem))
+    extensao = extensao.lower() if extensao.lower() in ('.jpg', '.jpeg', '.png') else '.jpg'
+    destino = os.path.join(pasta_static, PASTA_VARIANTES)
+    os.makedirs(destino, exist_ok=True)
+
+    with Image.open(origem) as original:
+        largura_original, altura_original = original.size
+        larguras_validas = sorted({min(l, largura_original) for l in larguras})
+        if extensao != '.png' and original.mode not in ('RGB', 'L'):
+            original = original.convert('RGB')
+        for largura in larguras_validas:
+            nome = f"{base}-{versao}-{largura}"
+            caminhos = {
+                extensao: os.path.join(destino, nome + extensao),
+                '.webp': os.path.join(destino, nome + '.webp'),
+            }
+            if not forcar and all(os.path.exists(c) for c in caminhos.values()):
+                continue
+            altura = round(altura_original * largura / largura_original)
+            reduzida = original.resize((largura, altura), Image.LANCZOS) if largura != largura_original else original
+            if extensao == '.png':
+                reduzida.save(caminhos[extensao], optimize=True)
+            else:
+                reduzida.save(caminhos[extensao], quality=QUALIDADE_JPEG, optimize=True, progressive=True)
+            reduzida.save(caminhos['.webp'], quality=QUALIDADE_WEBP, method=6)
+
+    return {
+        'versao': versao,
+        'base': base,
+        'extensao': extensao,
+        'larguras': larguras_validas,
+        'largura': largura_original,
+        'altura': altura_original,
+    }
+
+
+class ManifestoImagens:
+    """Mapa imagem -> variantes, lido de manifest.json.
+
+    O ficheiro é relido quando muda (verificado no máximo a cada
+    `intervalo_verificacao` segundos), para que as miniaturas geradas pela
+    linha de comando ou por outro processo apareçam sem reiniciar a app.
+    """
+
+    def __init__(self, pasta_static, intervalo_verificacao=5):
+        self.pasta_static = pasta_static
+        self.caminho = os.path.join(pasta_static, PASTA_VARIANTES, 'manifest.json')
+        self.intervalo_verificacao = intervalo_verificacao
+        self._entradas = {}
+        self._mtime = None
+        self._verificado_em = 0.0
+        self._lock = threading.Lock()
+
+    def _recarregar_se_mudou(self):
+        agora = time.monotonic()
+        if agora - self._verificado_em < self.intervalo_verificacao:
+            return
+        self._verificado_em = agora
+        try:
+            mtime = os.stat(self.caminho).st_mtime
+        except FileNotFoundError:
+            self._entradas, self._mtime = {}, None
+            return
+        if mtime != self._mtime:
+            with open(self.caminho, encoding='utf-8') as ficheiro:
+                self._entradas = json.load(ficheiro)
+            self._mtime = mtime
+
+    @property
+    def versao(self):
+        """Muda sempre que o manifesto muda (entra nas chaves do cache de páginas)."""
+        self._recarregar_se_mudou()
+        return self._mtime
+
+    def obter(self, imagem):
+        self._recarregar_se_mudou()
+        return self._entradas.get(imagem)
+
+    def atualizar(self, imagens, forcar=False):
+        """Gera as variantes das imagens indicadas e grava o manifesto."""
+        with self._lock:
+            self._verificado_em = 0.0
+            self._recarregar_se_mudou()
+            entradas = dict(self._entradas)
+            geradas = 0
+            for imagem in imagens:
+                entrada = gerar_variantes(self.pasta_static, imagem, forcar=forcar)
+                if entrada is None:
+                    continue
+                if entradas.get(imagem) != entrada:
+                    geradas += 1
+                entradas[imagem] = entrada
+
+            temporario = self.caminho + '.tmp'
+            os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+            with open(temporario, 'w', encoding='utf-8') as ficheiro:
+                json.dump(entradas, ficheiro, indent=2, sort_keys=True)
+            os.replace(temporario, self.caminho)
+            self._entradas = entradas
+            self._mtime = os.stat(self.caminho).st_mtime
+            return geradas
+
+    def atributos_img(self, imagem, url_variante, url_static):
+        """Atributos da tag <img>/<picture> de uma imagem de produto.
+
+        Sem entrada no manifesto (miniaturas ainda não geradas) devolve só o
+        `src` do ficheiro original.
+        """
+        imagem = imagem or IMAGEM_PADRAO
+        entrada = self.obter(imagem)
+        if entrada is None:
+            return {'src': url_static(imagem), 'srcset': None, 'srcset_webp': None}
+
+        prefixo = f"{entrada['base']}-{entrada['versao']}"
+
+        def srcset(extensao):
+            return ', '.join(
+                f"{url_variante(f'{prefixo}-{largura}{extensao}')} {largura}w" for largura in entrada['larguras']
+            )
+
+        return {
+            'src': url_variante(f"{prefixo}-{entrada['larguras'][0]}{entrada['extensao']}"),
+            'srcset': srcset(entrada['extensao']),
+            'srcset_webp': srcset('.webp'),
+            'largura': entrada['largura'],
+            'altura': entrada['altura'],
+        }
@@ -0,0 +1,211 @@
+# app/instrumentacao.py
+import cProfile
+import collections
+import io
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+from flask import g, request, has_app_context, current_app
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger_sql_lento = logging.getLogger('loja.sql_lento')
+
+# Limites (ms) dos buckets do histograma de duração dos pedidos
+BUCKETS_DURACAO_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+
+
+class MetricasPedidos:
+    """Métricas agregadas por endpoint (por processo).
+
+    Cada pedido acumula em `g` as consultas ao banco e o tempo gasto no
+    banco e no SDK do Mercado Pago; no fim do pedido isso é somado aqui.
+    """
+
+    def __init__(self, limite_sql_lento_ms=200, max_consultas_lentas=50, max_perfis=20):
+        self.limite_sql_lento_ms = limite_sql_lento_ms
+        self.consultas_lentas = collections.deque(maxlen=max_consultas_lentas)
+        self.perfis = collections.deque(maxlen=max_perfis)
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def registar_pedido(self, endpoint, status, duracao_ms, consultas, tempo_bd_ms, tempo_sdk_ms):
+        with self._lock:
+            serie = self._endpoints.get(endpoint)
+            if serie is None:
+                serie = self._endpoints[endpoint] = {
+                    'pedidos': 0, 'erros': 0, 'duracao_ms': 0.0, 'duracao_max_ms': 0.0,
+                    'consultas': 0, 'tempo_bd_ms': 0.0, 'tempo_sdk_ms': 0.0,
+                    'buckets': [0] * len(BUCKETS_DURACAO_MS),
+                }
+            serie['pedidos'] += 1
+            serie['erros'] += status >= 500
+            serie['duracao_ms'] += duracao_ms
+            serie['duracao_max_ms'] = max(serie['duracao_max_ms'], duracao_ms)
+            serie['consultas'] += consultas
+            serie['tempo_bd_ms'] += tempo_bd_ms
+            serie['tempo_sdk_ms'] += tempo_sdk_ms
+            for i, limite in enumerate(BUCKETS_DURACAO_MS):
+                if duracao_ms <= limite:
+                    serie['buckets'][i] += 1
+
+    def registar_consulta_lenta(self, statement, duracao_ms):
+        self.consultas_lentas.append({'sql': statement, 'duracao_ms': round(duracao_ms, 2), 'quando': time.time()})
+        logger_sql_lento.warning('Consulta lenta (%.1f ms): %s', duracao_ms, statement)
+
+    def endpoints(self):
+        with self._lock:
+            return {nome: dict(serie, buckets=list(serie['buckets'])) for nome, serie in self._endpoints.items()}
+
+
+# --- Recolha durante o pedido ---
+
+def _acumular(campo, valor):
+    if has_app_context() and 'metricas_pedido' in g:
+        g.metricas_pedido[campo] += valor
+
+
+def _antes_da_consulta(conn, cursor, statement, parameters, context, executemany):
+    # Guardado no contexto da instrução (e não na ligação): se a consulta
+    # falhar, o after_cursor_execute não corre e o início vai-se com o contexto
+    if context is not None:
+        context._metricas_inicio = time.perf_counter()
+
+
+def _depois_da_consulta(conn, cursor, statement, parameters, context, executemany):
+    inicio = getattr(context, '_metricas_inicio', None)
+    if inicio is None:
+        return
+    duracao_ms = (time.perf_counter() - inicio) * 1000
+    _acumular('consultas', 1)
+    _acumular('tempo_bd_ms', duracao_ms)
+    if has_app_context():
+        metricas = current_app.extensions.get('metricas')
+        if metricas and duracao_ms >= metricas.limite_sql_lento_ms:
+            metricas.registar_consulta_lenta(statement, duracao_ms)
+
+
+def registar_tempo_sdk(operacao, duracao_ms):
+    _acumular('tempo_sdk_ms', duracao_ms)
+
+
+def _inicio_pedido():
+    g.metricas_pedido = {'inicio': time.perf_counter(), 'consultas': 0, 'tempo_bd_ms': 0.0, 'tempo_sdk_ms': 0.0}
+
+    config = current_app.config
+    taxa = config['PERFIL_AMOSTRAGEM']
+    pedido_explicito = request.args.get('_perfil') == '1' and current_user.is_authenticated and current_user.is_admin
+    if pedido_explicito or (taxa and random.random() < taxa):
+        g.perfil = cProfile.Profile()
+        g.perfil.enable()
+
+
+def _fim_pedido(response):
+    dados = g.pop('metricas_pedido', None)
+    if dados is None:
+        return response
+    duracao_ms = (time.perf_counter() - dados['inicio']) * 1000
+    endpoint = request.endpoint or 'desconhecido'
+    metricas = current_app.extensions['metricas']
+    metricas.registar_pedido(endpoint, response.status_code, duracao_ms,
+                             dados['consultas'], dados['tempo_bd_ms'], dados['tempo_sdk_ms'])
+
+    perfil = g.pop('perfil', None)
+    if perfil is not None:
+        perfil.disable()
+        _guardar_perfil(metricas, perfil, endpoint, duracao_ms)
+    return response
+
+
+def _guardar_perfil(metricas, perfil, endpoint, duracao_ms):
+    resumo = io.StringIO()
+    pstats.Stats(perfil, stream=resumo).sort_stats('cumulative').print_stats(25)
+    ficheiro = None
+    diretorio = current_app.config['PERFIL_DIRETORIO']
+    if diretorio:
+        os.makedirs(diretorio, exist_ok=True)
+        ficheiro = os.path.join(diretorio, f"{endpoint}-{int(time.time() * 1000)}.prof")
+        perfil.dump_stats(ficheiro)
+    metricas.perfis.appendleft({
+        'endpoint': endpoint,
+        'caminho': request.full_path,
+        'duracao_ms': round(duracao_ms, 2),
+        'ficheiro': ficheiro,
+        'resumo': resumo.getvalue(),
+    })
+
+
+def init_instrumentacao(app):
+    """Liga a recolha de métricas à app (eventos do SQLAlchemy e do Flask)."""
+    app.extensions['metricas'] = MetricasPedidos(limite_sql_lento_ms=app.config['SQL_LENTO_MS'])
+    if not getattr(init_instrumentacao, '_eventos_ligados', False):
+        # Os eventos ficam na classe Engine, por isso cobrem também os binds
+        event.listen(Engine, 'before_cursor_execute', _antes_da_consulta)
+        event.listen(Engine, 'after_cursor_execute', _depois_da_consulta)
+        init_instrumentacao._eventos_ligados = True
+    app.before_request(_inicio_pedido)
+    app.after_request(_fim_pedido)
+
+
+# --- Exportação no formato de texto do Prometheus ---
+
+def _rotulos(**rotulos):
+    return '{' + ','.join(f'{nome}="{valor}"' for nome, valor in rotulos.items()) + '}'
+
+
+def exportar_prometheus(app):
+    linhas = []
+    endpoints = app.extensions['metricas'].endpoints()
+
+    linhas.append('# TYPE loja_pedidos_total counter')
+    for endpoint, serie in endpoints.items():
+        linhas.append(f"loja_pedidos_total{_rotulos(endpoint=endpoint)} {serie['pedidos']}")
+    linhas.append('# TYPE loja_pedidos_erros_total counter')
+    for endpoint, serie in endpoints.items():
+        linhas.append(f"loja_pedidos_erros_total{_rotulos(endpoint=endpoint)} {serie['erros']}")
+
+    linhas.append('# TYPE loja_pedido_duracao_ms histogram')
+    for endpoint, serie in endpoints.items():
+        for limite, contagem in zip(BUCKETS_DURACAO_MS, serie['buckets']):
+            le = '+Inf' if limite == float('inf') else limite
+            linhas.append(f"loja_pedido_duracao_ms_bucket{_rotulos(endpoint=endpoint, le=le)} {contagem}")
+        linhas.append(f"loja_pedido_duracao_ms_sum{_rotulos(endpoint=endpoint)} {serie['duracao_ms']:.3f}")
+        linhas.append(f"loja_pedido_duracao_ms_count{_rotulos(endpoint=endpoint)} {serie['pedidos']}")
+
+    for nome, campo in (('loja_consultas_bd_total', 'consultas'),
+                        ('loja_tempo_bd_ms_total', 'tempo_bd_ms'),
+                        ('loja_tempo_sdk_ms_total', 'tempo_sdk_ms')):
+        linhas.append(f'# TYPE {nome} counter')
+        for endpoint, serie in endpoints.items():
+            linhas.append(f"{nome}{_rotulos(endpoint=endpoint)} {round(serie[campo], 3)}")
+
+    linhas.append('# TYPE loja_cache_acertos_total counter')
+    linhas.append('# TYPE loja_cache_falhas_total counter')
+    for nome, cache in (('produtos', getattr(app, 'cache_produtos', None)),
+                        ('utilizadores', getattr(app, 'cache_utilizadores', None)),
+                        ('paginas', getattr(app, 'cache_paginas', None))):
+        if cache is not None:
+            estatisticas = cache.estatisticas()
+            linhas.append(f"loja_cache_acertos_total{_rotulos(cache=nome)} {estatisticas['acertos']}")
+            linhas.append(f"loja_cache_falhas_total{_rotulos(cache=nome)} {estatisticas['falhas']}")
+
+    # O SDK só é criado na primeira chamada ao Mercado Pago; até lá não há métricas
+    sdk = getattr(app, 'sdk', None)
+    cliente_mp = getattr(sdk, 'http_client', None) if getattr(sdk, 'criado', True) else None
+    if hasattr(cliente_mp, 'estatisticas'):
+        estatisticas = cliente_mp.estatisticas()
+        linhas.append('# TYPE loja_mercadopago_circuito_aberto gauge')
+        linhas.append(f"loja_mercadopago_circuito_aberto {int(estatisticas['circuito'] != 'fechado')}")
+        linhas.append('# TYPE loja_mercadopago_latencia_ms histogram')
+        for operacao, serie in estatisticas['latencias'].items():
+            for limite, contagem in serie['buckets'].items():
+                le = '+Inf' if limite == float('inf') else limite
+                linhas.append(f"loja_mercadopago_latencia_ms_bucket{_rotulos(operacao=operacao, le=le)} {contagem}")
+            linhas.append(f"loja_mercadopago_latencia_ms_sum{_rotulos(operacao=operacao)} {serie['soma_ms']:.3f}")
+            linhas.append(f"loja_mercadopago_latencia_ms_count{_rotulos(operacao=operacao)} {serie['total']}")
+
+    return '\n'.join(linhas) + '\n'
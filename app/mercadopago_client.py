@@ -0,0 +1,195 @@
+# app/mercadopago_client.py
+import re
+import threading
+import time
+import mercadopago
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+from mercadopago.config import RequestOptions
+from mercadopago.http import HttpClient
+
+URL_API_MERCADO_PAGO = 'https://api.mercadopago.com'
+_SEGMENTO_ID = re.compile(r'/\d[^/]*')
+
+# Limites (ms) dos buckets do histograma de latência
+BUCKETS_LATENCIA_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float('inf'))
+
+
+class CircuitoAberto(Exception):
+    """O Mercado Pago falhou demasiadas vezes seguidas; a chamada nem é feita."""
+
+
+class DisjuntorCircuito:
+    """Circuit breaker simples (fechado -> aberto -> meio-aberto).
+
+    Depois de `limite_falhas` falhas seguidas o circuito abre e as chamadas
+    falham logo com CircuitoAberto. Passados `tempo_reabertura` segundos deixa
+    passar uma chamada de teste: se correr bem fecha, senão volta a abrir.
+    """
+
+    def __init__(self, limite_falhas=5, tempo_reabertura=30):
+        self.limite_falhas = limite_falhas
+        self.tempo_reabertura = tempo_reabertura
+        self.falhas_seguidas = 0
+        self._aberto_ate = None
+        self._teste_em_curso = False
+        self._lock = threading.Lock()
+
+    @property
+    def estado(self):
+        with self._lock:
+            if self._aberto_ate is None:
+                return 'fechado'
+            return 'aberto' if time.monotonic() < self._aberto_ate else 'meio-aberto'
+
+    def antes_da_chamada(self):
+        with self._lock:
+            if self._aberto_ate is None:
+                return
+            if time.monotonic() < self._aberto_ate or self._teste_em_curso:
+                raise CircuitoAberto('Mercado Pago indisponível (circuito aberto).')
+            self._teste_em_curso = True
+
+    def registar_sucesso(self):
+        with self._lock:
+            self.falhas_seguidas = 0
+            self._aberto_ate = None
+            self._teste_em_curso = False
+
+    def registar_falha(self):
+        with self._lock:
+            self.falhas_seguidas += 1
+            self._teste_em_curso = False
+            if self._aberto_ate is not None or self.falhas_seguidas >= self.limite_falhas:
+                self._aberto_ate = time.monotonic() + self.tempo_reabertura
+
+
+class HistogramaLatencia:
+    """Histograma cumulativo de latências (ms) por operação."""
+
+    def __init__(self, buckets=BUCKETS_LATENCIA_MS):
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def registar(self, operacao, duracao_ms):
+        with self._lock:
+            serie = self._series.get(operacao)
+            if serie is None:
+                serie = self._series[operacao] = {'contagens': [0] * len(self.buckets), 'soma_ms': 0.0, 'total': 0}
+            for i, limite in enumerate(self.buckets):
+                if duracao_ms <= limite:
+                    serie['contagens'][i] += 1
+            serie['soma_ms'] += duracao_ms
+            serie['total'] += 1
+
+    def exportar(self):
+        with self._lock:
+            return {
+                operacao: {
+                    'buckets': dict(zip(self.buckets, serie['contagens'])),
+                    'soma_ms': serie['soma_ms'],
+                    'total': serie['total'],
+                }
+                for operacao, serie in self._series.items()
+            }
+
+
+class ClienteHttpMercadoPago(HttpClient):
+    """HttpClient do SDK com sessão reutilizada, timeouts e circuit breaker.
+
+    O HttpClient original cria uma requests.Session nova por chamada (sem
+    keep-alive) e usa o timeout de 60 s do SDK. Este mantém um pool de
+    ligações, aplica timeouts de ligação/leitura, só repete automaticamente
+    pedidos idempotentes e regista a latência de cada operação.
+    """
+
+    def __init__(self, url_base=URL_API_MERCADO_PAGO, timeout_conexao=3.05, timeout_leitura=10,
+                 max_tentativas=2, tamanho_pool=10, disjuntor=None):
+        self.url_base = url_base.rstrip('/')  # Permite apontar para o servidor falso (ver mercadopago_fake.py)
+        self.timeout = (timeout_conexao, timeout_leitura)
+        self.disjuntor = disjuntor or DisjuntorCircuito()
+        self.latencias = HistogramaLatencia()
+        self.ouvintes = []  # Chamados com (operacao, duracao_ms) no fim de cada chamada
+
+        tentativas = Retry(
+            total=max_tentativas,
+            backoff_factor=0.2,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset(['GET', 'PUT', 'DELETE']),  # POST cria recursos: não repete
+            raise_on_status=False,
+        )
+        adaptador = HTTPAdapter(pool_connections=tamanho_pool, pool_maxsize=tamanho_pool, max_retries=tentativas)
+        self.sessao = requests.Session()
+        self.sessao.mount('https://', adaptador)
+        self.sessao.mount('http://', adaptador)
+
+    def _operacao(self, method, url):
+        # Agrupa por recurso: /v1/payments/123 -> /v1/payments/:id
+        caminho = url.split('?', 1)[0][len(self.url_base):]
+        return f"{method} {_SEGMENTO_ID.sub('/:id', caminho)}"
+
+    def request(self, method, url, maxretries=None, **kwargs):
+        if url.startswith(URL_API_MERCADO_PAGO):
+            url = self.url_base + url[len(URL_API_MERCADO_PAGO):]
+        # Timeout por chamada: o SDK passa o connection_timeout do RequestOptions
+        # (ajustável em cada chamada), limitado ao timeout de leitura configurado
+        leitura = min(kwargs.get('timeout') or self.timeout[1], self.timeout[1])
+        kwargs['timeout'] = (self.timeout[0], leitura)
+
+        self.disjuntor.antes_da_chamada()
+        inicio = time.perf_counter()
+        # Qualquer saída sem resposta (erro de rede, timeout do gevent,
+        # KeyboardInterrupt...) conta como falha: senão a chamada de teste do
+        # estado meio-aberto ficaria marcada como em curso para sempre
+        resultado_registado = False
+        try:
+            api_result = self.sessao.request(method, url, **kwargs)
+            if api_result.status_code >= 500 or api_result.status_code == 429:
+                self.disjuntor.registar_falha()
+            else:
+                self.disjuntor.registar_sucesso()
+            resultado_registado = True
+        finally:
+            if not resultado_registado:
+                self.disjuntor.registar_falha()
+            operacao, duracao_ms = self._operacao(method, url), (time.perf_counter() - inicio) * 1000
+            self.latencias.registar(operacao, duracao_ms)
+            for ouvinte in self.ouvintes:
+                try:
+                    ouvinte(operacao, duracao_ms)
+                except Exception as e:
+                    print(f"🚨 Erro num ouvinte do cliente do Mercado Pago: {e}")
+
+        response = {"status": api_result.status_code, "response": None}
+        if api_result.status_code != 204 and api_result.content:
+            try:
+                response["response"] = api_result.json()
+            except ValueError:
+                response["response"] = None
+        return response
+
+    def estatisticas(self):
+        return {
+            'circuito': self.disjuntor.estado,
+            'falhas_seguidas': self.disjuntor.falhas_seguidas,
+            'latencias': self.latencias.exportar(),
+        }
+
+
+def criar_sdk(access_token, config):
+    """Cria o SDK do Mercado Pago com o cliente HTTP configurado em `config`."""
+    cliente = ClienteHttpMercadoPago(
+        url_base=config['MP_API_BASE_URL'],
+        timeout_conexao=config['MP_TIMEOUT_CONEXAO'],
+        timeout_leitura=config['MP_TIMEOUT_LEITURA'],
+        max_tentativas=config['MP_MAX_TENTATIVAS'],
+        tamanho_pool=config['MP_TAMANHO_POOL'],
+        disjuntor=DisjuntorCircuito(
+            limite_falhas=config['MP_CIRCUITO_LIMITE_FALHAS'],
+            tempo_reabertura=config['MP_CIRCUITO_TEMPO_REABERTURA'],
+        ),
+    )
+    opcoes = RequestOptions(connection_timeout=float(config['MP_TIMEOUT_LEITURA']), max_retries=config['MP_MAX_TENTATIVAS'])
+    return mercadopago.SDK(access_token, http_client=cliente, request_options=opcoes)
@@ -0,0 +1,122 @@
+# app/mercadopago_fake.py
+# Servidor falso da API do Mercado Pago, para testar a loja sem rede:
+#
+#   flask mp-fake-server --porta 8001 --latencia 0.2
+#   MP_API_BASE_URL=http://127.0.0.1:8001 flask run
+#
+# Implementa apenas o que a loja usa (preferências, consulta e pesquisa de
+# pagamentos), uma rota /fake/pagamentos para simular o pagamento de uma
+# preferência e /fake/pagamentos/lote para criar muitos pagamentos de uma vez.
+import itertools
+import random
+import threading
+import time
+import requests
+from flask import Flask, request, jsonify
+
+
+class EstadoFake:
+    def __init__(self):
+        self.preferencias = {}
+        self.pagamentos = {}
+        self.por_referencia = {}  # external_reference -> [pagamentos]
+        self._ids = itertools.count(1000000001)
+        self._lock = threading.Lock()
+
+    def novo_id(self):
+        with self._lock:
+            return next(self._ids)
+
+    def registar_pagamento(self, external_reference, status, valor=0):
+        payment_id = str(self.novo_id())
+        pagamento = {
+            'id': int(payment_id),
+            'status': status,
+            'external_reference': external_reference,
+            'transaction_amount': valor,
+            'date_created': time.strftime('%Y-%m-%dT%H:%M:%S.000-00:00', time.gmtime()),
+        }
+        with self._lock:
+            self.pagamentos[payment_id] = pagamento
+            self.por_referencia.setdefault(external_reference, []).append(pagamento)
+        return pagamento
+
+
+def criar_servidor_fake(latencia=0.0, taxa_erro=0.0, semente=None):
+    """Cria a app Flask do servidor falso.
+
+    `latencia` (s) atrasa todas as respostas; `taxa_erro` (0 a 1) é a
+    probabilidade de cada chamada responder 503, para exercitar as repetições
+    e o circuit breaker (`semente` torna o sorteio reprodutível).
+    """
+    if not 0 <= taxa_erro <= 1:
+        raise ValueError(f"taxa_erro tem de estar entre 0 e 1, não {taxa_erro}")
+    servidor = Flask(__name__)
+    estado = EstadoFake()
+    servidor.estado = estado
+    aleatorio = random.Random(semente)
+
+    @servidor.before_request
+    def simular_rede():
+        if latencia:
+            time.sleep(latencia)
+        if taxa_erro and request.path.startswith(('/v1/', '/checkout/')):
+            if aleatorio.random() < taxa_erro:
+                return jsonify({'message': 'Serviço indisponível (simulado)'}), 503
+
+    @servidor.post('/checkout/preferences')
+    def criar_preferencia():
+        dados = request.get_json(force=True) or {}
+        preferencia_id = f"{estado.novo_id()}-fake"
+        dados['id'] = preferencia_id
+        dados['init_point'] = f"{request.host_url}fake/checkout/{preferencia_id}"
+        estado.preferencias[preferencia_id] = dados
+        return jsonify(dados), 201
+
+    @servidor.get('/v1/payments/<payment_id>')
+    def obter_pagamento(payment_id):
+        pagamento = estado.pagamentos.get(str(payment_id))
+        if pagamento is None:
+            return jsonify({'message': 'Payment not found', 'status': 404}), 404
+        return jsonify(pagamento)
+
+    @servidor.get('/v1/payments/search')
+    def procurar_pagamentos():
+        referencia = request.args.get('external_reference')
+        if referencia is None:
+            resultados = list(estado.pagamentos.values())
+        else:
+            resultados = estado.por_referencia.get(referencia, [])
+        return jsonify({'results': resultados, 'paging': {'total': len(resultados), 'offset': 0, 'limit': len(resultados)}})
+
+    @servidor.post('/fake/pagamentos')
+    def simular_pagamento():
+        # Corpo: {"preference_id": "...", "status": "approved", "notificar": true}
+        dados = request.get_json(force=True) or {}
+        preferencia = estado.preferencias.get(dados.get('preference_id'))
+        if preferencia is None:
+            return jsonify({'message': 'Preferência desconhecida'}), 404
+        pagamento = estado.registar_pagamento(
+            preferencia.get('external_reference'),
+            dados.get('status', 'approved'),
+            sum(i['unit_price'] * i['quantity'] for i in preferencia.get('items', [])),
+        )
+        payment_id = str(pagamento['id'])
+        if dados.get('notificar') and preferencia.get('notification_url'):
+            requests.post(
+                preferencia['notification_url'],
+                json={'type': 'payment', 'action': 'payment.created', 'data': {'id': payment_id}},
+                timeout=5,
+            )
+        return jsonify(pagamento), 201
+
+    @servidor.post('/fake/pagamentos/lote')
+    def simular_pagamentos_em_lote():
+        # Corpo: [{"external_reference": "...", "status": "approved"}, ...], sem
+        # preferência nem notificação (ex.: pagamentos cujo webhook se perdeu)
+        dados = request.get_json(force=True) or []
+        for item in dados:
+            estado.registar_pagamento(item['external_reference'], item.get('status', 'approved'), item.get('valor', 0))
+        return jsonify({'criados': len(dados)}), 201
+
+    return servidor
@@ -9,6 +9,18 @@ class Produto(db.Model):
     nome = db.Column(db.String(100), nullable=False)
     preco = db.Column(db.Numeric(10, 2), nullable=False)
     imagem = db.Column(db.String(200), nullable=True)
+    # Unidades disponíveis para venda (já sem as reservadas por pedidos
+    # pendentes); NULL = sem controlo de estoque. Ver app/estoque.py
+    estoque = db.Column(db.Integer, nullable=True)
+
+    # Índices compostos usados pela paginação por cursor do catálogo (app/catalog.py)
+    __table_args__ = (
+        db.Index('ix_produto_preco_id', 'preco', 'id'),
+        db.Index('ix_produto_nome_id', 'nome', 'id'),
+        # Só os vendidos a mais (estoque negativo), listados no painel
+        db.Index('ix_produto_estoque_negativo', 'estoque', 'id',
+                 sqlite_where=db.text('estoque < 0'), postgresql_where=db.text('estoque < 0')),
+    )
 
     def __repr__(self):
         return f'<Produto {self.nome}>'
@@ -33,21 +45,201 @@ class Pedido(db.Model):
     status = db.Column(db.String(30), nullable=False, default='Pendente')
     total = db.Column(db.Numeric(10, 2), nullable=False)
     token = db.Column(db.String(64), nullable=False)  # 🔑 Token único para validar retorno seguro
+    chave_idempotencia = db.Column(db.String(64), nullable=True, index=True)  # Utilizador + conteúdo do carrinho
+    preference_id = db.Column(db.String(100), nullable=True)  # Preferência criada no Mercado Pago
+    referencia_externa = db.Column(db.String(64), nullable=True)  # external_reference enviada ao Mercado Pago
 
     # Relação: um pedido pode ter vários itens
     itens = db.relationship('ItemPedido', backref='pedido', lazy=True, cascade="all, delete-orphan")
+
+    # Índices usados pelo histórico de pedidos do utilizador e pelas tarefas
+    # que percorrem pedidos num estado (app/pedidos.py)
+    __table_args__ = (
+        db.Index('ix_pedido_user_id_data_pedido', 'user_id', 'data_pedido'),
+        db.Index('ix_pedido_status_data_pedido', 'status', 'data_pedido'),
+        db.Index('ix_pedido_data_pedido', 'data_pedido'),  # Filtro por data no admin
+        # Um só pedido 'Pendente' por carrinho: dois checkouts simultâneos com
+        # o mesmo carrinho não criam dois pedidos (ver criar_pedido)
+        db.Index('uq_pedido_pendente_chave', 'user_id', 'chave_idempotencia', unique=True,
+                 sqlite_where=db.text("status = 'Pendente'"), postgresql_where=db.text("status = 'Pendente'")),
+        # Os ids passam para o arquivo (app/arquivo.py): no SQLite, sem
+        # AUTOINCREMENT, os ids das linhas apagadas podiam voltar a ser usados
+        {'sqlite_autoincrement': True},
+    )
     
     def __repr__(self):
         return f'<Pedido {self.id}>'
 
 class ItemPedido(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    pedido_id = db.Column(db.Integer, db.ForeignKey('pedido.id'), nullable=False)
-    produto_id = db.Column(db.Integer, db.ForeignKey('produto.id'), nullable=False)
+    pedido_id = db.Column(db.Integer, db.ForeignKey('pedido.id'), nullable=False, index=True)
+    produto_id = db.Column(db.Integer, db.ForeignKey('produto.id'), nullable=False, index=True)
     quantidade = db.Column(db.Integer, nullable=False)
     preco_unitario = db.Column(db.Numeric(10, 2), nullable=False)
 
     produto = db.relationship('Produto')
 
+    # Ids copiados para o arquivo, como os de Pedido
+    __table_args__ = {'sqlite_autoincrement': True}
+
     def __repr__(self):
         return f'<ItemPedido {self.id}>'
+
+
+class NotificacaoWebhook(db.Model):
+    __tablename__ = 'notificacao_webhook'
+
+    id = db.Column(db.Integer, primary_key=True)
+    payment_id = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # Corpo original da notificação, em JSON
+    status = db.Column(db.String(20), nullable=False, default='pendente')
+    tentativas = db.Column(db.Integer, nullable=False, default=0)
+    proxima_tentativa = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    recebida_em = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    ultimo_erro = db.Column(db.Text, nullable=True)
+
+    # A fila é consumida por (status, proxima_tentativa) e deduplicada por payment_id
+    __table_args__ = (
+        db.Index('ix_notificacao_webhook_status_proxima', 'status', 'proxima_tentativa'),
+        db.Index('ix_notificacao_webhook_payment_id', 'payment_id'),
+    )
+
+    def __repr__(self):
+        return f'<NotificacaoWebhook {self.id} payment={self.payment_id}>'
+
+class Carrinho(db.Model):
+    # Carrinho guardado no servidor (CART_BACKEND='banco'); a sessão só tem a chave
+    chave = db.Column(db.String(32), primary_key=True)
+    quantidade_itens = db.Column(db.Integer, nullable=False, default=0)
+    atualizado_em = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Carrinho {self.chave}>'
+
+class ItemCarrinho(db.Model):
+    __tablename__ = 'item_carrinho'
+
+    chave = db.Column(db.String(32), db.ForeignKey('carrinho.chave'), primary_key=True)
+    produto_id = db.Column(db.Integer, db.ForeignKey('produto.id'), primary_key=True)
+    quantidade = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<ItemCarrinho {self.chave} produto={self.produto_id}>'
+
+class HistoricoStatusPedido(db.Model):
+    # Uma linha por transição de estado aplicada por transitar_status (app/pedidos.py)
+    __tablename__ = 'historico_status_pedido'
+
+    id = db.Column(db.Integer, primary_key=True)
+    pedido_id = db.Column(db.Integer, db.ForeignKey('pedido.id'), nullable=False, index=True)
+    status_anterior = db.Column(db.String(30), nullable=False)
+    status_novo = db.Column(db.String(30), nullable=False)
+    origem = db.Column(db.String(30), nullable=False)  # webhook, retorno, admin, ...
+    registado_em = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+    # Ids copiados para o arquivo, como os de Pedido
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    def __repr__(self):
+        return f'<HistoricoStatusPedido {self.pedido_id}: {self.status_anterior} -> {self.status_novo}>'
+
+# Agregados de vendas mantidos por app/relatorios.py: atualizados quando um
+# pedido passa a 'Pago' (ou sai dele) e recalculáveis com 'flask recalcular-relatorios'
+class VendaDiaria(db.Model):
+    __tablename__ = 'venda_diaria'
+
+    dia = db.Column(db.Date, primary_key=True)  # Dia do pedido (UTC)
+    pedidos = db.Column(db.Integer, nullable=False, default=0)
+    receita = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<VendaDiaria {self.dia}>'
+
+class VendaProduto(db.Model):
+    __tablename__ = 'venda_produto'
+
+    produto_id = db.Column(db.Integer, db.ForeignKey('produto.id'), primary_key=True)
+    unidades = db.Column(db.Integer, nullable=False, default=0, index=True)  # Mais vendidos
+    receita = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+
+    produto = db.relationship('Produto')
+
+    def __repr__(self):
+        return f'<VendaProduto {self.produto_id}>'
+
+# Pedidos arquivados por estado (os ativos contam-se pelo índice de estado)
+class ContagemStatusPedido(db.Model):
+    __tablename__ = 'contagem_status_pedido'
+
+    status = db.Column(db.String(30), primary_key=True)
+    pedidos = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ContagemStatusPedido {self.status}: {self.pedidos}>'
+
+# Arquivo: pedidos concluídos há mais tempo do que a retenção saem de pedido,
+# item_pedido e historico_status_pedido para estas tabelas (mesmas colunas e
+# mesmos ids), ver app/arquivo.py. O histórico em /minha_conta lê as duas.
+class PedidoArquivado(db.Model):
+    __tablename__ = 'pedido_arquivado'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    data_pedido = db.Column(db.DateTime, nullable=False)
+    status = db.Column(db.String(30), nullable=False)
+    total = db.Column(db.Numeric(10, 2), nullable=False)
+    token = db.Column(db.String(64), nullable=False)
+    chave_idempotencia = db.Column(db.String(64), nullable=True)
+    preference_id = db.Column(db.String(100), nullable=True)
+    referencia_externa = db.Column(db.String(64), nullable=True)
+    arquivado_em = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+    itens = db.relationship('ItemPedidoArquivado', backref='pedido', lazy=True, cascade="all, delete-orphan")
+
+    __table_args__ = (
+        db.Index('ix_pedido_arquivado_user_id_data_pedido', 'user_id', 'data_pedido'),
+    )
+
+    def __repr__(self):
+        return f'<PedidoArquivado {self.id}>'
+
+class ItemPedidoArquivado(db.Model):
+    __tablename__ = 'item_pedido_arquivado'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    pedido_id = db.Column(db.Integer, db.ForeignKey('pedido_arquivado.id'), nullable=False, index=True)
+    produto_id = db.Column(db.Integer, db.ForeignKey('produto.id'), nullable=False)
+    quantidade = db.Column(db.Integer, nullable=False)
+    preco_unitario = db.Column(db.Numeric(10, 2), nullable=False)
+
+    produto = db.relationship('Produto')
+
+    def __repr__(self):
+        return f'<ItemPedidoArquivado {self.id}>'
+
+class HistoricoStatusPedidoArquivado(db.Model):
+    __tablename__ = 'historico_status_pedido_arquivado'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    pedido_id = db.Column(db.Integer, db.ForeignKey('pedido_arquivado.id'), nullable=False, index=True)
+    status_anterior = db.Column(db.String(30), nullable=False)
+    status_novo = db.Column(db.String(30), nullable=False)
+    origem = db.Column(db.String(30), nullable=False)
+    registado_em = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<HistoricoStatusPedidoArquivado {self.pedido_id}: {self.status_anterior} -> {self.status_novo}>'
+
+# Unidades tiradas ao estoque por um pedido 'Pendente' (app/estoque.py): são
+# devolvidas se o pedido expirar ou for cancelado e apagadas quando é pago.
+class ReservaEstoque(db.Model):
+    __tablename__ = 'reserva_estoque'
+
+    id = db.Column(db.Integer, primary_key=True)
+    pedido_id = db.Column(db.Integer, db.ForeignKey('pedido.id'), nullable=False, index=True)
+    produto_id = db.Column(db.Integer, db.ForeignKey('produto.id'), nullable=False)
+    quantidade = db.Column(db.Integer, nullable=False)
+    expira_em = db.Column(db.DateTime, nullable=False, index=True)  # Procurado por 'flask limpar-pedidos'
+
+    def __repr__(self):
+        return f'<ReservaEstoque {self.pedido_id}: {self.quantidade}x {self.produto_id}>'
\ No newline at end of file
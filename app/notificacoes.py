@@ -0,0 +1,160 @@
+# app/notificacoes.py
+# Mudanças de estado dos pedidos para quem está à espera delas (a página de
+# pagamento, por /eventos_pagamento).
+#
+# No Postgres, transitar_status faz NOTIFY no canal CANAL_PEDIDOS na mesma
+# transação do UPDATE; cada processo da loja com eventos abertos tem uma
+# thread em LISTEN que passa as mudanças à central do processo. Assim o
+# pagamento aplicado pelo worker da fila de webhooks (outro processo) chega
+# logo ao navegador. No SQLite as mudanças de outros processos só são vistas
+# pela verificação periódica no banco.
+import json
+import select
+import threading
+import time
+
+CANAL_PEDIDOS = 'pedido_status'
+# Ids por NOTIFY: o payload do Postgres tem um limite de 8000 bytes
+_IDS_POR_NOTIFY = 500
+
+
+class CentralNotificacoes:
+    """Central de notificações em memória para mudanças de estado de pedidos.
+
+    Quem espera por um pedido chama assinar() antes de ler o estado no banco
+    e cancelar() no fim; publicar() só guarda o estado dos pedidos que têm
+    alguém à espera, por isso a memória não cresce com o número de pedidos.
+    É por processo: as mudanças feitas noutros processos chegam pelo
+    OuvintePostgres (ou pela verificação periódica no banco).
+    """
+
+    def __init__(self):
+        self._condicao = threading.Condition()
+        self._assinantes = {}
+        self._estados = {}
+
+    def assinar(self, pedido_id):
+        with self._condicao:
+            self._assinantes[pedido_id] = self._assinantes.get(pedido_id, 0) + 1
+
+    def cancelar(self, pedido_id):
+        with self._condicao:
+            restantes = self._assinantes.get(pedido_id, 0) - 1
+            if restantes > 0:
+                self._assinantes[pedido_id] = restantes
+            else:
+                self._assinantes.pop(pedido_id, None)
+                self._estados.pop(pedido_id, None)
+
+    def publicar(self, pedido_id, status):
+        with self._condicao:
+            if pedido_id in self._assinantes:
+                self._estados[pedido_id] = status
+                self._condicao.notify_all()
+
+    def aguardar(self, pedido_id, status_atual, timeout):
+        """Espera até `timeout` segundos por um estado diferente de `status_atual`.
+
+        Devolve o novo estado, ou None se nada foi publicado entretanto.
+        """
+        with self._condicao:
+            mudou = self._condicao.wait_for(
+                lambda: self._estados.get(pedido_id, status_atual) != status_atual,
+                timeout,
+            )
+            return self._estados.get(pedido_id) if mudou else None
+
+
+def notificar_transicao(sessao, pedido_ids, status):
+    """NOTIFY da mudança de estado, entregue só quando a transação fizer commit.
+
+    Chamada por transitar_status; não faz nada fora do Postgres.
+    """
+    from sqlalchemy import func, select
+    from app.models import Pedido
+
+    if not pedido_ids or sessao.get_bind(mapper=Pedido.__mapper__).dialect.name != 'postgresql':
+        return
+    for inicio in range(0, len(pedido_ids), _IDS_POR_NOTIFY):
+        payload = json.dumps({'status': status, 'ids': list(pedido_ids[inicio:inicio + _IDS_POR_NOTIFY])})
+        sessao.execute(select(func.pg_notify(CANAL_PEDIDOS, payload)))
+
+
+def entregar_notificacao(central, payload):
+    dados = json.loads(payload)
+    for pedido_id in dados['ids']:
+        central.publicar(pedido_id, dados['status'])
+
+
+class OuvintePostgres:
+    """Thread com uma ligação própria em LISTEN CANAL_PEDIDOS.
+
+    Passa cada NOTIFY à `central` do processo. Se a ligação cair, volta a
+    ligar-se passados `espera_religar` segundos; entretanto as páginas
+    continuam a ver as mudanças pela verificação periódica no banco.
+    """
+
+    def __init__(self, url, central, espera_religar=5):
+        self.url = url
+        self.central = central
+        self.espera_religar = espera_religar
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def iniciar(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._correr, name='ouvinte-pedidos', daemon=True)
+                self._thread.start()
+
+    def _ligar(self):
+        from sqlalchemy import create_engine
+        from sqlalchemy.pool import NullPool
+
+        # Fora do pool da aplicação: a ligação fica presa ao LISTEN
+        conexao = create_engine(self.url, poolclass=NullPool).raw_connection().driver_connection
+        conexao.autocommit = True
+        conexao.cursor().execute(f'LISTEN {CANAL_PEDIDOS}')
+        return conexao
+
+    def _correr(self):
+        while True:
+            try:
+                conexao = self._ligar()
+                try:
+                    while True:
+                        # Com o gevent, o select cede o controlo aos outros greenlets
+                        if select.select([conexao], [], [], 60) == ([], [], []):
+                            continue
+                        conexao.poll()
+                        while conexao.notifies:
+                            entregar_notificacao(self.central, conexao.notifies.pop(0).payload)
+                finally:
+                    conexao.close()
+            except Exception as e:
+                print(f"🚨 Ouvinte de estados dos pedidos desligado: {e}")
+                time.sleep(self.espera_religar)
+
+
+def garantir_ouvinte(app):
+    """Arranca (uma vez por processo) o OuvintePostgres, se o banco for Postgres."""
+    from app import db
+
+    with _lock_ouvinte:
+        ouvinte = getattr(app, 'ouvinte_pedidos', None)
+        if ouvinte is None:
+            engine = db.engine
+            if engine.dialect.name != 'postgresql':
+                return None
+            ouvinte = app.ouvinte_pedidos = OuvintePostgres(
+                engine.url.render_as_string(hide_password=False), central_pagamentos,
+            )
+    ouvinte.iniciar()
+    return ouvinte
+
+
+_lock_ouvinte = threading.Lock()
+
+
+# Instância partilhada pelo processo (rotas, webhook e retorno do pagamento)
+central_pagamentos = CentralNotificacoes()
@@ -0,0 +1,247 @@
+# app/pedidos.py
+import datetime
+import hashlib
+import math
+import secrets
+import time
+from sqlalchemy import func, insert, literal, select, union_all, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from app import db
+from app.models import Pedido, ItemPedido, HistoricoStatusPedido, PedidoArquivado, ItemPedidoArquivado
+from app.relatorios import registar_transicao
+from app.estoque import reservar_estoque, liberar_reservas, aplicar_transicao
+from app.notificacoes import notificar_transicao
+
+# Máquina de estados do pedido: estado novo -> estados de onde se pode chegar a ele.
+# Um pagamento aprovado depois de o pedido expirar (flask limpar-pedidos) ainda
+# conta: o cliente pagou.
+TRANSICOES = {
+    'Pago': ('Pendente', 'Expirado'),
+    'Cancelado': ('Pendente',),
+    'Expirado': ('Pendente',),
+    'Reembolsado': ('Pago',),
+}
+
+
+class TransicaoInvalida(ValueError):
+    pass
+
+
+class PedidoDuplicado(Exception):
+    """Já existe um pedido 'Pendente' do utilizador com a mesma chave de idempotência."""
+
+    def __init__(self, pedido_id):
+        super().__init__(f"Já existe o pedido pendente {pedido_id} para este carrinho")
+        self.pedido_id = pedido_id
+
+
+# Espera máxima (s) pela preferência de outro pedido HTTP: o worker sync fica
+# parado enquanto espera, por isso fica bem abaixo do timeout do Gunicorn
+ESPERA_PREFERENCIA_MAXIMA = 5
+
+
+class PaginaHistorico:
+    """Página do histórico com os mesmos atributos que o template usa de db.paginate."""
+
+    def __init__(self, items, page, per_page, total):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+        self.pages = math.ceil(total / per_page) if total else 0
+        self.has_prev = page > 1
+        self.has_next = page < self.pages
+        self.prev_num = page - 1 if self.has_prev else None
+        self.next_num = page + 1 if self.has_next else None
+
+
+def historico_pedidos(user_id, pagina=1, por_pagina=10):
+    """Página do histórico de pedidos de um utilizador, incluindo os arquivados.
+
+    A ordem e a página são decididas por um UNION ALL só com (id, data) das
+    duas tabelas, cada lado servido pelo índice (user_id, data_pedido); depois
+    carregam-se apenas os pedidos da página, com os itens e os produtos por
+    selectinload. O número de consultas é sempre o mesmo (ver
+    tests/test_historico_pedidos.py), mas a contagem do total e o OFFSET
+    percorrem as entradas do índice de todos os pedidos do utilizador: o
+    custo cresce com o histórico dele, não com o tamanho das tabelas.
+    """
+    pagina = max(pagina, 1)
+    uniao = union_all(
+        select(Pedido.id, Pedido.data_pedido, literal(False).label('arquivado')).where(Pedido.user_id == user_id),
+        select(PedidoArquivado.id, PedidoArquivado.data_pedido, literal(True).label('arquivado'))
+        .where(PedidoArquivado.user_id == user_id),
+    ).subquery()
+    total = db.session.scalar(select(func.count()).select_from(uniao))
+    linhas = db.session.execute(
+        select(uniao.c.id, uniao.c.arquivado)
+        .order_by(uniao.c.data_pedido.desc(), uniao.c.id.desc())
+        .limit(por_pagina)
+        .offset((pagina - 1) * por_pagina)
+    ).all()
+
+    carregados = {}
+    for arquivado, modelo, item in ((False, Pedido, ItemPedido), (True, PedidoArquivado, ItemPedidoArquivado)):
+        ids = [linha.id for linha in linhas if bool(linha.arquivado) == arquivado]
+        if ids:
+            pedidos = db.session.scalars(
+                select(modelo).where(modelo.id.in_(ids))
+                .options(selectinload(modelo.itens).selectinload(item.produto))
+            ).all()
+            carregados.update(((arquivado, pedido.id), pedido) for pedido in pedidos)
+    itens = [carregados[(bool(linha.arquivado), linha.id)] for linha in linhas]
+    return PaginaHistorico(itens, pagina, por_pagina, total)
+
+
+def chave_idempotencia(user_id, produtos, carrinho):
+    """Chave do checkout: o mesmo utilizador com o mesmo carrinho (produtos,
+    quantidades e preços) gera sempre a mesma chave."""
+    linhas = sorted(f"{p.id}:{carrinho[p.id]}:{p.preco}" for p in produtos)
+    bruto = f"{user_id}|" + ";".join(linhas)
+    return hashlib.sha256(bruto.encode('utf-8')).hexdigest()
+
+
+def pedido_pendente_recente(user_id, janela, chave=None):
+    """Último pedido 'Pendente' do utilizador criado há menos de `janela` segundos.
+
+    Com `chave`, procura o pedido desse carrinho; sem ela, o último pedido que
+    já tem preferência (ex.: a página de pagamento foi recarregada depois de o
+    carrinho ser limpo).
+    """
+    limite = datetime.datetime.utcnow() - datetime.timedelta(seconds=janela)
+    query = Pedido.query.filter(
+        Pedido.user_id == user_id,
+        Pedido.status == 'Pendente',
+        Pedido.data_pedido >= limite,
+    )
+    if chave is not None:
+        query = query.filter(Pedido.chave_idempotencia == chave)
+    else:
+        query = query.filter(Pedido.preference_id.isnot(None))
+    return query.order_by(Pedido.data_pedido.desc(), Pedido.id.desc()).first()
+
+
+def aguardar_preferencia(pedido_id, timeout, intervalo=0.2):
+    """Espera que outro pedido HTTP termine de criar a preferência deste pedido.
+
+    Devolve o preference_id, ou None se não aparecer dentro do `timeout`
+    (limitado a ESPERA_PREFERENCIA_MAXIMA).
+    """
+    limite = time.monotonic() + min(timeout, ESPERA_PREFERENCIA_MAXIMA)
+    while True:
+        preference_id = db.session.query(Pedido.preference_id).filter_by(id=pedido_id).scalar()
+        db.session.commit()  # Termina a transação para a próxima leitura ver dados novos
+        if preference_id or time.monotonic() >= limite:
+            return preference_id
+        time.sleep(intervalo)
+
+
+def criar_pedido(user_id, produtos, carrinho, chave, validade_reserva, janela_idempotencia=None):
+    """Grava o pedido 'Pendente' e os itens (numa só inserção em lote) e
+    reserva o estoque durante `validade_reserva` segundos.
+
+    Só pode haver um pedido 'Pendente' por utilizador e `chave` (índice
+    único parcial): se outro pedido HTTP o gravou primeiro, levanta
+    PedidoDuplicado. Os pendentes com a mesma chave criados há mais de
+    `janela_idempotencia` segundos (que já não são reutilizados) passam a
+    'Expirado'. Se algum produto não tiver estoque, desfaz tudo e levanta
+    EstoqueInsuficiente (app/estoque.py).
+    """
+    if not produtos:
+        raise ValueError("Um pedido precisa de pelo menos um produto")
+    if chave is not None and janela_idempotencia is not None:
+        limite = datetime.datetime.utcnow() - datetime.timedelta(seconds=janela_idempotencia)
+        antigos = db.session.scalars(
+            select(Pedido.id).where(Pedido.user_id == user_id, Pedido.chave_idempotencia == chave,
+                                    Pedido.status == 'Pendente', Pedido.data_pedido < limite)
+        ).all()
+        transitar_status(antigos, 'Expirado', 'checkout', Pedido.data_pedido < limite)
+    pedido = Pedido(
+        user_id=user_id,
+        total=sum(p.preco * carrinho[p.id] for p in produtos),
+        status='Pendente',
+        token=secrets.token_hex(16),
+        chave_idempotencia=chave,
+    )
+    db.session.add(pedido)
+    try:
+        db.session.flush()  # Para obter o ID do pedido antes de inserir os itens
+    except IntegrityError:
+        db.session.rollback()
+        existente = db.session.scalar(
+            select(Pedido.id).where(Pedido.user_id == user_id, Pedido.chave_idempotencia == chave,
+                                    Pedido.status == 'Pendente')
+        )
+        if existente is None:
+            raise
+        raise PedidoDuplicado(existente)
+    db.session.execute(insert(ItemPedido), [
+        {
+            'pedido_id': pedido.id,
+            'produto_id': produto.id,
+            'quantidade': carrinho[produto.id],
+            'preco_unitario': produto.preco,
+        }
+        for produto in produtos
+    ])
+    try:
+        reservar_estoque(pedido.id, {produto.id: carrinho[produto.id] for produto in produtos}, validade_reserva)
+    except Exception:
+        db.session.rollback()
+        raise
+    db.session.commit()
+    return pedido
+
+
+def descartar_pedido(pedido_id):
+    liberar_reservas([pedido_id])
+    ItemPedido.query.filter_by(pedido_id=pedido_id).delete()
+    # Só é usado para o pedido 'Pendente' cuja preferência falhou ao ser criada
+    Pedido.query.filter_by(id=pedido_id).delete()
+    db.session.commit()
+
+
+def transitar_status(pedido_ids, status_novo, origem, *condicoes):
+    """Muda o estado dos pedidos com um UPDATE condicional por estado de origem.
+
+    Só os pedidos que estão num dos estados de origem permitidos (ver
+    TRANSICOES) e cumprem as `condicoes` extra são alterados; o próprio banco
+    decide quem ganha quando duas transições concorrem, sem ler o pedido antes.
+    Regista cada mudança em HistoricoStatusPedido, atualiza os agregados de
+    vendas (app/relatorios.py) e o estoque reservado (app/estoque.py), avisa
+    os outros processos no commit (app/notificacoes.py) e devolve a lista dos
+    ids alterados. Não faz commit.
+    """
+    if status_novo not in TRANSICOES:
+        raise TransicaoInvalida(f"Estado desconhecido: {status_novo}")
+    pedido_ids = list(pedido_ids)
+    if not pedido_ids:
+        return []
+
+    alterados = []
+    historico = []
+    for status_anterior in TRANSICOES[status_novo]:
+        ids = db.session.execute(
+            update(Pedido)
+            .where(Pedido.id.in_(pedido_ids), Pedido.status == status_anterior, *condicoes)
+            .values(status=status_novo)
+            .returning(Pedido.id),
+            execution_options={'synchronize_session': False},
+        ).scalars().all()
+        alterados.extend(ids)
+        registar_transicao(ids, status_anterior, status_novo)
+        aplicar_transicao(ids, status_anterior, status_novo)
+        notificar_transicao(db.session, ids, status_novo)
+        historico.extend(
+            {'pedido_id': pedido_id, 'status_anterior': status_anterior, 'status_novo': status_novo, 'origem': origem}
+            for pedido_id in ids
+        )
+    if historico:
+        db.session.execute(insert(HistoricoStatusPedido), historico)
+        # Os Pedido já carregados nesta sessão passam a ler o estado novo
+        for pedido_id in alterados:
+            pedido = db.session.identity_map.get(db.session.identity_key(Pedido, pedido_id))
+            if pedido is not None:
+                db.session.expire(pedido, ['status'])
+    return alterados
@@ -0,0 +1,477 @@
+# app/pesquisa.py
+# Pesquisa de produtos pelo nome, sem acentos nem maiúsculas ("calca" encontra
+# "Calça") e tolerante a erros de escrita ("camizeta" encontra "camiseta").
+#
+# O índice fica no banco e acompanha sozinho a tabela produto:
+#   - SQLite: tabela FTS5 produto_fts (conteúdo externo em produto), mantida
+#     por triggers, por isso também cobre as importações em massa;
+#   - Postgres: índices GIN de expressão (tsvector e trigramas) sobre
+#     loja_unaccent(nome).
+# As tabelas, os triggers e os índices são criados pela migração; em bancos
+# criados com db.create_all(), ou depois de uma migração que recrie a tabela
+# produto no SQLite (os triggers perdem-se), use 'flask reindexar-pesquisa'.
+#
+# Cada processo guarda em memória o vocabulário do catálogo numa trie
+# (VocabularioPesquisa), usada para completar a palavra que está a ser escrita
+# e para corrigir palavras que não existem. É construída na primeira
+# utilização, atualizada pelos commits deste processo e reconstruída em
+# segundo plano a cada PESQUISA_VOCABULARIO_TTL segundos, para apanhar as
+# alterações feitas por outros processos.
+import collections
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect as inspecionar, text
+from sqlalchemy.orm import Session
+from app import db
+from app.models import Produto
+
+_PALAVRA = re.compile(r'[^\W_]+')
+# Prefixos mais curtos do que isto não são expandidos (casariam meio catálogo)
+PREFIXO_MINIMO = 2
+
+# Objetos criados fora dos modelos (ver a migração); o autogenerate do
+# Alembic não os deve tentar apagar
+TABELAS_SQLITE = ('produto_fts', 'produto_fts_vocab')
+INDICES_POSTGRES = ('ix_produto_nome_tsv', 'ix_produto_nome_trgm')
+
+DDL_SQLITE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS produto_fts USING fts5("
+    "nome, content='produto', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS produto_fts_vocab USING fts5vocab(produto_fts, row)",
+    "CREATE TRIGGER IF NOT EXISTS produto_fts_ai AFTER INSERT ON produto BEGIN "
+    "INSERT INTO produto_fts(rowid, nome) VALUES (new.id, new.nome); END",
+    "CREATE TRIGGER IF NOT EXISTS produto_fts_ad AFTER DELETE ON produto BEGIN "
+    "INSERT INTO produto_fts(produto_fts, rowid, nome) VALUES ('delete', old.id, old.nome); END",
+    "CREATE TRIGGER IF NOT EXISTS produto_fts_au AFTER UPDATE OF nome ON produto BEGIN "
+    "INSERT INTO produto_fts(produto_fts, rowid, nome) VALUES ('delete', old.id, old.nome); "
+    "INSERT INTO produto_fts(rowid, nome) VALUES (new.id, new.nome); END",
+)
+
+DDL_POSTGRES = (
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # unaccent() não é IMMUTABLE, por isso não pode ir diretamente num índice
+    "CREATE OR REPLACE FUNCTION loja_unaccent(text) RETURNS text LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT "
+    "AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$",
+    "CREATE INDEX IF NOT EXISTS ix_produto_nome_tsv ON produto USING gin (to_tsvector('simple', loja_unaccent(nome)))",
+    "CREATE INDEX IF NOT EXISTS ix_produto_nome_trgm ON produto USING gin (loja_unaccent(lower(nome)) gin_trgm_ops)",
+)
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos ('Calça' -> 'calca'), como o tokenizer do FTS5."""
+    decomposto = unicodedata.normalize('NFKD', texto.lower())
+    return ''.join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def termos(texto):
+    return _PALAVRA.findall(normalizar(texto or ''))
+
+
+def distancia_maxima(termo):
+    # Erros tolerados por palavra: nenhum nas curtas, um nas médias, dois nas longas
+    if len(termo) <= 3:
+        return 0
+    return 1 if len(termo) <= 7 else 2
+
+
+def incluir_na_migracao(objeto, nome, tipo, refletido, comparado):
+    """include_object do Alembic: ignora o índice de pesquisa."""
+    if tipo == 'table' and nome and nome.startswith(TABELAS_SQLITE):
+        return False
+    if tipo == 'index' and nome in INDICES_POSTGRES:
+        return False
+    return True
+
+
+class _No:
+    __slots__ = ('filhos', 'contagem', 'melhor')
+
+    def __init__(self):
+        self.filhos = {}
+        self.contagem = 0  # Produtos cujo nome tem a palavra que acaba neste nó
+        self.melhor = 0    # Maior contagem nesta sub-árvore (ordena as sugestões)
+
+
+class VocabularioPesquisa:
+    """Trie das palavras do catálogo, com o número de produtos de cada uma.
+
+    Não é thread-safe por si; o IndicePesquisa protege-a com um lock.
+    """
+
+    def __init__(self):
+        self.raiz = _No()
+        self.palavras = 0
+
+    def somar(self, termo, quantidade):
+        if not termo or termo.isdigit():
+            return  # Números (tamanhos, códigos) pesquisam-se, mas não se sugerem
+        caminho = [self.raiz]
+        no = self.raiz
+        for letra in termo:
+            no = no.filhos.setdefault(letra, _No())
+            caminho.append(no)
+        antes = no.contagem
+        no.contagem = max(0, antes + quantidade)
+        self.palavras += (no.contagem > 0) - (antes > 0)
+        if quantidade > 0:
+            for no in caminho:
+                no.melhor = max(no.melhor, caminho[-1].contagem)
+            return
+        # Ao diminuir, o máximo de cada nó do caminho é recalculado de baixo
+        # para cima e os ramos que ficaram vazios são removidos
+        for indice in range(len(caminho) - 1, -1, -1):
+            no = caminho[indice]
+            no.melhor = max([no.contagem] + [filho.melhor for filho in no.filhos.values()])
+            if indice and not no.melhor:
+                del caminho[indice - 1].filhos[termo[indice - 1]]
+
+    def _no(self, prefixo):
+        no = self.raiz
+        for letra in prefixo:
+            no = no.filhos.get(letra)
+            if no is None:
+                return None
+        return no
+
+    def contagem(self, termo):
+        no = self._no(termo)
+        return no.contagem if no is not None else 0
+
+    def tem_prefixo(self, prefixo):
+        no = self._no(prefixo)
+        return no is not None and no.melhor > 0
+
+    def completar(self, prefixo, limite=8):
+        """As `limite` palavras mais frequentes que começam por `prefixo`.
+
+        Percorre a trie por ordem de `melhor`, por isso só visita os ramos que
+        podem conter uma das respostas, seja qual for o tamanho do catálogo.
+        """
+        inicio = self._no(prefixo)
+        if inicio is None or not inicio.melhor:
+            return []
+        resultado = []
+        fila = [(-inicio.melhor, prefixo, False, inicio)]
+        while fila and len(resultado) < limite:
+            _, palavra, completa, no = heapq.heappop(fila)
+            if completa:
+                resultado.append(palavra)
+                continue
+            if no.contagem:
+                heapq.heappush(fila, (-no.contagem, palavra, True, no))
+            for letra, filho in no.filhos.items():
+                if filho.melhor:
+                    heapq.heappush(fila, (-filho.melhor, palavra + letra, False, filho))
+        return resultado
+
+    def corrigir(self, termo, distancia, limite=4):
+        """Palavras a até `distancia` edições de `termo` (Levenshtein), as mais
+        próximas e, entre elas, as mais frequentes primeiro."""
+        if distancia <= 0:
+            return []
+        encontradas = []
+        primeira_linha = list(range(len(termo) + 1))
+
+        def visitar(no, palavra, linha_anterior):
+            linha = [linha_anterior[0] + 1]
+            for coluna in range(1, len(termo) + 1):
+                linha.append(min(
+                    linha[coluna - 1] + 1,
+                    linha_anterior[coluna] + 1,
+                    linha_anterior[coluna - 1] + (termo[coluna - 1] != palavra[-1]),
+                ))
+            if no.contagem and linha[-1] <= distancia:
+                encontradas.append((linha[-1], -no.contagem, palavra))
+            if min(linha) <= distancia:
+                for letra, filho in no.filhos.items():
+                    visitar(filho, palavra + letra, linha)
+
+        for letra, filho in self.raiz.filhos.items():
+            visitar(filho, letra, primeira_linha)
+        encontradas.sort()
+        return [palavra for _, _, palavra in encontradas[:limite] if palavra != termo]
+
+
+def _ceder(i, intervalo=5000):
+    # A construção é CPU pura: de tempos a tempos dá a vez aos pedidos (nos
+    # workers gevent a "thread" de fundo é um greenlet, ver app/cooperativo.py)
+    if i % intervalo == intervalo - 1:
+        time.sleep(0)
+
+
+class IndicePesquisa:
+    """Vocabulário (trie) do catálogo deste processo; fica em app.pesquisa."""
+
+    def __init__(self, app, ttl=600):
+        self.app = app
+        self.ttl = ttl
+        self._vocabulario = None
+        self._construido_em = 0.0
+        self._desatualizado = False
+        self._a_reconstruir = False
+        self._lock = threading.Lock()
+
+    def _construir(self):
+        vocabulario = VocabularioPesquisa()
+        bind = db.session.get_bind(Produto.__mapper__)
+        # Ligação própria, para não mexer na transação da sessão do pedido
+        with bind.connect() as conexao:
+            if bind.dialect.name == 'sqlite' and inspecionar(conexao).has_table('produto_fts_vocab'):
+                # O FTS5 já tem as palavras distintas e em quantos produtos aparece cada uma
+                for i, (termo, produtos) in enumerate(conexao.execute(text('SELECT term, doc FROM produto_fts_vocab'))):
+                    vocabulario.somar(termo, produtos)
+                    _ceder(i)
+            else:
+                consulta = db.select(Produto.nome)
+                for i, (nome,) in enumerate(conexao.execution_options(yield_per=5000).execute(consulta)):
+                    for termo in set(termos(nome)):
+                        vocabulario.somar(termo, 1)
+                    _ceder(i)
+        return vocabulario
+
+    def _reconstruir_em_segundo_plano(self):
+        def trabalhar():
+            try:
+                with self.app.app_context():
+                    vocabulario = self._construir()
+                with self._lock:
+                    self._vocabulario, self._construido_em = vocabulario, time.monotonic()
+                    self._desatualizado = False
+            except Exception:
+                self.app.logger.exception('Falha ao reconstruir o vocabulário da pesquisa')
+            finally:
+                self._a_reconstruir = False
+
+        self._a_reconstruir = True
+        threading.Thread(target=trabalhar, name='vocabulario-pesquisa', daemon=True).start()
+
+    def _obter(self):
+        if self._vocabulario is None:
+            vocabulario = self._construir()
+            with self._lock:
+                if self._vocabulario is None:
+                    self._vocabulario, self._construido_em = vocabulario, time.monotonic()
+                    # Acabou de ser lido do banco (ex.: depois de garantir_indice)
+                    self._desatualizado = False
+        elif not self._a_reconstruir and (
+                self._desatualizado or time.monotonic() - self._construido_em > self.ttl):
+            # Entretanto continua a responder com o vocabulário anterior
+            self._reconstruir_em_segundo_plano()
+        return self._vocabulario
+
+    def aplicar(self, variacoes):
+        """Soma as variações (palavra -> produtos a mais/menos) de um commit."""
+        if self._vocabulario is None:
+            return
+        with self._lock:
+            for termo, quantidade in variacoes.items():
+                self._vocabulario.somar(termo, quantidade)
+
+    def marcar_desatualizado(self):
+        self._desatualizado = True
+
+    def completar(self, prefixo, limite=8):
+        vocabulario = self._obter()
+        with self._lock:
+            return vocabulario.completar(prefixo, limite)
+
+    def alternativas(self, termo, ultimo):
+        """Como pesquisar `termo`: (palavras, é prefixo?).
+
+        A última palavra da consulta é tratada como prefixo (o utilizador pode
+        ainda estar a escrevê-la); uma palavra que não existe no vocabulário é
+        pesquisada também pelas correções mais próximas.
+        """
+        vocabulario = self._obter()
+        with self._lock:
+            if termo.isdigit():
+                return [termo], ultimo
+            if ultimo and len(termo) >= PREFIXO_MINIMO and vocabulario.tem_prefixo(termo):
+                return [termo], True
+            if vocabulario.contagem(termo):
+                return [termo], False
+            return [termo] + vocabulario.corrigir(termo, distancia_maxima(termo)), False
+
+    def estatisticas(self):
+        vocabulario = self._vocabulario
+        return {
+            'palavras': vocabulario.palavras if vocabulario is not None else 0,
+            'idade_s': round(time.monotonic() - self._construido_em, 1) if vocabulario is not None else None,
+        }
+
+
+class ResultadoPesquisa:
+    def __init__(self, consulta, produtos, correcoes, tem_proxima):
+        self.consulta = consulta
+        self.produtos = produtos
+        self.correcoes = correcoes  # palavra escrita -> palavras usadas em vez dela
+        self.tem_proxima = tem_proxima
+
+
+def _consulta_sqlite(grupos):
+    partes = []
+    for palavras, prefixo in grupos:
+        alternativas = [f'"{palavra}"' + (' *' if prefixo else '') for palavra in palavras]
+        partes.append('(' + ' OR '.join(alternativas) + ')')
+    return ' AND '.join(partes)
+
+
+def _consulta_postgres(grupos):
+    partes = []
+    for palavras, prefixo in grupos:
+        partes.append('(' + ' | '.join(palavra + (':*' if prefixo else '') for palavra in palavras) + ')')
+    return ' & '.join(partes)
+
+
+def _ids_encontrados(grupos, texto, limite, deslocamento, candidatos):
+    # Os candidatos são os primeiros `candidatos` resultados pela ordem do
+    # índice; só esses são ordenados por relevância, o que mantém o custo
+    # limitado mesmo quando a consulta casa com meio catálogo
+    parametros = {'limite': limite, 'deslocamento': deslocamento, 'candidatos': candidatos}
+    dialeto = db.session.get_bind(Produto.__mapper__).dialect.name
+    if dialeto == 'sqlite':
+        parametros['consulta'] = _consulta_sqlite(grupos)
+        return db.session.scalars(text(
+            "SELECT id FROM (SELECT rowid AS id, rank FROM produto_fts WHERE produto_fts MATCH :consulta "
+            "LIMIT :candidatos) ORDER BY rank, id LIMIT :limite OFFSET :deslocamento"
+        ), parametros).all()
+    if dialeto == 'postgresql':
+        parametros['consulta'] = _consulta_postgres(grupos)
+        ids = db.session.scalars(text(
+            "SELECT id FROM (SELECT id, ts_rank(to_tsvector('simple', loja_unaccent(nome)), q) AS relevancia "
+            "FROM produto, to_tsquery('simple', :consulta) AS q "
+            "WHERE to_tsvector('simple', loja_unaccent(nome)) @@ q LIMIT :candidatos) AS c "
+            "ORDER BY relevancia DESC, id LIMIT :limite OFFSET :deslocamento"
+        ), parametros).all()
+        if ids or deslocamento:
+            return ids
+        # Nada no índice de palavras: semelhança por trigramas com o texto todo
+        parametros['texto'] = normalizar(texto)
+        return db.session.scalars(text(
+            "SELECT id FROM produto WHERE loja_unaccent(lower(nome)) % :texto "
+            "ORDER BY similarity(loja_unaccent(lower(nome)), :texto) DESC, id LIMIT :limite"
+        ), parametros).all()
+    # Outros bancos: sem índice, só a primeira palavra de cada grupo
+    query = Produto.query.with_entities(Produto.id)
+    for palavras, _ in grupos:
+        query = query.filter(Produto.nome.ilike(f'%{palavras[0]}%'))
+    return [linha.id for linha in query.order_by(Produto.id).offset(deslocamento).limit(limite)]
+
+
+def pesquisar(texto, pagina=1, por_pagina=24):
+    """Pesquisa `texto` no nome dos produtos e devolve um ResultadoPesquisa."""
+    palavras = termos(texto)[:8]
+    if not palavras:
+        return ResultadoPesquisa(texto, [], {}, False)
+    indice = current_app.pesquisa
+    grupos, correcoes = [], {}
+    for posicao, palavra in enumerate(palavras):
+        alternativas, prefixo = indice.alternativas(palavra, ultimo=posicao == len(palavras) - 1)
+        grupos.append((alternativas, prefixo))
+        if len(alternativas) > 1:
+            correcoes[palavra] = alternativas[1:]
+
+    pagina = max(1, pagina)
+    ids = _ids_encontrados(
+        grupos, texto, limite=por_pagina + 1, deslocamento=(pagina - 1) * por_pagina,
+        candidatos=current_app.config['PESQUISA_CANDIDATOS'],
+    )
+    tem_proxima = len(ids) > por_pagina
+    ids = ids[:por_pagina]
+    snapshots = current_app.cache_produtos.obter_varios(ids)
+    produtos = [snapshots[produto_id] for produto_id in ids if produto_id in snapshots]
+    return ResultadoPesquisa(texto, produtos, correcoes, tem_proxima)
+
+
+def sugestoes(texto, limite=8):
+    """Completa a última palavra de `texto` com as palavras mais frequentes."""
+    palavras = termos(texto)
+    if not palavras or texto[-1:].isspace() or len(palavras[-1]) < PREFIXO_MINIMO:
+        return []
+    inicio = ' '.join(palavras[:-1])
+    return [
+        f'{inicio} {palavra}'.strip()
+        for palavra in current_app.pesquisa.completar(palavras[-1], limite)
+    ]
+
+
+def garantir_indice():
+    """Cria (se faltar) e preenche o índice de pesquisa do banco atual."""
+    dialeto = db.session.get_bind(Produto.__mapper__).dialect.name
+    if dialeto == 'sqlite':
+        for instrucao in DDL_SQLITE:
+            db.session.execute(text(instrucao))
+        db.session.execute(text("INSERT INTO produto_fts(produto_fts) VALUES ('rebuild')"))
+    elif dialeto == 'postgresql':
+        for instrucao in DDL_POSTGRES:
+            db.session.execute(text(instrucao))
+    db.session.commit()
+    if has_app_context() and hasattr(current_app, 'pesquisa'):
+        current_app.pesquisa.marcar_desatualizado()
+
+
+# --- Atualização do vocabulário pelos commits deste processo ---
+
+def _nome_gravado(objeto):
+    # Nome que o produto tinha no banco antes deste flush (None se não estava carregado)
+    estado = inspecionar(objeto)
+    return estado.committed_state.get('nome', estado.dict.get('nome'))
+
+
+def _registar_variacoes(session, flush_context):
+    variacoes = session.info.setdefault('pesquisa_variacoes', collections.Counter())
+    for objeto in session.new:
+        if isinstance(objeto, Produto):
+            variacoes.update(set(termos(objeto.nome)))
+    for objeto in session.deleted:
+        if isinstance(objeto, Produto):
+            nome = _nome_gravado(objeto)
+            if nome is None:
+                session.info['pesquisa_em_massa'] = True
+            variacoes.subtract(set(termos(nome)))
+    for objeto in session.dirty:
+        if isinstance(objeto, Produto) and inspecionar(objeto).attrs.nome.history.has_changes():
+            historico = inspecionar(objeto).attrs.nome.history
+            if not historico.deleted:
+                session.info['pesquisa_em_massa'] = True
+            variacoes.subtract(set(termos(historico.deleted[0] if historico.deleted else '')))
+            variacoes.update(set(termos(objeto.nome)))
+
+
+def _marcar_em_massa(estado):
+    if (estado.is_insert or estado.is_update or estado.is_delete) and estado.bind_mapper is not None \
+            and estado.bind_mapper.class_ is Produto:
+        estado.session.info['pesquisa_em_massa'] = True
+
+
+def _aplicar_depois_do_commit(session):
+    variacoes = session.info.pop('pesquisa_variacoes', None)
+    em_massa = session.info.pop('pesquisa_em_massa', False)
+    if not (variacoes or em_massa) or not has_app_context():
+        return
+    indice = getattr(current_app, 'pesquisa', None)
+    if indice is None:
+        return
+    if em_massa:
+        indice.marcar_desatualizado()
+    else:
+        indice.aplicar({termo: n for termo, n in variacoes.items() if n})
+
+
+def _descartar_variacoes(session):
+    session.info.pop('pesquisa_variacoes', None)
+    session.info.pop('pesquisa_em_massa', None)
+
+
+def ligar_atualizacao_vocabulario():
+    if event.contains(Session, 'after_commit', _aplicar_depois_do_commit):
+        return
+    event.listen(Session, 'after_flush', _registar_variacoes)
+    event.listen(Session, 'do_orm_execute', _marcar_em_massa)
+    event.listen(Session, 'after_commit', _aplicar_depois_do_commit)
+    event.listen(Session, 'after_rollback', _descartar_variacoes)
@@ -0,0 +1,131 @@
+# app/reconciliacao.py
+# Reconciliação dos pagamentos ('flask reconciliar-pagamentos', para correr
+# periodicamente): se a notificação do Mercado Pago se perder e o cliente não
+# voltar a /compra_certa, o pedido ficaria 'Pendente' para sempre. Esta tarefa
+# percorre os pedidos à espera de pagamento numa janela de datas, procura os
+# pagamentos de cada um pela external_reference (Pedido.referencia_externa) e
+# passa a 'Pago' os que têm um pagamento aprovado.
+#
+# Os pedidos são lidos em lotes, pelo índice de estado e data. As consultas de
+# cada lote correm num pool limitado de threads, com um limite de consultas
+# por segundo partilhado por todas (para não esbarrar nos limites da API); as
+# transições do lote são aplicadas de uma vez (transitar_status) e num só
+# commit. Os pedidos anteriores à coluna referencia_externa não são
+# reconciliados.
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import select, tuple_
+from app import db
+from app.models import Pedido
+from app.pedidos import transitar_status
+from app.notificacoes import central_pagamentos
+from app.mercadopago_client import CircuitoAberto
+
+# Estados em que um pedido ainda pode receber o pagamento (ver TRANSICOES): um
+# pedido que a limpeza já expirou também passa a 'Pago' se o pagamento existir
+STATUS_A_RECONCILIAR = ('Pendente', 'Expirado')
+
+
+class LimiteTaxa:
+    """Espaça as chamadas para não passarem de `por_segundo` (todas as threads).
+
+    Cada chamada a aguardar() reserva o próximo instante livre e dorme até
+    lá. Com `por_segundo` 0 ou None não há limite.
+    """
+
+    def __init__(self, por_segundo):
+        self.intervalo = 1.0 / por_segundo if por_segundo else 0.0
+        self._proximo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        if not self.intervalo:
+            return
+        with self._lock:
+            agora = time.monotonic()
+            instante = max(self._proximo, agora)
+            self._proximo = instante + self.intervalo
+        if instante > agora:
+            time.sleep(instante - agora)
+
+
+def _procurar_pagamentos(sdk, limite, referencia):
+    limite.aguardar()
+    resposta = sdk.payment().search({'external_reference': referencia})
+    if not resposta or resposta.get("status") != 200:
+        raise RuntimeError(f"Resposta inesperada do Mercado Pago: {resposta}")
+    return (resposta.get("response") or {}).get("results", [])
+
+
+def _proximo_lote(status, desde, ate, depois_de, tamanho):
+    # Paginação por (data_pedido, id): os pedidos que mudam de estado a meio
+    # não fazem saltar nem repetir nenhum
+    consulta = (
+        select(Pedido.id, Pedido.data_pedido, Pedido.referencia_externa)
+        .where(Pedido.status == status, Pedido.data_pedido >= desde, Pedido.data_pedido < ate,
+               Pedido.referencia_externa.is_not(None))
+    )
+    if depois_de is not None:
+        consulta = consulta.where(tuple_(Pedido.data_pedido, Pedido.id) > depois_de)
+    return db.session.execute(consulta.order_by(Pedido.data_pedido, Pedido.id).limit(tamanho)).all()
+
+
+def reconciliar_pagamentos(sdk, desde, ate, threads=8, taxa=20, tamanho_lote=500, max_lotes=1000, ao_lote=None):
+    """Procura no Mercado Pago os pagamentos dos pedidos por pagar criados
+    entre `desde` e `ate` (UTC) e marca como 'Pago' os aprovados.
+
+    `threads` limita as consultas simultâneas e `taxa` as consultas por
+    segundo (0 sem limite). Os pedidos cuja consulta falha ficam como estão,
+    para a próxima execução; com o circuito do Mercado Pago aberto a
+    reconciliação para no fim do lote. `ao_lote` é chamada com o resumo
+    depois de cada lote. Devolve o resumo.
+    """
+    limite = LimiteTaxa(taxa)
+    resumo = {'consultados': 0, 'pagos': 0, 'sem_pagamento': 0, 'nao_aprovados': 0, 'falhas': 0,
+              'interrompido': False}
+
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='reconciliacao') as executor:
+        for status in STATUS_A_RECONCILIAR:
+            depois_de = None
+            for _ in range(max_lotes):
+                lote = _proximo_lote(status, desde, ate, depois_de, tamanho_lote)
+                if not lote:
+                    break
+                depois_de = (lote[-1].data_pedido, lote[-1].id)
+                # A ligação volta ao pool enquanto se espera pelo Mercado Pago
+                db.session.commit()
+
+                futuros = [executor.submit(_procurar_pagamentos, sdk, limite, p.referencia_externa) for p in lote]
+                aprovados = []
+                for pedido, futuro in zip(lote, futuros):
+                    try:
+                        pagamentos = futuro.result()
+                    except CircuitoAberto:
+                        resumo['falhas'] += 1
+                        resumo['interrompido'] = True
+                        continue
+                    except Exception as e:
+                        resumo['falhas'] += 1
+                        print(f"🚨 Falha ao consultar os pagamentos do pedido {pedido.id}: {e}")
+                        continue
+                    resumo['consultados'] += 1
+                    if any(p.get("status") == "approved" for p in pagamentos):
+                        aprovados.append(pedido.id)
+                    elif pagamentos:
+                        resumo['nao_aprovados'] += 1
+                    else:
+                        resumo['sem_pagamento'] += 1
+
+                pagos = transitar_status(aprovados, 'Pago', 'reconciliacao')
+                db.session.commit()
+                for pedido_id in pagos:
+                    central_pagamentos.publicar(pedido_id, 'Pago')
+                resumo['pagos'] += len(pagos)
+                if ao_lote:
+                    ao_lote(resumo)
+                if resumo['interrompido']:
+                    return resumo
+                if len(lote) < tamanho_lote:
+                    break
+    return resumo
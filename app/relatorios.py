@@ -0,0 +1,192 @@
+# app/relatorios.py
+# Agregados de vendas (receita por dia, unidades por produto) guardados em
+# tabelas próprias, para que os relatórios leiam uma linha por dia/produto em
+# vez de percorrer pedido e item_pedido.
+#
+# São mantidos de forma incremental na mesma transação que muda o pedido
+# (transitar_status em app/pedidos.py) e podem ser recalculados do zero com
+# 'flask recalcular-relatorios'. Só entram na receita e nas unidades os
+# pedidos cujo estado atual é 'Pago': um reembolso retira o pedido dos totais.
+# Os pedidos movidos para o arquivo (app/arquivo.py) continuam contados; o
+# recálculo lê as duas tabelas.
+#
+# Os pedidos por estado não têm contador atualizado a cada checkout (seria uma
+# só linha por estado, disputada por todas as transações): os pedidos ativos
+# contam-se pelo índice (status, data_pedido) e ContagemStatusPedido guarda só
+# os arquivados, somados por arquivar_concluidos em cada lote.
+import datetime
+from collections import Counter
+from sqlalchemy import cast, delete, func, insert, select, update
+from sqlalchemy.orm import joinedload
+from app import db
+from app.models import (Pedido, ItemPedido, PedidoArquivado, ItemPedidoArquivado,
+                        VendaDiaria, VendaProduto, ContagemStatusPedido)
+
+STATUS_PAGO = 'Pago'
+
+
+def _dialeto():
+    return db.session.get_bind(Pedido.__mapper__).dialect.name
+
+
+def _dia(coluna):
+    # DATE(...) no SQLite devolve 'AAAA-MM-DD'; o type_ converte para date
+    if _dialeto() == 'sqlite':
+        return func.date(coluna, type_=db.Date)
+    return cast(coluna, db.Date)
+
+
+def _consulta_dias(*condicoes, pedido=Pedido):
+    dia = _dia(pedido.data_pedido)
+    return (
+        select(dia.label('dia'), func.count().label('pedidos'), func.sum(pedido.total).label('receita'))
+        .where(*condicoes)
+        .group_by(dia)
+    )
+
+
+def _consulta_produtos(*condicoes, pedido=Pedido, item=ItemPedido):
+    return (
+        select(
+            item.produto_id,
+            func.sum(item.quantidade).label('unidades'),
+            func.sum(item.quantidade * item.preco_unitario).label('receita'),
+        )
+        .join(pedido, pedido.id == item.pedido_id)
+        .where(*condicoes)
+        .group_by(item.produto_id)
+    )
+
+
+def _consulta_status(pedido=Pedido):
+    return select(pedido.status, func.count().label('pedidos')).group_by(pedido.status)
+
+
+def _somar(modelo, chave, linhas):
+    """Soma os valores de `linhas` às linhas existentes (ou cria-as), por `chave`."""
+    if not linhas:
+        return
+    tabela = modelo.__table__
+    valores = [coluna for coluna in linhas[0] if coluna != chave]
+    if _dialeto() in ('sqlite', 'postgresql'):
+        if _dialeto() == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as insert_dialeto
+        else:
+            from sqlalchemy.dialects.postgresql import insert as insert_dialeto
+        instrucao = insert_dialeto(modelo)
+        instrucao = instrucao.on_conflict_do_update(
+            index_elements=[tabela.c[chave]],
+            set_={coluna: tabela.c[coluna] + instrucao.excluded[coluna] for coluna in valores},
+        )
+        db.session.execute(instrucao, linhas)
+        return
+    # Outros bancos: UPDATE incremental e INSERT das chaves que ainda não existem
+    for linha in linhas:
+        alteradas = db.session.execute(
+            update(modelo)
+            .where(tabela.c[chave] == linha[chave])
+            .values({coluna: tabela.c[coluna] + linha[coluna] for coluna in valores})
+        ).rowcount
+        if not alteradas:
+            db.session.execute(insert(modelo), [linha])
+
+
+def contar_arquivados(pedido_ids):
+    """Soma à contagem por estado do arquivo os pedidos `pedido_ids`, antes de
+    saírem da tabela pedido (chamada por arquivar_concluidos, uma vez por lote)."""
+    _somar(ContagemStatusPedido, 'status', [
+        linha._asdict() for linha in db.session.execute(_consulta_status().where(Pedido.id.in_(pedido_ids)))
+    ])
+
+
+def registar_transicao(pedido_ids, status_anterior, status_novo):
+    """Atualiza os agregados depois de `pedido_ids` passarem de um estado a outro.
+
+    Chamada por transitar_status, na mesma transação que o UPDATE dos pedidos;
+    o custo é proporcional ao número de pedidos alterados, não ao histórico.
+    """
+    if not pedido_ids:
+        return
+    if status_novo == STATUS_PAGO:
+        sinal = 1
+    elif status_anterior == STATUS_PAGO:
+        sinal = -1
+    else:
+        return
+
+    dias = db.session.execute(_consulta_dias(Pedido.id.in_(pedido_ids))).all()
+    _somar(VendaDiaria, 'dia', [
+        {'dia': linha.dia, 'pedidos': sinal * linha.pedidos, 'receita': sinal * linha.receita}
+        for linha in dias
+    ])
+    produtos = db.session.execute(_consulta_produtos(ItemPedido.pedido_id.in_(pedido_ids))).all()
+    _somar(VendaProduto, 'produto_id', [
+        {'produto_id': linha.produto_id, 'unidades': sinal * linha.unidades, 'receita': sinal * linha.receita}
+        for linha in produtos
+    ])
+
+
+def recalcular_relatorios():
+    """Recalcula todos os agregados a partir dos pedidos, numa só transação.
+
+    Cada tabela é preenchida por um INSERT ... SELECT ... GROUP BY executado
+    pelo próprio banco sobre os pedidos ativos; os totais do arquivo (já
+    agrupados) somam-se depois. A contagem por estado só lê o arquivo.
+    Devolve o número de linhas de cada tabela.
+    """
+    for modelo in (VendaDiaria, VendaProduto, ContagemStatusPedido):
+        db.session.execute(delete(modelo))
+    db.session.execute(
+        insert(VendaDiaria).from_select(['dia', 'pedidos', 'receita'], _consulta_dias(Pedido.status == STATUS_PAGO))
+    )
+    db.session.execute(
+        insert(VendaProduto).from_select(
+            ['produto_id', 'unidades', 'receita'], _consulta_produtos(Pedido.status == STATUS_PAGO),
+        )
+    )
+    db.session.execute(
+        insert(ContagemStatusPedido).from_select(['status', 'pedidos'], _consulta_status(PedidoArquivado))
+    )
+
+    pago = PedidoArquivado.status == STATUS_PAGO
+    _somar(VendaDiaria, 'dia', [
+        linha._asdict() for linha in db.session.execute(_consulta_dias(pago, pedido=PedidoArquivado))
+    ])
+    _somar(VendaProduto, 'produto_id', [
+        linha._asdict()
+        for linha in db.session.execute(_consulta_produtos(pago, pedido=PedidoArquivado, item=ItemPedidoArquivado))
+    ])
+    db.session.commit()
+    return {
+        modelo.__tablename__: db.session.scalar(select(func.count()).select_from(modelo))
+        for modelo in (VendaDiaria, VendaProduto, ContagemStatusPedido)
+    }
+
+
+def resumo_vendas(dias=30, top_produtos=20):
+    """Dados do painel de relatórios: lê apenas as tabelas de agregados."""
+    inicio = datetime.datetime.utcnow().date() - datetime.timedelta(days=dias - 1)
+    por_dia = db.session.scalars(
+        select(VendaDiaria).where(VendaDiaria.dia >= inicio).order_by(VendaDiaria.dia.desc())
+    ).all()
+    produtos = db.session.scalars(
+        select(VendaProduto)
+        .options(joinedload(VendaProduto.produto))
+        .where(VendaProduto.unidades > 0)
+        .order_by(VendaProduto.unidades.desc(), VendaProduto.produto_id)
+        .limit(top_produtos)
+    ).all()
+    # Pedidos ativos pelo índice (status, data_pedido), mais os arquivados
+    contagem = Counter(dict(db.session.execute(_consulta_status()).all()))
+    contagem.update(dict(db.session.execute(select(ContagemStatusPedido.status, ContagemStatusPedido.pedidos)).all()))
+    status = [
+        {'status': estado, 'pedidos': pedidos} for estado, pedidos in sorted(contagem.items()) if pedidos
+    ]
+    return {
+        'inicio': inicio,
+        'por_dia': por_dia,
+        'pedidos': sum(linha.pedidos for linha in por_dia),
+        'receita': sum((linha.receita for linha in por_dia), 0),
+        'produtos': produtos,
+        'status': status,
+    }
@@ -1,18 +1,35 @@
 # app/routes.py
 from flask import (render_template, request, jsonify, url_for, flash, 
-                   redirect, session, Blueprint, current_app)
+                   redirect, Blueprint, current_app, abort,
+                   Response, stream_with_context, send_from_directory, session, g)
 from flask_login import login_user, current_user, logout_user, login_required
-from app import db, bcrypt
-from app.models import Produto, User, Pedido, ItemPedido
+from markupsafe import Markup
+from app import db
+from app.banco import somente_leitura
+from app.models import Produto, User, Pedido
 from app.forms import RegistrationForm, LoginForm
+from app.catalog import pagina_catalogo, produto_para_dict, CursorInvalido
+from app.pesquisa import pesquisar, sugestoes
+from app.pedidos import (historico_pedidos, chave_idempotencia, pedido_pendente_recente, transitar_status,
+                         aguardar_preferencia, criar_pedido, descartar_pedido, PedidoDuplicado)
+from app.estoque import EstoqueInsuficiente
+from app.fila_webhook import enfileirar_notificacao
+from app.notificacoes import central_pagamentos, garantir_ouvinte
+from app.carrinho import chave_carrinho, itens_carrinho, contar_itens_carrinho, mesclar_carrinho_anonimo
+from app.instrumentacao import exportar_prometheus
+from app.imagens import PASTA_VARIANTES
 import os
-import secrets
+import hmac
+import hashlib
+import json
 from decimal import Decimal
 import time
 
 # Cria um Blueprint chamado 'main'
 main_bp = Blueprint('main', __name__)
 
+UM_ANO = 365 * 24 * 3600
+
 # --- Rotas de Autenticação e Utilizador ---
 
 @main_bp.route("/register", methods=['GET', 'POST'])
@@ -21,7 +38,7 @@ def register():
         return redirect(url_for('main.homepage'))
     form = RegistrationForm()
     if form.validate_on_submit():
-        hashed_password = bcrypt.generate_password_hash(form.password.data).decode('utf-8')
+        hashed_password = current_app.senhas.gerar_hash(form.password.data)
         user = User(username=form.username.data, email=form.email.data, password_hash=hashed_password)
         db.session.add(user)
         db.session.commit()
@@ -36,8 +53,13 @@ def login():
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data).first()
-        if user and bcrypt.check_password_hash(user.password_hash, form.password.data):
+        if current_app.senhas.verificar_login(user, form.password.data):
+            # Atualiza o hash se o custo configurado mudou desde que foi gerado
+            if current_app.senhas.precisa_rehash(user.password_hash):
+                user.password_hash = current_app.senhas.gerar_hash(form.password.data)
+                db.session.commit()
             login_user(user, remember=form.remember.data)
+            mesclar_carrinho_anonimo(user.id)
             next_page = request.args.get('next')
             return redirect(next_page) if next_page else redirect(url_for('main.homepage'))
         else:
@@ -51,108 +73,243 @@ def logout():
 
 @main_bp.route("/minha_conta")
 @login_required
+@somente_leitura
 def minha_conta():
-    pedidos = Pedido.query.filter_by(user_id=current_user.id).order_by(Pedido.data_pedido.desc()).all()
-    return render_template('minha_conta.html', title='Minha Conta', pedidos=pedidos)
+    paginacao = historico_pedidos(
+        current_user.id,
+        pagina=request.args.get('pagina', 1, type=int),
+        por_pagina=current_app.config['PEDIDOS_POR_PAGINA'],
+    )
+    return render_template('minha_conta.html', title='Minha Conta', pedidos=paginacao.items, paginacao=paginacao)
 
 # --- Rotas da Loja e Carrinho ---
 
+def _pagina_catalogo_da_requisicao():
+    try:
+        return pagina_catalogo(
+            ordem=request.args.get('ordem'),
+            cursor=request.args.get('apos'),
+            por_pagina=current_app.config['CATALOGO_POR_PAGINA'],
+            cache=current_app.cache_produtos,
+        )
+    except CursorInvalido:
+        abort(400)
+
+def _grade_catalogo(chave):
+    # A grade é igual para todos os visitantes; é renderizada sem os context
+    # processors (não depende do utilizador nem do carrinho)
+    cache = current_app.cache_paginas
+    grade = cache.obter(('grade',) + chave)
+    if grade is None:
+        pagina = _pagina_catalogo_da_requisicao()
+        grade = current_app.jinja_env.get_template('_grade_produtos.html').render(
+            produtos=pagina.produtos, pagina=pagina,
+        )
+        cache.guardar(('grade',) + chave, grade)
+    return Markup(grade)
+
 @main_bp.route("/")
+@somente_leitura
 def homepage():
-    produtos = Produto.query.all()
-    return render_template("index.html", produtos=produtos)
+    cache = current_app.cache_paginas
+    chave = (cache.geracao, current_app.imagens.versao, request.args.get('ordem'), request.args.get('apos'))
+
+    # Visitantes anónimos sem mensagens pendentes recebem todos a mesma página:
+    # guardamo-la inteira, com ETag, e o badge do carrinho vem à parte
+    if current_user.is_authenticated or '_flashes' in session:
+        return render_template("index.html", grade=_grade_catalogo(chave))
+
+    g.badge_assincrono = True
+    guardada = cache.obter(('pagina',) + chave)
+    if guardada is None:
+        html = render_template("index.html", grade=_grade_catalogo(chave))
+        guardada = (html, hashlib.sha1(html.encode('utf-8')).hexdigest())
+        cache.guardar(('pagina',) + chave, guardada)
+    html, etag = guardada
+    if request.if_none_match.contains(etag):
+        resposta = Response(status=304)
+    else:
+        resposta = Response(html, mimetype='text/html')
+    resposta.set_etag(etag)
+    resposta.cache_control.no_cache = True
+    return resposta
+
+@main_bp.route("/cart/contagem")
+def contagem_carrinho():
+    resposta = jsonify({'itens': contar_itens_carrinho()})
+    resposta.cache_control.no_store = True
+    return resposta
+
+@main_bp.route("/api/produtos")
+@somente_leitura
+def api_produtos():
+    pagina = _pagina_catalogo_da_requisicao()
+    return jsonify({
+        'produtos': [produto_para_dict(p) for p in pagina.produtos],
+        'ordem': pagina.ordem,
+        'proximo': pagina.proximo_cursor,
+    })
+
+def _pesquisa_da_requisicao():
+    texto = request.args.get('q', '').strip()[:100]
+    pagina = request.args.get('pagina', 1, type=int)
+    return pesquisar(texto, pagina=pagina, por_pagina=current_app.config['PESQUISA_POR_PAGINA']), pagina
+
+@main_bp.route("/pesquisa")
+@somente_leitura
+def pesquisa():
+    resultado, pagina = _pesquisa_da_requisicao()
+    return render_template("pesquisa.html", title='Pesquisa', resultado=resultado, pagina=pagina)
+
+@main_bp.route("/api/pesquisa")
+@somente_leitura
+def api_pesquisa():
+    resultado, pagina = _pesquisa_da_requisicao()
+    return jsonify({
+        'produtos': [produto_para_dict(p) for p in resultado.produtos],
+        'correcoes': resultado.correcoes,
+        'proxima': pagina + 1 if resultado.tem_proxima else None,
+    })
+
+@main_bp.route("/api/pesquisa/sugestoes")
+def api_sugestoes():
+    # Responde da trie em memória, sem ir ao banco; igual para todos os visitantes
+    resposta = jsonify(sugestoes(request.args.get('q', '')[:100], current_app.config['PESQUISA_SUGESTOES']))
+    resposta.cache_control.public = True
+    resposta.cache_control.max_age = 60
+    return resposta
+
+@main_bp.route("/imagens/<path:ficheiro>")
+def imagem_variante(ficheiro):
+    # O nome das variantes inclui o hash do conteúdo, por isso podem ficar em
+    # cache para sempre; send_from_directory trata do ETag e do 304
+    resposta = send_from_directory(
+        os.path.join(current_app.static_folder, PASTA_VARIANTES), ficheiro, max_age=UM_ANO,
+    )
+    resposta.cache_control.public = True
+    resposta.cache_control.immutable = True
+    return resposta
 
 @main_bp.route("/add_to_cart/<int:produto_id>", methods=['POST'])
 def add_to_cart(produto_id):
-    if 'cart' not in session:
-        session['cart'] = {}
-    cart = session['cart']
-    produto_id_str = str(produto_id)
-    cart[produto_id_str] = cart.get(produto_id_str, 0) + 1
-    session.modified = True
+    # O item do carrinho aponta para o produto: um id que não existe (ou um
+    # produto apagado) nunca chega ao armazém
+    if not db.session.query(Produto.query.filter_by(id=produto_id).exists()).scalar():
+        abort(404)
+    current_app.carrinho.adicionar(chave_carrinho(criar=True), produto_id)
     flash('Produto adicionado ao carrinho!', 'success')
     return redirect(url_for('main.homepage'))
 
 @main_bp.route("/cart")
 @login_required
 def cart():
-    if 'cart' not in session or not session['cart']:
+    carrinho = itens_carrinho()
+    if not carrinho:
         flash('O seu carrinho está vazio.', 'info')
         return redirect(url_for('main.homepage'))
     
-    ids_produtos = [int(id) for id in session['cart'].keys()]
-    produtos_no_carrinho = Produto.query.filter(Produto.id.in_(ids_produtos)).all()
+    # Preços sempre do banco, como no checkout: depois de uma alteração no
+    # admin, o cache dos outros workers só expira ao fim do TTL
+    produtos = current_app.cache_produtos.carregar(carrinho.keys())
+    produtos_no_carrinho = [produtos[i] for i in carrinho if i in produtos]
     
-    total = sum(p.preco * session['cart'][str(p.id)] for p in produtos_no_carrinho)
+    total = sum(p.preco * carrinho[p.id] for p in produtos_no_carrinho)
     
-    return render_template('cart.html', produtos=produtos_no_carrinho, total=total, cart=session['cart'])
+    return render_template('cart.html', produtos=produtos_no_carrinho, total=total, cart=carrinho)
 
 @main_bp.route("/remove_from_cart/<int:produto_id>", methods=['POST'])
 @login_required
 def remove_from_cart(produto_id):
-    produto_id_str = str(produto_id)
-    if 'cart' in session and produto_id_str in session['cart']:
-        session['cart'].pop(produto_id_str)
-        session.modified = True
+    if produto_id in itens_carrinho():
+        current_app.carrinho.remover(chave_carrinho(), produto_id)
         flash('Produto removido do carrinho.', 'success')
     return redirect(url_for('main.cart'))
 
 @main_bp.route("/update_cart/<int:produto_id>", methods=['POST'])
 @login_required
 def update_cart(produto_id):
-    produto_id_str = str(produto_id)
     quantidade = request.form.get('quantidade', type=int)
-    if 'cart' in session and produto_id_str in session['cart']:
+    if produto_id in itens_carrinho():
         if quantidade is not None and quantidade > 0:
-            session['cart'][produto_id_str] = quantidade
-            session.modified = True
+            current_app.carrinho.definir(chave_carrinho(), produto_id, quantidade)
             flash('Quantidade atualizada com sucesso.', 'success')
         elif quantidade is not None and quantidade <= 0:
-            session['cart'].pop(produto_id_str)
-            session.modified = True
+            current_app.carrinho.remover(chave_carrinho(), produto_id)
             flash('Produto removido do carrinho.', 'success')
     return redirect(url_for('main.cart'))
 
 # --- Rota de Checkout e Pagamento ---
 
+def _pagina_pagamento(pedido):
+    return render_template("pagamento.html", 
+                           preference_id=pedido.preference_id, 
+                           public_key=os.getenv("MP_PUBLIC_KEY"),
+                           pedido_id=pedido.id,
+                           total=pedido.total,
+                           usar_sse=current_app.config['PAGAMENTO_SSE'])
+
+def _reutilizar_pedido(pedido_id, preference_id):
+    if preference_id or aguardar_preferencia(pedido_id, current_app.config['CHECKOUT_ESPERA_PREFERENCIA']):
+        current_app.carrinho.limpar(chave_carrinho())
+        return _pagina_pagamento(db.session.get(Pedido, pedido_id))
+    flash('O seu pedido ainda está a ser processado. Tente novamente dentro de instantes.', 'info')
+    return redirect(url_for('main.cart'))
+
 @main_bp.route("/checkout", methods=['GET'])
 @login_required
 def checkout():
     sdk = current_app.sdk
-    if 'cart' not in session or not session['cart']:
+    janela = current_app.config['CHECKOUT_IDEMPOTENCIA_JANELA']
+    carrinho = itens_carrinho()
+    if not carrinho:
+        # Recarregar a página de pagamento (o carrinho já foi limpo) mostra de
+        # novo o pedido pendente em vez de criar outro
+        pedido = pedido_pendente_recente(current_user.id, janela)
+        if pedido:
+            return _pagina_pagamento(pedido)
         flash('Seu carrinho está vazio.', 'info')
         return redirect(url_for('main.homepage'))
 
-    ids_produtos = [int(id) for id in session['cart'].keys()]
-    produtos = Produto.query.filter(Produto.id.in_(ids_produtos)).all()
-    
-    total_final = sum(p.preco * session['cart'][str(p.id)] for p in produtos)
+    # Os preços cobrados vêm sempre do banco (e aproveitam para refrescar o cache)
+    produtos = list(current_app.cache_produtos.carregar(carrinho.keys()).values())
+    if not produtos:
+        # Todos os produtos do carrinho foram entretanto retirados da loja
+        flash('Os produtos do seu carrinho já não estão disponíveis.', 'warning')
+        return redirect(url_for('main.cart'))
+
+    # Duplo clique ou outro separador com o mesmo carrinho: reutiliza o pedido
+    # pendente e a sua preferência em vez de chamar o Mercado Pago de novo
+    chave = chave_idempotencia(current_user.id, produtos, carrinho)
+    pedido = pedido_pendente_recente(current_user.id, janela, chave=chave)
+    if pedido:
+        return _reutilizar_pedido(pedido.id, pedido.preference_id)
     
     items_para_pagamento = []
     for produto in produtos:
-        quantidade = session['cart'][str(produto.id)]
+        quantidade = carrinho[produto.id]
         items_para_pagamento.append({
             "title": produto.nome, 
             "quantity": quantidade, 
             "unit_price": float(produto.preco),
             "currency_id": "BRL"
         })
+
+    # O pedido 'Pendente' é gravado antes de chamar o Mercado Pago, para que um
+    # pedido HTTP concorrente com o mesmo carrinho o encontre pela chave; é
+    # também aqui que as unidades são reservadas
+    try:
+        novo_pedido = criar_pedido(
+            current_user.id, produtos, carrinho, chave, current_app.config['ESTOQUE_RESERVA_VALIDADE'],
+            janela_idempotencia=janela,
+        )
+    except PedidoDuplicado as e:
+        # Outro pedido HTTP com o mesmo carrinho gravou o pedido primeiro
+        return _reutilizar_pedido(e.pedido_id, None)
+    except EstoqueInsuficiente as e:
+        nome = next((p.nome for p in produtos if p.id == e.produto_id), 'um dos produtos')
+        flash(f'Não há estoque suficiente de {nome}. Ajuste a quantidade no carrinho.', 'warning')
+        return redirect(url_for('main.cart'))
     try:
-        # Cria o pedido no banco de dados com status 'Pendente'
-        novo_pedido = Pedido(user_id=current_user.id, total=total_final, status='Pendente', token=secrets.token_hex(16))
-        db.session.add(novo_pedido)
-        db.session.flush() # Para obter o ID do novo_pedido antes do commit
-
-        for produto in produtos:
-            quantidade = session['cart'][str(produto.id)]
-            item = ItemPedido(
-                pedido_id=novo_pedido.id, 
-                produto_id=produto.id, 
-                quantidade=quantidade, 
-                preco_unitario=produto.preco
-            )
-            db.session.add(item)
-        
         # URL base para os retornos (importante para o Render)
         base_url = os.getenv("SITE_URL") or request.url_root
         if not base_url:
@@ -166,6 +323,10 @@ def checkout():
             "pending": f"{base_url}{url_for('main.minha_conta')}"
         }
         
+        # A referência fica gravada no pedido: é por ela que 'flask
+        # reconciliar-pagamentos' procura o pagamento se o webhook se perder
+        novo_pedido.referencia_externa = f"{novo_pedido.id}-{int(time.time())}"
+
         # Cria a preferência de pagamento
         preference_data = {
             "items": items_para_pagamento,
@@ -173,28 +334,29 @@ def checkout():
             "auto_return": "approved",
             "payer": { "email": current_user.email },
             "notification_url": f"{base_url}{url_for('main.receber_notificacao_webhook')}",
-            "external_reference": f"{novo_pedido.id}-{int(time.time())}",
+            "external_reference": novo_pedido.referencia_externa,
         }
-        
+
+        # Termina a transação aberta pelas leituras acima: a ligação volta ao
+        # pool enquanto se espera pelo Mercado Pago (com muitos pedidos em
+        # espera, sobretudo nos workers gevent, o pool não esgota)
+        db.session.commit()
         preference_response = sdk.preference().create(preference_data)
 
         if preference_response and preference_response.get("status") == 201:
-            preference_id = preference_response["response"]["id"]
+            novo_pedido.preference_id = preference_response["response"]["id"]
             db.session.commit()
-            session.pop('cart', None) # Limpa o carrinho
+            current_app.carrinho.limpar(chave_carrinho()) # Limpa o carrinho
             
             # Renderiza a página de pagamento em vez de redirecionar
-            return render_template("pagamento.html", 
-                                   preference_id=preference_id, 
-                                   public_key=os.getenv("MP_PUBLIC_KEY"),
-                                   pedido_id=novo_pedido.id,
-                                   total=total_final)
+            return _pagina_pagamento(novo_pedido)
         else:
             print("🚨 ERRO AO CRIAR PREFERÊNCIA:", preference_response)
             raise ValueError("A resposta do Mercado Pago não foi bem-sucedida.")
 
     except Exception as e:
         db.session.rollback()
+        descartar_pedido(novo_pedido.id)
         print(f"🚨 ERRO CRÍTICO NO CHECKOUT: {e}")
         flash('Ocorreu um erro inesperado ao processar seu pedido. Por favor, tente novamente.', 'danger')
         return redirect(url_for('main.cart'))
@@ -210,30 +372,66 @@ def verificar_pagamento(pedido_id):
         return jsonify({'error': 'Acesso não autorizado'}), 403
     return jsonify({'status': pedido.status})
 
+@main_bp.route("/eventos_pagamento/<int:pedido_id>")
+@login_required
+def eventos_pagamento(pedido_id):
+    # Server-Sent Events: uma ligação aberta por separador em vez de um
+    # pedido de polling a cada 3 segundos. A ligação termina sozinha ao fim
+    # de PAGAMENTO_SSE_DURACAO segundos e o EventSource volta a ligar-se.
+    # Sem PAGAMENTO_SSE (workers sync) responde só com o estado atual e
+    # fecha: o EventSource volta a perguntar passados 3 s, como no polling.
+    sse = current_app.config['PAGAMENTO_SSE']
+    if sse:
+        garantir_ouvinte(current_app._get_current_object())
+    central_pagamentos.assinar(pedido_id)
+    try:
+        pedido = Pedido.query.get_or_404(pedido_id)
+        if pedido.user_id != current_user.id:
+            abort(403)
+    except Exception:
+        central_pagamentos.cancelar(pedido_id)
+        raise
+    status_inicial = pedido.status
+    db.session.close()  # Não prende uma ligação do pool enquanto espera
+
+    duracao = current_app.config['PAGAMENTO_SSE_DURACAO']
+    intervalo = current_app.config['PAGAMENTO_SSE_INTERVALO_VERIFICACAO']
+
+    def gerar():
+        status = status_inicial
+        yield f"retry: 3000\nevent: status\ndata: {json.dumps({'status': status})}\n\n"
+        limite = time.monotonic() + duracao
+        while sse and status == 'Pendente':
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                return
+            novo_status = central_pagamentos.aguardar(pedido_id, status, min(intervalo, restante))
+            if novo_status is None:
+                # Nada publicado neste processo: confirma no banco
+                novo_status = db.session.query(Pedido.status).filter_by(id=pedido_id).scalar()
+                db.session.close()
+            if novo_status != status:
+                status = novo_status
+                yield f"event: status\ndata: {json.dumps({'status': status})}\n\n"
+            else:
+                yield ": ping\n\n"
+
+    resposta = Response(stream_with_context(gerar()), mimetype='text/event-stream')
+    resposta.headers['Cache-Control'] = 'no-cache'
+    resposta.headers['X-Accel-Buffering'] = 'no'
+    resposta.call_on_close(lambda: central_pagamentos.cancelar(pedido_id))
+    return resposta
+
 @main_bp.route("/receber_notificacao_webhook", methods=["POST"])
 def receber_notificacao_webhook():
-    sdk = current_app.sdk
-    data = request.json
-    if data and data.get("type") == "payment":
-        payment_id = data.get("data", {}).get("id")
-        if payment_id:
-            try:
-                payment_info_response = sdk.payment().get(payment_id)
-                payment_info = payment_info_response.get("response", {})
-                
-                if payment_info.get("status") == "approved" and payment_info.get("external_reference"):
-                    pedido_id_str = payment_info["external_reference"].split('-')[0]
-                    pedido_id = int(pedido_id_str)
-
-                    # Usar o app_context para acessar o banco de dados fora de uma requisição normal
-                    with current_app.app_context():
-                        pedido = Pedido.query.get(pedido_id)
-                        if pedido and pedido.status != "Pago":
-                            pedido.status = "Pago"
-                            db.session.commit()
-                            print(f"✅ Pedido {pedido_id} atualizado para 'Pago' via Webhook.")
-            except Exception as e:
-                print(f"🚨 Erro ao processar notificação de pagamento via Webhook: {e}")
+    # Apenas guarda a notificação na fila e responde logo; a consulta ao
+    # Mercado Pago é feita pelo worker (flask processar-webhooks)
+    try:
+        enfileirar_notificacao(request.get_json(silent=True))
+    except Exception as e:
+        db.session.rollback()
+        print(f"🚨 Erro ao enfileirar notificação de pagamento via Webhook: {e}")
+        return jsonify({"status": "erro"}), 500
     return jsonify({"status": "ok"}), 200
 
 @main_bp.route("/compra_certa")
@@ -247,16 +445,17 @@ def compra_certa():
         return redirect(url_for('main.minha_conta'))
         
     pedido_id = int(pedido_id_timestamp.split('-')[0])
-    pedido = Pedido.query.filter_by(id=pedido_id, token=token).first_or_404()
-    
-    if pedido.user_id != current_user.id:
-        flash("Acesso não autorizado.", "danger")
-        return redirect(url_for('main.homepage'))
 
-    # Atualiza o status caso o webhook ainda não tenha processado
-    if pedido.status != 'Pago':
-        pedido.status = 'Pago'
+    # Atualiza o status caso o webhook ainda não tenha processado: um só
+    # UPDATE condicional, que não faz nada se o pedido já estiver pago
+    if transitar_status([pedido_id], 'Pago', 'retorno', Pedido.token == token, Pedido.user_id == current_user.id):
         db.session.commit()
+        central_pagamentos.publicar(pedido_id, 'Pago')
+    else:
+        pedido = Pedido.query.filter_by(id=pedido_id, token=token).first_or_404()
+        if pedido.user_id != current_user.id:
+            flash("Acesso não autorizado.", "danger")
+            return redirect(url_for('main.homepage'))
 
     flash("Pagamento aprovado com sucesso!", "success")
     return redirect(url_for('main.minha_conta'))
@@ -265,4 +464,15 @@ def compra_certa():
 @main_bp.route("/compra_errada")
 def compra_errada():
     flash("O pagamento falhou ou foi cancelado. Tente novamente.", "danger")
-    return redirect(url_for('main.cart'))
\ No newline at end of file
+    return redirect(url_for('main.cart'))
+
+@main_bp.route("/metrics")
+def metricas_prometheus():
+    # Texto no formato do Prometheus (ver app/instrumentacao.py). Acesso de
+    # admins com sessão ou com 'Authorization: Bearer <METRICAS_TOKEN>'
+    token = current_app.config['METRICAS_TOKEN']
+    autorizado_por_token = token and hmac.compare_digest(
+        request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not autorizado_por_token and not (current_user.is_authenticated and current_user.is_admin):
+        abort(403)
+    return Response(exportar_prometheus(current_app), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,44 @@
+# app/sdk_preguicoso.py
+# O SDK do Mercado Pago (e o requests/urllib3 que ele traz) só é importado e
+# criado na primeira chamada, não em create_app: os workers arrancam mais
+# depressa e os comandos que não falam com o Mercado Pago (ex.: 'flask db
+# upgrade') funcionam sem MP_ACCESS_TOKEN.
+import os
+import threading
+
+
+class SdkPreguicoso:
+    """Substituto de app.sdk que cria o SDK real no primeiro acesso.
+
+    Qualquer atributo (preference, payment, http_client, ...) é lido do SDK
+    real. As funções em `ao_criar` recebem o SDK logo depois de ele ser
+    criado (ex.: para registar ouvintes no cliente HTTP).
+    """
+
+    def __init__(self, config):
+        self._config = config
+        self._sdk = None
+        self._lock = threading.Lock()
+        self.ao_criar = []
+
+    @property
+    def criado(self):
+        return self._sdk is not None
+
+    def obter(self):
+        if self._sdk is None:
+            with self._lock:
+                if self._sdk is None:
+                    access_token = os.getenv("MP_ACCESS_TOKEN")
+                    if not access_token:
+                        raise ValueError("A variável de ambiente MP_ACCESS_TOKEN não foi configurada.")
+                    from app.mercadopago_client import criar_sdk
+                    sdk = criar_sdk(access_token, self._config)
+                    for funcao in self.ao_criar:
+                        funcao(sdk)
+                    self._sdk = sdk
+        return self._sdk
+
+    def __getattr__(self, nome):
+        # Só é chamado para atributos que não existem no próprio substituto
+        return getattr(self.obter(), nome)
@@ -0,0 +1,65 @@
+# app/senhas.py
+import re
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from app import bcrypt
+
+_CUSTO_HASH = re.compile(r'^\$2[abxy]?\$(\d{2})\$')
+
+
+class ServicoSenhas:
+    """Hash e verificação de senhas num pool limitado de threads.
+
+    O bcrypt liberta o GIL enquanto calcula, por isso um pool de threads
+    chega para o tirar da thread do pedido; o tamanho do pool limita quantos
+    hashes correm ao mesmo tempo, e uma rajada de logins fica na fila em vez
+    de ocupar todo o CPU do worker.
+    """
+
+    def __init__(self, rounds=12, workers=4, timeout=30, executor=None, antecipar_hash_ficticio=True):
+        self.rounds = rounds
+        self.timeout = timeout
+        # `executor` permite usar outro pool (ex.: o do gevent, ver app/cooperativo.py)
+        self._executor = executor or ThreadPoolExecutor(max_workers=workers, thread_name_prefix='senhas')
+        # Hash de uma senha aleatória, com o mesmo custo das reais, usado para
+        # que um e-mail inexistente demore o mesmo que uma senha errada. No
+        # servidor web é pedido já ao pool (sem atrasar o arranque): gerado no
+        # primeiro login com um e-mail desconhecido, esse login pagaria dois
+        # hashes. Nos comandos da CLI, que não fazem logins, só se gera se for
+        # preciso.
+        self._hash_ficticio = None
+        self._lock = threading.Lock()
+        if antecipar_hash_ficticio:
+            self._pedir_hash_ficticio()
+
+    def _pedir_hash_ficticio(self):
+        with self._lock:
+            if self._hash_ficticio is None:
+                self._hash_ficticio = self._executor.submit(self._gerar, secrets.token_urlsafe(16))
+            return self._hash_ficticio
+
+    def _gerar(self, senha):
+        return bcrypt.generate_password_hash(senha, self.rounds).decode('utf-8')
+
+    def gerar_hash(self, senha):
+        return self._executor.submit(self._gerar, senha).result(self.timeout)
+
+    def verificar(self, password_hash, senha):
+        futuro = self._executor.submit(bcrypt.check_password_hash, password_hash, senha)
+        return futuro.result(self.timeout)
+
+    def verificar_login(self, user, senha):
+        """Verifica a senha de um utilizador que pode não existir (user=None).
+
+        Sem utilizador, verifica contra o hash fictício e devolve False, para
+        que a resposta não revele se o e-mail está registado.
+        """
+        if user is None:
+            self.verificar(self._pedir_hash_ficticio().result(self.timeout), senha)
+            return False
+        return self.verificar(user.password_hash, senha)
+
+    def precisa_rehash(self, password_hash):
+        custo = _CUSTO_HASH.match(password_hash or '')
+        return custo is None or int(custo.group(1)) != self.rounds
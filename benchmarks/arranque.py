@@ -0,0 +1,133 @@
+# benchmarks/arranque.py
+# Mede o arranque da aplicação (import de app + create_app) com
+# 'python -X importtime', num processo novo por medição, em cada MODO_APP:
+#
+#   python -m benchmarks.arranque --repeticoes 5 --saida arranque.json
+#
+# Serve também de verificação para o CI: termina com código 1 se algum modo
+# importar um módulo que devia ficar para depois (ex.: o SDK do Mercado Pago
+# ou o Alembic no modo web) ou se a mediana passar de --max-ms. A verificação
+# dos módulos corre também nos testes (tests/test_arranque.py).
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Módulos que cada modo não deve importar ao arrancar
+PROIBIDOS = {
+    'web': ('mercadopago', 'flask_migrate', 'alembic'),
+    'cli': ('mercadopago', 'flask_admin', 'flask_babel', 'flask_wtf', 'app.routes', 'app.admin_views'),
+}
+
+CODIGO = """
+import json, sys, time
+inicio = time.perf_counter()
+from app import create_app
+importado = time.perf_counter()
+create_app(sys.argv[1])
+fim = time.perf_counter()
+print(json.dumps({'import_ms': (importado - inicio) * 1000, 'create_app_ms': (fim - importado) * 1000}))
+"""
+
+
+def ler_importtime(texto):
+    """Devolve [(módulo, profundidade, acumulado_ms)] da saída de -X importtime."""
+    modulos = []
+    for linha in texto.splitlines():
+        if not linha.startswith('import time:') or 'cumulative' in linha:
+            continue
+        _, acumulado, nome = linha.split('|', 2)
+        profundidade = (len(nome) - len(nome.lstrip(' ')) - 1) // 2
+        modulos.append((nome.strip(), profundidade, int(acumulado) / 1000))
+    return modulos
+
+
+def ambiente_arranque(raiz):
+    """Ambiente dos processos medidos: banco temporário e `raiz` no PYTHONPATH."""
+    # Sem MP_ACCESS_TOKEN: o arranque não pode depender dele
+    ambiente = {chave: valor for chave, valor in os.environ.items() if chave != 'MP_ACCESS_TOKEN'}
+    ambiente['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='loja-arranque-'), 'loja.db')}"
+    ambiente['PYTHONPATH'] = os.pathsep.join(filter(None, [raiz, ambiente.get('PYTHONPATH')]))
+    return ambiente
+
+
+def proibidos_carregados(modo, nomes):
+    """Módulos de `nomes` que o modo não devia ter importado ao arrancar."""
+    return sorted(
+        nome for nome in nomes
+        if any(nome == p or nome.startswith(p + '.') for p in PROIBIDOS.get(modo, ()))
+    )
+
+
+def medir(modo, ambiente):
+    saida = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CODIGO, modo],
+        env=ambiente, capture_output=True, text=True, check=True,
+    )
+    tempos = json.loads(saida.stdout.strip().splitlines()[-1])
+    return tempos, ler_importtime(saida.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Tempo de arranque da aplicação por MODO_APP.')
+    parser.add_argument('--modos', default=','.join(PROIBIDOS), help='Modos a medir, separados por vírgula.')
+    parser.add_argument('--repeticoes', type=int, default=5, help='Processos medidos por modo.')
+    parser.add_argument('--top', type=int, default=10, help='Módulos mais caros a mostrar por modo.')
+    parser.add_argument('--max-ms', type=float, help='Falha se a mediana (import + create_app) passar deste valor.')
+    parser.add_argument('--saida', help='Ficheiro JSON de saída (por omissão, stdout).')
+    args = parser.parse_args(argv)
+
+    ambiente = ambiente_arranque(os.getcwd())
+
+    from benchmarks.comum import commit_atual
+    resultado = {'commit': commit_atual(), 'parametros': vars(args), 'python': sys.version.split()[0], 'modos': {}}
+    falhas = []
+    for modo in args.modos.split(','):
+        totais, imports, creates = [], [], []
+        acumulados = {}
+        carregados = set()
+        for _ in range(args.repeticoes):
+            tempos, modulos = medir(modo, ambiente)
+            imports.append(tempos['import_ms'])
+            creates.append(tempos['create_app_ms'])
+            totais.append(tempos['import_ms'] + tempos['create_app_ms'])
+            for nome, profundidade, acumulado in modulos:
+                carregados.add(nome)
+                if profundidade == 0:
+                    acumulados.setdefault(nome, []).append(acumulado)
+
+        proibidos = proibidos_carregados(modo, carregados)
+        mais_caros = sorted(
+            ((nome, statistics.median(valores)) for nome, valores in acumulados.items()),
+            key=lambda item: item[1], reverse=True,
+        )[:args.top]
+        mediana = statistics.median(totais)
+        resultado['modos'][modo] = {
+            'total_ms': round(mediana, 1),
+            'import_ms': round(statistics.median(imports), 1),
+            'create_app_ms': round(statistics.median(creates), 1),
+            'modulos_carregados': len(carregados),
+            'mais_caros_ms': {nome: round(ms, 1) for nome, ms in mais_caros},
+            'proibidos': proibidos,
+        }
+        if proibidos:
+            falhas.append(f"{modo}: importou {', '.join(proibidos[:5])}")
+        if args.max_ms is not None and mediana > args.max_ms:
+            falhas.append(f"{modo}: {mediana:.0f} ms > {args.max_ms:.0f} ms")
+
+    texto = json.dumps(resultado, indent=2)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as ficheiro:
+            ficheiro.write(texto + '\n')
+    print(texto)
+    if falhas:
+        for falha in falhas:
+            print(f"FALHA {falha}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
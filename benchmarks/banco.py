@@ -0,0 +1,157 @@
+# benchmarks/banco.py
+# Compara perfis do engine sob carga mista: leitores em /minha_conta e
+# /api/produtos enquanto escritores mexem nos carrinhos (tabelas do banco).
+# Cada perfil corre num processo à parte, porque as opções do engine são
+# lidas do ambiente quando a app é criada:
+#
+#   python -m benchmarks.banco --leitores 8 --escritores 4 --duracao 10 --saida banco.json
+#
+# Perfis: 'delete' (journal clássico do SQLite, synchronous=FULL), 'wal'
+# (WAL + synchronous=NORMAL) e 'wal-replica' (WAL, com as rotas
+# @somente_leitura a ler de uma cópia do banco).
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+PERFIS = {
+    'delete': {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL'},
+    'wal': {'SQLITE_JOURNAL_MODE': 'WAL', 'SQLITE_SYNCHRONOUS': 'NORMAL'},
+    'wal-replica': {'SQLITE_JOURNAL_MODE': 'WAL', 'SQLITE_SYNCHRONOUS': 'NORMAL', 'replica': True},
+}
+
+
+def copiar_sqlite(origem, destino):
+    fonte = sqlite3.connect(origem)
+    copia = sqlite3.connect(destino)
+    fonte.backup(copia)
+    copia.execute('PRAGMA journal_mode=WAL')
+    copia.close()
+    fonte.close()
+
+
+def executar_perfil(args):
+    """Corre um perfil no processo atual e devolve o resultado."""
+    from benchmarks.comum import criar_app_benchmark, semear_banco, percentil
+
+    if args.replica:
+        os.environ['DATABASE_REPLICA_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='loja-replica-'), 'replica.db')}"
+    app = criar_app_benchmark()
+    ids_produtos, ids_utilizadores = semear_banco(
+        app, produtos=args.produtos, utilizadores=args.leitores + args.escritores, pedidos_por_utilizador=args.pedidos,
+    )
+    if args.replica:
+        copiar_sqlite(
+            app.config['SQLALCHEMY_DATABASE_URI'].removeprefix('sqlite:///'),
+            os.environ['DATABASE_REPLICA_URL'].removeprefix('sqlite:///'),
+        )
+
+    fim = time.perf_counter() + args.duracao
+    resultados = {'leituras': [], 'escritas': [], 'erros_leitura': 0, 'erros_escrita': 0}
+    lock = threading.Lock()
+
+    def sessao(indice):
+        cliente = app.test_client()
+        cliente.post('/login', data={'email': f'bench{indice}@loja-bench.com', 'password': 'senha-benchmark'})
+        return cliente
+
+    def leitor(indice):
+        cliente = sessao(indice)
+        caminhos = ('/minha_conta', '/api/produtos')
+        n = 0
+        while time.perf_counter() < fim:
+            inicio = time.perf_counter()
+            try:
+                ok = cliente.get(caminhos[n % 2]).status_code == 200
+            except Exception:
+                ok = False
+            duracao = (time.perf_counter() - inicio) * 1000
+            n += 1
+            with lock:
+                resultados['leituras'].append(duracao)
+                resultados['erros_leitura'] += not ok
+
+    def escritor(indice):
+        cliente = sessao(indice)
+        n = 0
+        while time.perf_counter() < fim:
+            produto_id = ids_produtos[(indice * 7919 + n) % len(ids_produtos)]
+            inicio = time.perf_counter()
+            try:
+                ok = cliente.post(f'/add_to_cart/{produto_id}').status_code == 302
+            except Exception:
+                ok = False
+            duracao = (time.perf_counter() - inicio) * 1000
+            n += 1
+            with lock:
+                resultados['escritas'].append(duracao)
+                resultados['erros_escrita'] += not ok
+
+    trabalhadores = [threading.Thread(target=leitor, args=(i,)) for i in range(args.leitores)]
+    trabalhadores += [threading.Thread(target=escritor, args=(args.leitores + i,)) for i in range(args.escritores)]
+    for trabalhador in trabalhadores:
+        trabalhador.start()
+    for trabalhador in trabalhadores:
+        trabalhador.join()
+
+    leituras = sorted(resultados['leituras'])
+    escritas = sorted(resultados['escritas'])
+    return {
+        'leituras_por_segundo': round(len(leituras) / args.duracao, 2),
+        'leitura_p50_ms': round(percentil(leituras, 50) or 0, 3),
+        'leitura_p95_ms': round(percentil(leituras, 95) or 0, 3),
+        'erros_leitura': resultados['erros_leitura'],
+        'escritas_por_segundo': round(len(escritas) / args.duracao, 2),
+        'escrita_p50_ms': round(percentil(escritas, 50) or 0, 3),
+        'escrita_p95_ms': round(percentil(escritas, 95) or 0, 3),
+        'erros_escrita': resultados['erros_escrita'],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark dos perfis do engine (SQLite).')
+    parser.add_argument('--perfis', default=','.join(PERFIS), help='Perfis a comparar, separados por vírgula.')
+    parser.add_argument('--produtos', type=int, default=2000, help='Tamanho do catálogo.')
+    parser.add_argument('--pedidos', type=int, default=20, help='Pedidos já existentes por utilizador.')
+    parser.add_argument('--leitores', type=int, default=6, help='Threads só de leitura.')
+    parser.add_argument('--escritores', type=int, default=2, help='Threads que escrevem nos carrinhos.')
+    parser.add_argument('--duracao', type=float, default=5.0, help='Duração (s) de cada perfil.')
+    parser.add_argument('--saida', help='Ficheiro JSON de saída (por omissão, stdout).')
+    parser.add_argument('--replica', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--interno', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.interno:
+        print(json.dumps(executar_perfil(args)))
+        return
+
+    from benchmarks.comum import commit_atual
+    resultado = {'commit': commit_atual(), 'parametros': vars(args), 'python': sys.version.split()[0], 'perfis': {}}
+    for nome in args.perfis.split(','):
+        perfil = dict(PERFIS[nome])
+        ambiente = dict(os.environ, BCRYPT_LOG_ROUNDS='4', PAGINA_CACHE_TTL='0', **{
+            chave: valor for chave, valor in perfil.items() if chave != 'replica'
+        })
+        comando = [sys.executable, '-m', 'benchmarks.banco', '--interno',
+                   '--produtos', str(args.produtos), '--pedidos', str(args.pedidos),
+                   '--leitores', str(args.leitores), '--escritores', str(args.escritores),
+                   '--duracao', str(args.duracao)]
+        if perfil.get('replica'):
+            comando.append('--replica')
+        saida = subprocess.run(comando, env=ambiente, capture_output=True, text=True, check=True).stdout
+        resultado['perfis'][nome] = json.loads(saida.strip().splitlines()[-1])
+
+    texto = json.dumps(resultado, indent=2)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as ficheiro:
+            ficheiro.write(texto + '\n')
+    print(texto)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+# benchmarks/checkout_concorrente.py
+# Checkouts simultâneos contra um Gunicorn de um só worker, com o Mercado
+# Pago substituído pelo servidor falso (flask mp-fake-server) com latência
+# artificial, para cada tipo de worker de gunicorn.conf.py:
+#
+#   python -m benchmarks.checkout_concorrente --latencia 0.2 --clientes 1,8,32,64 --saida checkout.json
+#
+# Cada cliente tem a sua sessão (login próprio) e repete "adicionar ao
+# carrinho + /checkout" durante --duracao segundos. Mostra os checkouts por
+# segundo do worker e a latência do /checkout; com a latência do Mercado
+# Pago fixa, o máximo teórico é clientes / latência.
+import argparse
+import itertools
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+TIPOS_WORKER = ('sync', 'gthread', 'gevent')
+_CSRF = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+# Numera os carrinhos de todas as medições (ver medir)
+_CARRINHOS = itertools.count()
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def esperar_servidor(url, processo, timeout=30):
+    import requests
+
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError(f"O servidor terminou com código {processo.returncode}")
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    raise RuntimeError(f"O servidor em {url} não respondeu em {timeout} s")
+
+
+def parar(processo):
+    processo.terminate()
+    try:
+        processo.wait(10)
+    except subprocess.TimeoutExpired:
+        processo.kill()
+
+
+def entrar(url, indice):
+    import requests
+
+    sessao = requests.Session()
+    pagina = sessao.get(f'{url}/login').text
+    sessao.post(f'{url}/login', data={
+        'csrf_token': _CSRF.search(pagina).group(1),
+        'email': f'bench{indice}@loja-bench.com',
+        'password': 'senha-benchmark',
+    })
+    return sessao
+
+
+def medir(url, clientes, duracao, ids_produtos):
+    from benchmarks.comum import percentil
+
+    sessoes = [entrar(url, i) for i in range(clientes)]
+    resultados = {'checkouts': [], 'erros': 0}
+    lock = threading.Lock()
+    barreira = threading.Barrier(clientes)
+
+    def cliente(indice):
+        sessao = sessoes[indice]
+        barreira.wait()
+        fim = time.perf_counter() + duracao
+        while time.perf_counter() < fim:
+            # Um par de produtos diferente em cada compra: o carrinho nunca
+            # repete a chave de idempotência de um pedido pendente (que seria
+            # reutilizado sem chamar o Mercado Pago)
+            numero = next(_CARRINHOS)
+            par = (numero % len(ids_produtos), numero // len(ids_produtos) % len(ids_produtos))
+            try:
+                for i in par:
+                    sessao.post(f'{url}/add_to_cart/{ids_produtos[i]}', allow_redirects=False)
+                inicio = time.perf_counter()
+                resposta = sessao.get(f'{url}/checkout', allow_redirects=False)
+                duracao_ms = (time.perf_counter() - inicio) * 1000
+                ok = resposta.status_code == 200  # Falhas redirecionam para o carrinho
+            except Exception:
+                ok = False
+            with lock:
+                if ok:
+                    resultados['checkouts'].append(duracao_ms)
+                else:
+                    resultados['erros'] += 1
+
+    trabalhadores = [threading.Thread(target=cliente, args=(i,)) for i in range(clientes)]
+    inicio = time.perf_counter()
+    for trabalhador in trabalhadores:
+        trabalhador.start()
+    for trabalhador in trabalhadores:
+        trabalhador.join()
+    # Os checkouts já começados acabam depois de `duracao`: conta o tempo real
+    segundos = time.perf_counter() - inicio
+    for sessao in sessoes:
+        sessao.close()
+
+    tempos = sorted(resultados['checkouts'])
+    return {
+        'checkouts_por_segundo': round(len(tempos) / segundos, 1),
+        'checkout_p50_ms': round(percentil(tempos, 50) or 0, 1),
+        'checkout_p95_ms': round(percentil(tempos, 95) or 0, 1),
+        'erros': resultados['erros'],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Checkouts simultâneos por worker do Gunicorn.')
+    parser.add_argument('--workers', default=','.join(TIPOS_WORKER), help='Tipos de worker, separados por vírgula.')
+    parser.add_argument('--clientes', default='1,8,32,64', help='Níveis de clientes simultâneos.')
+    parser.add_argument('--latencia', type=float, default=0.2, help='Latência (s) do Mercado Pago falso.')
+    parser.add_argument('--duracao', type=float, default=10.0, help='Duração (s) de cada nível.')
+    parser.add_argument('--produtos', type=int, default=2000, help='Tamanho do catálogo.')
+    parser.add_argument('--saida', help='Ficheiro JSON de saída (por omissão, stdout).')
+    args = parser.parse_args(argv)
+
+    niveis = [int(n) for n in args.clientes.split(',')]
+    os.environ['BCRYPT_LOG_ROUNDS'] = '4'
+    from benchmarks.comum import criar_app_benchmark, semear_banco, commit_atual
+
+    app = criar_app_benchmark()  # Define DATABASE_URL para os processos filhos
+    ids_produtos, _ = semear_banco(app, produtos=args.produtos, utilizadores=max(niveis), pedidos_por_utilizador=0)
+
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ambiente = dict(os.environ, FLASK_APP='wsgi.py', MP_ACCESS_TOKEN='TEST-benchmark', PAGINA_CACHE_TTL='0')
+    ambiente['PYTHONPATH'] = os.pathsep.join(filter(None, [raiz, ambiente.get('PYTHONPATH')]))
+    resultado = {'commit': commit_atual(), 'parametros': vars(args), 'python': sys.version.split()[0], 'workers': {}}
+    for tipo in args.workers.split(','):
+        # Servidor falso e Gunicorn novos para cada tipo de worker
+        porta_mp, porta = porta_livre(), porta_livre()
+        url = f'http://127.0.0.1:{porta}'
+        opcoes_worker = {'GUNICORN_WORKER_CLASS': tipo, 'WEB_CONCURRENCY': '1'}
+        if tipo == 'gthread':
+            opcoes_worker['GUNICORN_THREADS'] = str(max(niveis))
+        elif tipo == 'gevent':
+            opcoes_worker['GUNICORN_WORKER_CONNECTIONS'] = str(max(niveis))
+        mp_falso = subprocess.Popen(
+            [sys.executable, '-m', 'flask', 'mp-fake-server', '--porta', str(porta_mp), '--latencia', str(args.latencia)],
+            cwd=raiz, env=dict(ambiente, MODO_APP='cli'), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            text=True,
+        )
+        servidor = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', os.path.join(raiz, 'gunicorn.conf.py'), 'wsgi:app'],
+            cwd=raiz, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, text=True,
+            env=dict(ambiente, MODO_APP='web', SITE_URL=url, MP_API_BASE_URL=f'http://127.0.0.1:{porta_mp}',
+                     GUNICORN_BIND=f'127.0.0.1:{porta}', **opcoes_worker),
+        )
+        try:
+            esperar_servidor(f'http://127.0.0.1:{porta_mp}/v1/payments/0', mp_falso)
+            esperar_servidor(f'{url}/login', servidor)
+            resultado['workers'][tipo] = {}
+            for clientes in niveis:
+                medicao = medir(url, clientes, args.duracao, ids_produtos)
+                medicao['maximo_teorico_por_segundo'] = round(clientes / args.latencia, 1) if args.latencia else None
+                resultado['workers'][tipo][str(clientes)] = medicao
+        finally:
+            parar(servidor)
+            parar(mp_falso)
+
+    texto = json.dumps(resultado, indent=2)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as ficheiro:
+            ficheiro.write(texto + '\n')
+    print(texto)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+# benchmarks/comum.py
+# Utilitários partilhados pelos benchmarks (executar a partir da raiz do projeto,
+# ex.: python -m benchmarks.login)
+import itertools
+import os
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+
+def criar_app_benchmark(**config):
+    """Cria a aplicação sobre um SQLite temporário, com as tabelas criadas.
+
+    `config` é aplicado por cima de app.config depois de create_app(). A
+    aplicação devolvida tem o CSRF desligado para os formulários poderem ser
+    submetidos pelo test client.
+    """
+    pasta = tempfile.mkdtemp(prefix='loja-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(pasta, 'loja.db')}"
+    os.environ.setdefault('MP_ACCESS_TOKEN', 'TEST-benchmark')
+
+    from app import create_app, db
+    app = create_app()
+    app.config.update(WTF_CSRF_ENABLED=False, **config)
+    with app.app_context():
+        db.create_all()
+        # O índice de pesquisa (FTS5 e triggers) é criado pela migração
+        from app.pesquisa import garantir_indice
+        garantir_indice()
+    return app
+
+
+class SdkFalso:
+    """Substituto em memória do mercadopago.SDK, com latência artificial.
+
+    Só implementa o que a loja usa: preference().create, payment().get e
+    payment().search. Os pagamentos consultados aparecem aprovados para a
+    external_reference registada em `referencias` (payment_id ->
+    external_reference).
+    """
+
+    def __init__(self, latencia=0.0):
+        self.latencia = latencia
+        self.referencias = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _esperar(self):
+        if self.latencia:
+            time.sleep(self.latencia)
+
+    def preference(self):
+        return self
+
+    def payment(self):
+        return _PagamentosFalsos(self)
+
+    def create(self, dados):
+        self._esperar()
+        with self._lock:
+            preferencia_id = f"pref-{next(self._ids)}"
+        return {"status": 201, "response": {"id": preferencia_id, **dados}}
+
+
+class _PagamentosFalsos:
+    def __init__(self, sdk):
+        self.sdk = sdk
+
+    def get(self, payment_id):
+        self.sdk._esperar()
+        referencia = self.sdk.referencias.get(str(payment_id))
+        if referencia is None:
+            return {"status": 404, "response": {"message": "Payment not found"}}
+        return {"status": 200, "response": {"id": payment_id, "status": "approved", "external_reference": referencia}}
+
+    def search(self, filtros=None):
+        self.sdk._esperar()
+        referencia = (filtros or {}).get("external_reference")
+        resultados = [
+            {"id": payment_id, "status": "approved", "external_reference": r}
+            for payment_id, r in self.sdk.referencias.items() if r == referencia
+        ]
+        return {"status": 200, "response": {"results": resultados}}
+
+
+def semear_banco(app, produtos=1000, utilizadores=10, pedidos_por_utilizador=10, itens_por_pedido=3, lote=5000,
+                 caminho_catalogo=None):
+    """Preenche o banco com inserções em lote e devolve os ids criados.
+
+    Aceita também um `caminho_catalogo` (CSV/JSONL) para usar um catálogo
+    exportado com 'flask exportar-produtos' em vez do gerado.
+    """
+    from sqlalchemy import insert
+    from app import db
+    from app.catalogo_io import importar_produtos, ler_registos, formato_do_ficheiro
+    from app.relatorios import recalcular_relatorios
+    from app.models import Produto, User, Pedido, ItemPedido
+
+    aleatorio = random.Random(42)
+    with app.app_context():
+        password_hash = app.senhas.gerar_hash('senha-benchmark')
+        # O catálogo passa pelo mesmo caminho de 'flask importar-produtos'
+        if caminho_catalogo:
+            with open(caminho_catalogo, encoding='utf-8', newline='') as ficheiro:
+                importar_produtos(ler_registos(ficheiro, formato_do_ficheiro(caminho_catalogo)), tamanho_lote=lote)
+        else:
+            importar_produtos(
+                ((i, {'nome': f'Produto {i:07d}', 'preco': Decimal(aleatorio.randint(100, 99999)) / 100})
+                 for i in range(produtos)),
+                tamanho_lote=lote,
+            )
+        db.session.execute(insert(User), [
+            {'username': f'bench{i}', 'email': f'bench{i}@loja-bench.com', 'password_hash': password_hash, 'is_admin': False}
+            for i in range(utilizadores)
+        ])
+        db.session.commit()
+
+        ids_produtos = [i for (i,) in db.session.query(Produto.id)]
+        ids_utilizadores = [i for (i,) in db.session.query(User.id).order_by(User.id)]
+        for user_id in ids_utilizadores:
+            for _ in range(pedidos_por_utilizador):
+                pedido = Pedido(user_id=user_id, total=0, status='Pago', token='bench')
+                db.session.add(pedido)
+                db.session.flush()
+                db.session.execute(insert(ItemPedido), [
+                    {'pedido_id': pedido.id, 'produto_id': produto_id, 'quantidade': 1, 'preco_unitario': 1}
+                    for produto_id in aleatorio.sample(ids_produtos, min(itens_por_pedido, len(ids_produtos)))
+                ])
+        db.session.commit()
+        # Os pedidos semeados não passam por transitar_status
+        recalcular_relatorios()
+    return ids_produtos, ids_utilizadores
+
+
+def commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def percentil(valores_ordenados, p):
+    if not valores_ordenados:
+        return None
+    indice = min(len(valores_ordenados) - 1, max(0, round(p / 100 * len(valores_ordenados)) - 1))
+    return valores_ordenados[indice]
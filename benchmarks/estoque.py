@@ -0,0 +1,198 @@
+# benchmarks/estoque.py
+# Teste de stress das reservas de estoque: muitas threads compram ao mesmo
+# tempo o mesmo produto, com poucas unidades, até o estoque acabar:
+#
+#   python -m benchmarks.estoque --threads 32 --estoque 500 --saida estoque.json
+#
+# Compara a reserva de app/estoque.py (UPDATE ... WHERE estoque >= n) com a
+# forma ingénua de ler o estoque, verificar em Python e gravar o valor
+# calculado. Para cada estratégia mostra as compras por segundo e quantas
+# unidades foram vendidas a mais; termina com código 1 se a reserva atómica
+# vender a mais, deixar o estoque negativo ou não devolver as reservas dos
+# pedidos expirados.
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+ESTRATEGIAS = ('atomica', 'leitura_escrita')
+
+
+def comprar_leitura_escrita(user_id, produto, quantidade, chave):
+    """A forma ingénua: lê o estoque, decide e grava o valor calculado."""
+    from app import db
+    from app.models import Pedido, ItemPedido, Produto
+    from app.estoque import EstoqueInsuficiente
+
+    estoque = db.session.scalar(db.select(Produto.estoque).where(Produto.id == produto.id))
+    db.session.commit()  # A decisão é tomada fora da transação que grava
+    if estoque < quantidade:
+        raise EstoqueInsuficiente(produto.id)
+    pedido = Pedido(user_id=user_id, total=produto.preco * quantidade, status='Pendente', token='bench',
+                    chave_idempotencia=chave)
+    db.session.add(pedido)
+    db.session.flush()
+    db.session.add(ItemPedido(pedido_id=pedido.id, produto_id=produto.id, quantidade=quantidade,
+                              preco_unitario=produto.preco))
+    db.session.execute(db.update(Produto).where(Produto.id == produto.id).values(estoque=estoque - quantidade))
+    db.session.commit()
+    return pedido
+
+
+def executar(estrategia, args):
+    from benchmarks.comum import criar_app_benchmark, semear_banco, percentil
+    from app import db
+    from app.models import Pedido, ItemPedido, Produto, ReservaEstoque
+    from app.pedidos import criar_pedido, transitar_status
+    from app.estoque import EstoqueInsuficiente
+    from app.arquivo import expirar_pendentes
+
+    app = criar_app_benchmark()
+    ids_produtos, ids_utilizadores = semear_banco(app, produtos=10, utilizadores=args.threads, pedidos_por_utilizador=0)
+    with app.app_context():
+        produto = db.session.get(Produto, ids_produtos[0])
+        produto.estoque = args.estoque
+        db.session.commit()
+        db.session.refresh(produto)
+        db.session.expunge(produto)  # Partilhado (só para leitura) pelas threads
+
+    resultados = {'compras': [], 'sem_estoque': 0, 'erros': 0}
+    lock = threading.Lock()
+    barreira = threading.Barrier(args.threads)
+
+    def comprador(indice):
+        aleatorio = random.Random(indice)
+        user_id = ids_utilizadores[indice]
+        with app.app_context():
+            barreira.wait()
+            for n in range(args.tentativas):
+                quantidade = aleatorio.randint(1, args.quantidade_max)
+                chave = f'{indice}-{n}'
+                inicio = time.perf_counter()
+                try:
+                    if estrategia == 'atomica':
+                        criar_pedido(user_id, [produto], {produto.id: quantidade}, chave, 3600)
+                    else:
+                        comprar_leitura_escrita(user_id, produto, quantidade, chave)
+                    resultado = 'compras'
+                except EstoqueInsuficiente:
+                    db.session.rollback()
+                    resultado = 'sem_estoque'
+                except Exception:
+                    db.session.rollback()
+                    resultado = 'erros'
+                duracao = (time.perf_counter() - inicio) * 1000
+                with lock:
+                    if resultado == 'compras':
+                        resultados['compras'].append(duracao)
+                    else:
+                        resultados[resultado] += 1
+                if resultado == 'sem_estoque':
+                    break
+            db.session.remove()
+
+    trabalhadores = [threading.Thread(target=comprador, args=(i,)) for i in range(args.threads)]
+    inicio = time.perf_counter()
+    for trabalhador in trabalhadores:
+        trabalhador.start()
+    for trabalhador in trabalhadores:
+        trabalhador.join()
+    segundos = time.perf_counter() - inicio
+
+    with app.app_context():
+        vendidas = db.session.scalar(
+            db.select(db.func.coalesce(db.func.sum(ItemPedido.quantidade), 0)).where(ItemPedido.produto_id == produto.id)
+        )
+        estoque_final = db.session.scalar(db.select(Produto.estoque).where(Produto.id == produto.id))
+        reservadas = db.session.scalar(db.select(db.func.coalesce(db.func.sum(ReservaEstoque.quantidade), 0)))
+        compras = sorted(resultados['compras'])
+        resultado = {
+            'compras': len(compras),
+            'compras_por_segundo': round(len(compras) / segundos, 1),
+            'compra_p50_ms': round(percentil(compras, 50) or 0, 3),
+            'compra_p95_ms': round(percentil(compras, 95) or 0, 3),
+            'recusadas_sem_estoque': resultados['sem_estoque'],
+            'erros': resultados['erros'],
+            'unidades_vendidas': vendidas,
+            'vendidas_a_mais': max(0, vendidas - args.estoque),
+            'estoque_final': estoque_final,
+        }
+        if estrategia == 'atomica':
+            # Metade dos pedidos é paga e o resto expira: as reservas dos
+            # expirados têm de voltar todas ao estoque
+            ids = db.session.scalars(db.select(Pedido.id).where(Pedido.status == 'Pendente').order_by(Pedido.id)).all()
+            transitar_status(ids[::2], 'Pago', 'benchmark')
+            db.session.commit()
+            expirar_pendentes(0, tamanho_lote=args.estoque)
+            pagas = db.session.scalar(
+                db.select(db.func.sum(ItemPedido.quantidade))
+                .join(Pedido, Pedido.id == ItemPedido.pedido_id)
+                .where(Pedido.status == 'Pago')
+            ) or 0
+            resultado.update({
+                'unidades_reservadas_no_fim': reservadas,
+                'unidades_pagas': pagas,
+                'estoque_depois_de_expirar': db.session.scalar(db.select(Produto.estoque).where(Produto.id == produto.id)),
+                'reservas_restantes': db.session.scalar(db.select(db.func.count()).select_from(ReservaEstoque)),
+            })
+        db.session.remove()
+    return resultado
+
+
+def verificar(resultado, estoque):
+    falhas = []
+    if resultado['vendidas_a_mais'] or resultado['estoque_final'] < 0:
+        falhas.append(f"vendeu {resultado['vendidas_a_mais']} unidades a mais (estoque final {resultado['estoque_final']})")
+    if resultado['unidades_reservadas_no_fim'] != estoque - resultado['estoque_final']:
+        falhas.append('as reservas não batem com o estoque retirado')
+    if resultado['estoque_depois_de_expirar'] != estoque - resultado['unidades_pagas'] or resultado['reservas_restantes']:
+        falhas.append('as reservas dos pedidos expirados não voltaram ao estoque')
+    return falhas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Stress das reservas de estoque num produto disputado.')
+    parser.add_argument('--estrategias', default=','.join(ESTRATEGIAS), help='Estratégias, separadas por vírgula.')
+    parser.add_argument('--threads', type=int, default=32, help='Compradores simultâneos.')
+    parser.add_argument('--estoque', type=int, default=500, help='Unidades do produto disputado.')
+    parser.add_argument('--quantidade-max', type=int, default=3, help='Unidades por compra (1 a este valor).')
+    parser.add_argument('--tentativas', type=int, default=1000, help='Compras por thread (para antes se o estoque acabar).')
+    parser.add_argument('--saida', help='Ficheiro JSON de saída (por omissão, stdout).')
+    parser.add_argument('--interno', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.interno:
+        print(json.dumps(executar(args.estrategias, args)))
+        return
+
+    # Cada estratégia corre num processo à parte, com o seu banco
+    from benchmarks.comum import commit_atual
+    resultado = {'commit': commit_atual(), 'parametros': vars(args), 'python': sys.version.split()[0], 'estrategias': {}}
+    falhas = []
+    for estrategia in args.estrategias.split(','):
+        comando = [sys.executable, '-m', 'benchmarks.estoque', '--interno', '--estrategias', estrategia,
+                   '--threads', str(args.threads), '--estoque', str(args.estoque),
+                   '--quantidade-max', str(args.quantidade_max), '--tentativas', str(args.tentativas)]
+        saida = subprocess.run(comando, env=dict(os.environ, BCRYPT_LOG_ROUNDS='4'),
+                               capture_output=True, text=True, check=True).stdout
+        resultado['estrategias'][estrategia] = json.loads(saida.strip().splitlines()[-1])
+        if estrategia == 'atomica':
+            falhas = verificar(resultado['estrategias'][estrategia], args.estoque)
+
+    texto = json.dumps(resultado, indent=2)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as ficheiro:
+            ficheiro.write(texto + '\n')
+    print(texto)
+    if falhas:
+        for falha in falhas:
+            print(f"FALHA {falha}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+# benchmarks/login.py
+# Mede logins por segundo num worker, com o hashing feito pelo ServicoSenhas.
+#
+#   python -m benchmarks.login --rounds 12 --threads 8 --logins 200
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Logins por segundo num worker.')
+    parser.add_argument('--rounds', type=int, default=12, help='Custo do bcrypt (BCRYPT_LOG_ROUNDS).')
+    parser.add_argument('--workers', type=int, default=4, help='Tamanho do pool de hashing (SENHAS_WORKERS).')
+    parser.add_argument('--threads', type=int, default=8, help='Logins simultâneos.')
+    parser.add_argument('--logins', type=int, default=100, help='Total de logins a fazer.')
+    args = parser.parse_args()
+
+    os.environ['BCRYPT_LOG_ROUNDS'] = str(args.rounds)
+    os.environ['SENHAS_WORKERS'] = str(args.workers)
+    from benchmarks.comum import criar_app_benchmark
+    from app import db
+    from app.models import User
+
+    app = criar_app_benchmark()
+    with app.app_context():
+        password_hash = app.senhas.gerar_hash('senha-benchmark')
+        for i in range(args.threads):
+            db.session.add(User(username=f'bench{i}', email=f'bench{i}@loja-bench.com', password_hash=password_hash))
+        db.session.commit()
+
+    latencias = []
+    falhas = [0]
+    lock = threading.Lock()
+    restantes = [args.logins]
+
+    def executar(indice):
+        cliente = app.test_client()
+        while True:
+            with lock:
+                if restantes[0] <= 0:
+                    return
+                restantes[0] -= 1
+            inicio = time.perf_counter()
+            resposta = cliente.post('/login', data={'email': f'bench{indice}@loja-bench.com', 'password': 'senha-benchmark'})
+            cliente.get('/logout')
+            with lock:
+                latencias.append(time.perf_counter() - inicio)
+                if resposta.status_code != 302:  # Login bem-sucedido redireciona
+                    falhas[0] += 1
+
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=executar, args=(i,)) for i in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duracao = time.perf_counter() - inicio
+
+    # Compara o tempo de rejeição de um e-mail inexistente com o de uma senha errada
+    cliente = app.test_client()
+    def tempo_rejeicao(email):
+        amostras = []
+        for _ in range(5):
+            inicio_rejeicao = time.perf_counter()
+            cliente.post('/login', data={'email': email, 'password': 'errada'})
+            amostras.append(time.perf_counter() - inicio_rejeicao)
+        return statistics.median(amostras)
+
+    latencias.sort()
+    print(json.dumps({
+        'rounds': args.rounds,
+        'workers': args.workers,
+        'threads': args.threads,
+        'logins': len(latencias),
+        'falhas': falhas[0],
+        'logins_por_segundo': round(len(latencias) / duracao, 2),
+        'p50_ms': round(latencias[len(latencias) // 2] * 1000, 2),
+        'p95_ms': round(latencias[int(len(latencias) * 0.95) - 1] * 1000, 2),
+        'rejeicao_email_inexistente_ms': round(tempo_rejeicao('ninguem@loja-bench.com') * 1000, 2),
+        'rejeicao_senha_errada_ms': round(tempo_rejeicao('bench0@loja-bench.com') * 1000, 2),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+# benchmarks/pesquisa.py
+# Compara a pesquisa indexada (app/pesquisa.py) com um ILIKE '%...%' sobre a
+# tabela produto, num catálogo gerado com nomes de roupa em português:
+#
+#   python -m benchmarks.pesquisa --produtos 1000000 --saida pesquisa.json
+#
+# Para cada tipo de consulta mede a latência (p50/p95) e quantas consultas
+# encontraram resultados; mede também as sugestões do autocompletar.
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+
+PECAS = ('Calça', 'Camiseta', 'Camisa', 'Tênis', 'Sapato', 'Blusa', 'Saia', 'Vestido', 'Jaqueta', 'Casaco',
+         'Meia', 'Bermuda', 'Boné', 'Mochila', 'Cinto', 'Óculos', 'Relógio', 'Sandália', 'Chinelo', 'Pijama',
+         'Moletom', 'Regata', 'Macacão', 'Suéter', 'Colete', 'Bolsa', 'Carteira', 'Gravata', 'Cachecol', 'Luva')
+DETALHES = ('jeans', 'social', 'esportivo', 'básica', 'estampada', 'listrada', 'algodão', 'couro', 'infantil',
+            'feminina', 'masculina', 'slim', 'oversize', 'linho', 'malha', 'térmica', 'impermeável', 'clássica')
+CORES = ('azul', 'preto', 'branco', 'vermelho', 'verde', 'cinza', 'bege', 'marrom', 'rosa', 'amarelo',
+         'lilás', 'vinho', 'laranja', 'caramelo', 'grafite')
+TAMANHOS = ('PP', 'P', 'M', 'G', 'GG', '36', '38', '40', '42', '44', '46')
+SILABAS = ('ba', 'ca', 'da', 'fe', 'gi', 'lo', 'ma', 'ne', 'po', 'ri', 'sa', 'tu', 'vi', 'xa', 'zo', 'ção', 'lã')
+
+CONSULTAS = {
+    'exata': ('calça jeans', 'camiseta preto', 'tênis branco 42', 'jaqueta couro', 'vestido linho'),
+    'sem_acentos': ('calca', 'tenis branco', 'sueter cinza', 'oculos', 'sandalia caramelo'),
+    'prefixo': ('cam', 'jaq', 'moleto', 'calça je', 'bols'),
+    'com_erro': ('camizeta', 'jaqeta azul', 'sapatu', 'moleton cinza', 'vestdo'),
+}
+
+
+def gerar_nomes(quantidade, aleatorio):
+    # Marcas inventadas alargam o vocabulário, como num catálogo real
+    marcas = sorted({''.join(aleatorio.choice(SILABAS) for _ in range(3)).capitalize() for _ in range(3000)})
+    for _ in range(quantidade):
+        yield ' '.join((
+            aleatorio.choice(PECAS), aleatorio.choice(DETALHES), aleatorio.choice(CORES),
+            aleatorio.choice(marcas), aleatorio.choice(TAMANHOS),
+        ))
+
+
+def medir(funcao, consultas, repeticoes):
+    from benchmarks.comum import percentil
+
+    tempos, encontradas = [], 0
+    for consulta in consultas:
+        for repeticao in range(repeticoes):
+            inicio = time.perf_counter()
+            resultados = funcao(consulta)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        encontradas += bool(resultados)
+    tempos.sort()
+    return {
+        'p50_ms': round(percentil(tempos, 50), 3),
+        'p95_ms': round(percentil(tempos, 95), 3),
+        'consultas_com_resultados': f'{encontradas}/{len(consultas)}',
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Pesquisa indexada contra ILIKE.')
+    parser.add_argument('--produtos', type=int, default=200000, help='Tamanho do catálogo.')
+    parser.add_argument('--repeticoes', type=int, default=5, help='Execuções de cada consulta.')
+    parser.add_argument('--saida', help='Ficheiro JSON de saída (por omissão, stdout).')
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('BCRYPT_LOG_ROUNDS', '4')
+    from benchmarks.comum import criar_app_benchmark, commit_atual
+    from app import db
+    from app.catalogo_io import importar_produtos
+    from app.models import Produto
+    from app.pesquisa import pesquisar, sugestoes
+
+    app = criar_app_benchmark()
+    aleatorio = random.Random(42)
+    with app.app_context():
+        inicio = time.perf_counter()
+        importar_produtos(
+            ((i, {'nome': nome, 'preco': Decimal(aleatorio.randint(1000, 99999)) / 100})
+             for i, nome in enumerate(gerar_nomes(args.produtos, aleatorio))),
+            tamanho_lote=10000,
+        )
+        importacao_s = time.perf_counter() - inicio
+        # Esvazia o WAL deixado pela importação antes de medir as leituras
+        db.session.execute(db.text('PRAGMA wal_checkpoint(TRUNCATE)'))
+        db.session.commit()
+
+        inicio = time.perf_counter()
+        palavras = app.pesquisa._obter().palavras
+        vocabulario_ms = (time.perf_counter() - inicio) * 1000
+
+        def indexada(consulta):
+            return pesquisar(consulta).produtos
+
+        def ilike(consulta):
+            query = Produto.query.with_entities(Produto.id)
+            for palavra in consulta.split():
+                query = query.filter(Produto.nome.ilike(f'%{palavra}%'))
+            return query.order_by(Produto.id).limit(24).all()
+
+        resultado = {
+            'commit': commit_atual(),
+            'parametros': vars(args),
+            'python': sys.version.split()[0],
+            'importacao_s': round(importacao_s, 1),
+            'vocabulario': {'palavras': palavras, 'construcao_ms': round(vocabulario_ms, 1)},
+            'consultas': {},
+        }
+        for tipo, consultas in CONSULTAS.items():
+            resultado['consultas'][tipo] = {
+                'indexada': medir(indexada, consultas, args.repeticoes),
+                'ilike': medir(ilike, consultas, args.repeticoes),
+            }
+        resultado['sugestoes'] = medir(
+            lambda consulta: sugestoes(consulta), ('ca', 'cam', 'calça j', 'mo', 'jaqueta co'), args.repeticoes * 4,
+        )
+        resultado['exemplos'] = {
+            consulta: [p.nome for p in pesquisar(consulta).produtos[:3]]
+            for consulta in ('calca', 'camizeta', 'jaqeta azul')
+        }
+        resultado['exemplos']['sugestoes: cam'] = sugestoes('cam')
+        db.session.remove()
+
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as ficheiro:
+            ficheiro.write(texto + '\n')
+    print(texto)
+
+
+if __name__ == '__main__':
+    main()
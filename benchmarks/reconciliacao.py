@@ -0,0 +1,164 @@
+# benchmarks/reconciliacao.py
+# Reconciliação de muitos pedidos pendentes contra o servidor falso do
+# Mercado Pago (flask mp-fake-server) com latência artificial:
+#
+#   python -m benchmarks.reconciliacao --pedidos 20000 --threads 1,8,32 --latencia 0.05 --saida reconciliacao.json
+#
+# Semeia os pedidos 'Pendente' (com data nas últimas 48 h) e, no servidor
+# falso, pagamentos aprovados e recusados para uma parte deles, como se os
+# webhooks se tivessem perdido. Para cada nível de threads (num processo à
+# parte, com banco e servidor falso próprios) mostra os pedidos reconciliados
+# por segundo; uma segunda execução verifica que nada muda. Termina com
+# código 1 se algum pedido ficar no estado errado.
+import argparse
+import datetime
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+
+def semear_pedidos(app, quantidade, aprovados, recusados, url_mp, lote=5000):
+    """Cria os pedidos pendentes e os pagamentos; devolve os ids que ficam pagos."""
+    import requests
+    from sqlalchemy import String, cast, insert, update
+    from app import db
+    from app.models import Pedido
+    from app.relatorios import recalcular_relatorios
+    from benchmarks.comum import semear_banco
+
+    _, ids_utilizadores = semear_banco(app, produtos=10, utilizadores=100, pedidos_por_utilizador=0)
+    aleatorio = random.Random(42)
+    agora = datetime.datetime.utcnow()
+    with app.app_context():
+        for inicio in range(0, quantidade, lote):
+            db.session.execute(insert(Pedido), [
+                {
+                    'user_id': aleatorio.choice(ids_utilizadores),
+                    'data_pedido': agora - datetime.timedelta(minutes=aleatorio.randint(30, 48 * 60)),
+                    'status': 'Pendente',
+                    'total': 10,
+                    'token': 'bench',
+                }
+                for _ in range(inicio, min(inicio + lote, quantidade))
+            ])
+        db.session.execute(update(Pedido).values(referencia_externa=cast(Pedido.id, String) + '-bench'))
+        db.session.commit()
+        recalcular_relatorios()
+        ids = db.session.scalars(db.select(Pedido.id).order_by(Pedido.id)).all()
+
+    pagamentos, pagos = [], set()
+    for pedido_id in ids:
+        sorteio = aleatorio.random()
+        if sorteio < aprovados:
+            # Alguns tiveram antes um pagamento recusado
+            if sorteio < aprovados / 4:
+                pagamentos.append({'external_reference': f'{pedido_id}-bench', 'status': 'rejected'})
+            pagamentos.append({'external_reference': f'{pedido_id}-bench', 'status': 'approved'})
+            pagos.add(pedido_id)
+        elif sorteio < aprovados + recusados:
+            pagamentos.append({'external_reference': f'{pedido_id}-bench', 'status': 'rejected'})
+    for inicio in range(0, len(pagamentos), lote):
+        requests.post(f'{url_mp}/fake/pagamentos/lote', json=pagamentos[inicio:inicio + lote], timeout=60).raise_for_status()
+    return pagos
+
+
+def executar(threads, args):
+    from benchmarks.checkout_concorrente import porta_livre, esperar_servidor, parar
+
+    porta_mp = porta_livre()
+    url_mp = f'http://127.0.0.1:{porta_mp}'
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    # Lidos pela Config ao criar a aplicação
+    os.environ.update(MP_API_BASE_URL=url_mp, MP_TAMANHO_POOL=str(threads), BCRYPT_LOG_ROUNDS='4')
+    mp_falso = subprocess.Popen(
+        [sys.executable, '-m', 'flask', 'mp-fake-server', '--porta', str(porta_mp), '--latencia', str(args.latencia)],
+        cwd=raiz, env=dict(os.environ, FLASK_APP='wsgi.py', MODO_APP='cli'),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        esperar_servidor(f'{url_mp}/v1/payments/0', mp_falso)
+        from benchmarks.comum import criar_app_benchmark
+        from app import db
+        from app.models import Pedido
+        from app.reconciliacao import reconciliar_pagamentos
+
+        app = criar_app_benchmark()
+        pagos_esperados = semear_pedidos(app, args.pedidos, args.aprovados, args.recusados, url_mp)
+        with app.app_context():
+            agora = datetime.datetime.utcnow()
+            parametros = {'threads': threads, 'taxa': args.taxa, 'tamanho_lote': args.lote}
+            inicio = time.perf_counter()
+            resumo = reconciliar_pagamentos(app.sdk, agora - datetime.timedelta(hours=72), agora, **parametros)
+            segundos = time.perf_counter() - inicio
+            repeticao = reconciliar_pagamentos(app.sdk, agora - datetime.timedelta(hours=72), agora, **parametros)
+            pagos = set(db.session.scalars(db.select(Pedido.id).where(Pedido.status == 'Pago')))
+            db.session.remove()
+    finally:
+        parar(mp_falso)
+
+    return {
+        'segundos': round(segundos, 2),
+        'pedidos_por_segundo': round((resumo['consultados'] + resumo['falhas']) / segundos, 1),
+        'resumo': resumo,
+        'pagos_na_repeticao': repeticao['pagos'],
+        'pagos_esperados': len(pagos_esperados),
+        'pagos_em_falta': len(pagos_esperados - pagos),
+        'pagos_a_mais': len(pagos - pagos_esperados),
+    }
+
+
+def verificar(resultado):
+    falhas = []
+    if resultado['pagos_em_falta'] or resultado['pagos_a_mais']:
+        falhas.append(f"{resultado['pagos_em_falta']} pedidos aprovados ficaram por pagar e "
+                      f"{resultado['pagos_a_mais']} foram pagos sem pagamento aprovado")
+    if resultado['pagos_na_repeticao']:
+        falhas.append(f"a segunda execução voltou a pagar {resultado['pagos_na_repeticao']} pedidos")
+    return falhas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Reconciliação de pedidos pendentes contra o Mercado Pago falso.')
+    parser.add_argument('--pedidos', type=int, default=20000, help='Pedidos pendentes semeados.')
+    parser.add_argument('--aprovados', type=float, default=0.3, help='Fração dos pedidos com pagamento aprovado.')
+    parser.add_argument('--recusados', type=float, default=0.1, help='Fração dos pedidos só com pagamento recusado.')
+    parser.add_argument('--threads', default='1,8,32', help='Níveis de consultas simultâneas, separados por vírgula.')
+    parser.add_argument('--taxa', type=float, default=0, help='Consultas por segundo (0 sem limite).')
+    parser.add_argument('--lote', type=int, default=500, help='Pedidos por lote.')
+    parser.add_argument('--latencia', type=float, default=0.05, help='Latência (s) do Mercado Pago falso.')
+    parser.add_argument('--saida', help='Ficheiro JSON de saída (por omissão, stdout).')
+    parser.add_argument('--interno', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.interno:
+        print(json.dumps(executar(int(args.threads), args)))
+        return
+
+    from benchmarks.comum import commit_atual
+    resultado = {'commit': commit_atual(), 'parametros': vars(args), 'python': sys.version.split()[0], 'threads': {}}
+    falhas = []
+    for threads in args.threads.split(','):
+        comando = [sys.executable, '-m', 'benchmarks.reconciliacao', '--interno', '--threads', threads,
+                   '--pedidos', str(args.pedidos), '--aprovados', str(args.aprovados),
+                   '--recusados', str(args.recusados), '--taxa', str(args.taxa), '--lote', str(args.lote),
+                   '--latencia', str(args.latencia)]
+        saida = subprocess.run(comando, capture_output=True, text=True, check=True).stdout
+        resultado['threads'][threads] = json.loads(saida.strip().splitlines()[-1])
+        falhas.extend(f"{threads} threads: {falha}" for falha in verificar(resultado['threads'][threads]))
+
+    texto = json.dumps(resultado, indent=2)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as ficheiro:
+            ficheiro.write(texto + '\n')
+    print(texto)
+    if falhas:
+        for falha in falhas:
+            print(f"FALHA {falha}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+# benchmarks/storefront.py
+# Benchmark das rotas principais da loja, com o test client do Flask, um SDK
+# do Mercado Pago falso e um SQLite semeado. Escreve o resultado em JSON para
+# comparar execuções entre commits:
+#
+#   python -m benchmarks.storefront --produtos 10000 --pedidos 50 --threads 4 --saida antes.json
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from sqlalchemy import event
+
+CENARIOS = ('homepage', 'cart', 'checkout', 'verificar_pagamento', 'minha_conta', 'webhook')
+
+
+class ContadorConsultas:
+    """Conta as consultas SQL feitas pela thread atual."""
+
+    def __init__(self, engine):
+        self._local = threading.local()
+        event.listen(engine, 'before_cursor_execute', self._contar)
+
+    def _contar(self, *args):
+        self._local.total = getattr(self._local, 'total', 0) + 1
+
+    def zerar(self):
+        self._local.total = 0
+
+    @property
+    def total(self):
+        return getattr(self._local, 'total', 0)
+
+
+class Cenarios:
+    """Cada cenário faz um pedido HTTP; a preparação fica fora da medição."""
+
+    def __init__(self, app, ids_produtos, sdk):
+        self.app = app
+        self.ids_produtos = ids_produtos
+        self.sdk = sdk
+        self._payment_ids = itertools.count(1)
+        self._aleatorio = random.Random(7)
+
+    def preparar(self, nome, cliente, estado):
+        if nome in ('cart', 'checkout'):
+            cliente.post(f'/add_to_cart/{self._aleatorio.choice(self.ids_produtos)}')
+        if nome == 'verificar_pagamento' and 'pedido_id' not in estado:
+            cliente.post(f'/add_to_cart/{self._aleatorio.choice(self.ids_produtos)}')
+            cliente.get('/checkout')
+            from app.models import Pedido
+            with self.app.app_context():
+                estado['pedido_id'] = Pedido.query.filter_by(user_id=estado['user_id']).order_by(Pedido.id.desc()).first().id
+
+    def executar(self, nome, cliente, estado):
+        if nome == 'homepage':
+            return cliente.get('/')
+        if nome == 'cart':
+            return cliente.get('/cart')
+        if nome == 'checkout':
+            return cliente.get('/checkout')
+        if nome == 'verificar_pagamento':
+            return cliente.get(f"/verificar_pagamento/{estado['pedido_id']}")
+        if nome == 'minha_conta':
+            return cliente.get('/minha_conta')
+        if nome == 'webhook':
+            payment_id = str(next(self._payment_ids))
+            return cliente.post('/receber_notificacao_webhook', json={'type': 'payment', 'data': {'id': payment_id}})
+        raise ValueError(nome)
+
+
+def medir_cenario(app, cenarios, contador, nome, ids_utilizadores, threads, repeticoes):
+    latencias = []
+    consultas = []
+    erros = [0]
+    lock = threading.Lock()
+
+    def trabalhar(indice):
+        cliente = app.test_client()
+        user_id = ids_utilizadores[indice % len(ids_utilizadores)]
+        cliente.post('/login', data={'email': f'bench{indice % len(ids_utilizadores)}@loja-bench.com', 'password': 'senha-benchmark'})
+        estado = {'user_id': user_id}
+        for _ in range(repeticoes):
+            cenarios.preparar(nome, cliente, estado)
+            contador.zerar()
+            inicio = time.perf_counter()
+            resposta = cenarios.executar(nome, cliente, estado)
+            duracao = time.perf_counter() - inicio
+            with lock:
+                latencias.append(duracao * 1000)
+                consultas.append(contador.total)
+                if resposta.status_code != 200:
+                    erros[0] += 1
+
+    inicio = time.perf_counter()
+    trabalhadores = [threading.Thread(target=trabalhar, args=(i,)) for i in range(threads)]
+    for trabalhador in trabalhadores:
+        trabalhador.start()
+    for trabalhador in trabalhadores:
+        trabalhador.join()
+    duracao_total = time.perf_counter() - inicio
+
+    # Alocações: uma passagem extra, numa só thread, com o tracemalloc ligado
+    cliente = app.test_client()
+    cliente.post('/login', data={'email': 'bench0@loja-bench.com', 'password': 'senha-benchmark'})
+    estado = {'user_id': ids_utilizadores[0]}
+    cenarios.preparar(nome, cliente, estado)
+    tracemalloc.start()
+    antes = tracemalloc.take_snapshot()
+    cenarios.executar(nome, cliente, estado)
+    depois = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    diferencas = depois.compare_to(antes, 'filename')
+    alocado = sum(d.size_diff for d in diferencas if d.size_diff > 0)
+    blocos = sum(d.count_diff for d in diferencas if d.count_diff > 0)
+
+    from benchmarks.comum import percentil
+    latencias.sort()
+    return {
+        'pedidos': len(latencias),
+        'erros': erros[0],
+        'pedidos_por_segundo': round(len(latencias) / duracao_total, 2),
+        'p50_ms': round(percentil(latencias, 50), 3),
+        'p95_ms': round(percentil(latencias, 95), 3),
+        'p99_ms': round(percentil(latencias, 99), 3),
+        'consultas_por_pedido': round(sum(consultas) / len(consultas), 2),
+        'bytes_alocados': alocado,
+        'blocos_alocados': blocos,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark das rotas da loja.')
+    parser.add_argument('--produtos', type=int, default=1000, help='Tamanho do catálogo.')
+    parser.add_argument('--catalogo', help='CSV/JSONL de produtos a importar em vez do catálogo gerado.')
+    parser.add_argument('--pedidos', type=int, default=20, help='Pedidos já existentes por utilizador.')
+    parser.add_argument('--threads', type=int, default=4, help='Clientes simultâneos.')
+    parser.add_argument('--repeticoes', type=int, default=50, help='Pedidos por cliente em cada cenário.')
+    parser.add_argument('--latencia-sdk', type=float, default=0.0, help='Latência (s) do SDK falso.')
+    parser.add_argument('--cenarios', default=','.join(CENARIOS), help='Cenários a correr, separados por vírgula.')
+    parser.add_argument('--saida', help='Ficheiro JSON de saída (por omissão, stdout).')
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('BCRYPT_LOG_ROUNDS', '4')
+    from benchmarks.comum import criar_app_benchmark, semear_banco, SdkFalso, commit_atual
+    from app import db
+
+    app = criar_app_benchmark(CHECKOUT_IDEMPOTENCIA_JANELA=0)
+    sdk = SdkFalso(latencia=args.latencia_sdk)
+    app.sdk = sdk
+    ids_produtos, ids_utilizadores = semear_banco(
+        app, produtos=args.produtos, utilizadores=args.threads, pedidos_por_utilizador=args.pedidos,
+        caminho_catalogo=args.catalogo,
+    )
+    with app.app_context():
+        contador = ContadorConsultas(db.engine)
+    cenarios = Cenarios(app, ids_produtos, sdk)
+
+    resultado = {
+        'commit': commit_atual(),
+        'parametros': vars(args),
+        'python': sys.version.split()[0],
+        'cenarios': {},
+    }
+    for nome in args.cenarios.split(','):
+        resultado['cenarios'][nome] = medir_cenario(
+            app, cenarios, contador, nome, ids_utilizadores, args.threads, args.repeticoes,
+        )
+
+    texto = json.dumps(resultado, indent=2)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as ficheiro:
+            ficheiro.write(texto + '\n')
+    print(texto)
+
+
+if __name__ == '__main__':
+    main()
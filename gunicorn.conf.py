@@ -0,0 +1,44 @@
+# gunicorn.conf.py
+# Configuração do Gunicorn, lida automaticamente quando é arrancado na raiz do
+# projeto ('gunicorn wsgi:app'). Por omissão fica como antes: workers sync, um
+# pedido de cada vez por worker. Para as rotas que passam o tempo à espera do
+# Mercado Pago e do banco (checkout, webhook, verificar_pagamento):
+#
+#   GUNICORN_WORKER_CLASS=gevent GUNICORN_WORKER_CONNECTIONS=100 gunicorn wsgi:app
+#       greenlets; o psycopg2 e o bcrypt são ajustados por app/cooperativo.py
+#   GUNICORN_WORKER_CLASS=gthread GUNICORN_THREADS=32 gunicorn wsgi:app
+#       threads do sistema, sem dependências extra
+#
+# Medições em benchmarks/checkout_concorrente.py.
+import os
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+if os.environ.get('GUNICORN_BIND'):
+    bind = os.environ['GUNICORN_BIND'].split(',')
+
+# A app é carregada em cada worker, depois de o worker gevent aplicar o monkey
+# patching; carregada antes do fork, o SDK e o banco ficariam com sockets
+# bloqueantes
+preload_app = False
+
+# Pedidos ao mesmo tempo em cada worker: o pool de ligações HTTP ao Mercado
+# Pago acompanha-os (o que for definido no ambiente prevalece). O pool do
+# banco não: o checkout devolve a ligação enquanto espera pelo Mercado Pago.
+if worker_class == 'gevent':
+    _simultaneos = worker_connections
+elif worker_class == 'gthread' or threads > 1:
+    _simultaneos = threads
+else:
+    _simultaneos = 1
+if _simultaneos > 1:
+    os.environ.setdefault('MP_TAMANHO_POOL', str(_simultaneos))
+
+# Os eventos de pagamento (SSE) mantêm a ligação aberta: com workers sync
+# cada separador na página de pagamento prenderia um worker inteiro
+if worker_class in ('gevent', 'gthread'):
+    os.environ.setdefault('PAGAMENTO_SSE', '1')
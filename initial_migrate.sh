@@ -1,2 +1,2 @@
 #!/bin/bash
-flask db upgrade
\ No newline at end of file
+MODO_APP=cli flask db upgrade
\ No newline at end of file
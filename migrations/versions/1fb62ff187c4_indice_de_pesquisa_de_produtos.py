@@ -0,0 +1,61 @@
+"""indice de pesquisa de produtos
+
+Revision ID: 1fb62ff187c4
+Revises: 18ee4ed68136
+Create Date: 2026-10-17 00:33:11.815434
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1fb62ff187c4'
+down_revision = '18ee4ed68136'
+branch_labels = None
+depends_on = None
+
+
+# Índice de pesquisa de produtos (ver app/pesquisa.py): FTS5 mantido por
+# triggers no SQLite; tsvector e trigramas sobre o nome sem acentos no Postgres
+SQLITE = (
+    "CREATE VIRTUAL TABLE produto_fts USING fts5("
+    "nome, content='produto', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE VIRTUAL TABLE produto_fts_vocab USING fts5vocab(produto_fts, row)",
+    "CREATE TRIGGER produto_fts_ai AFTER INSERT ON produto BEGIN "
+    "INSERT INTO produto_fts(rowid, nome) VALUES (new.id, new.nome); END",
+    "CREATE TRIGGER produto_fts_ad AFTER DELETE ON produto BEGIN "
+    "INSERT INTO produto_fts(produto_fts, rowid, nome) VALUES ('delete', old.id, old.nome); END",
+    "CREATE TRIGGER produto_fts_au AFTER UPDATE OF nome ON produto BEGIN "
+    "INSERT INTO produto_fts(produto_fts, rowid, nome) VALUES ('delete', old.id, old.nome); "
+    "INSERT INTO produto_fts(rowid, nome) VALUES (new.id, new.nome); END",
+    "INSERT INTO produto_fts(produto_fts) VALUES ('rebuild')",
+)
+
+POSTGRES = (
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE OR REPLACE FUNCTION loja_unaccent(text) RETURNS text LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT "
+    "AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$",
+    "CREATE INDEX ix_produto_nome_tsv ON produto USING gin (to_tsvector('simple', loja_unaccent(nome)))",
+    "CREATE INDEX ix_produto_nome_trgm ON produto USING gin (loja_unaccent(lower(nome)) gin_trgm_ops)",
+)
+
+
+def upgrade():
+    dialeto = op.get_bind().dialect.name
+    for instrucao in SQLITE if dialeto == 'sqlite' else POSTGRES if dialeto == 'postgresql' else ():
+        op.execute(instrucao)
+
+
+def downgrade():
+    dialeto = op.get_bind().dialect.name
+    if dialeto == 'sqlite':
+        for trigger in ('produto_fts_ai', 'produto_fts_ad', 'produto_fts_au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS produto_fts_vocab")
+        op.execute("DROP TABLE IF EXISTS produto_fts")
+    elif dialeto == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_produto_nome_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_produto_nome_tsv")
+        op.execute("DROP FUNCTION IF EXISTS loja_unaccent(text)")
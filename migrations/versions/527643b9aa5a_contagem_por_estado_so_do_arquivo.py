@@ -0,0 +1,38 @@
+"""contagem por estado so do arquivo
+
+Revision ID: 527643b9aa5a
+Revises: 4a008acc1007
+Create Date: 2026-10-17 01:14:34.768986
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '527643b9aa5a'
+down_revision = '4a008acc1007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Os pedidos ativos passam a contar-se pelo índice de estado; a tabela
+    # fica só com os arquivados
+    op.execute("DELETE FROM contagem_status_pedido")
+    op.execute(
+        "INSERT INTO contagem_status_pedido (status, pedidos) "
+        "SELECT status, COUNT(*) FROM pedido_arquivado GROUP BY status"
+    )
+
+
+def downgrade():
+    # Volta a incluir os pedidos ativos na contagem
+    op.execute("DELETE FROM contagem_status_pedido")
+    op.execute(
+        "INSERT INTO contagem_status_pedido (status, pedidos) "
+        "SELECT status, SUM(pedidos) FROM ("
+        "SELECT status, COUNT(*) AS pedidos FROM pedido GROUP BY status "
+        "UNION ALL SELECT status, COUNT(*) FROM pedido_arquivado GROUP BY status"
+        ") AS t GROUP BY status"
+    )
@@ -0,0 +1,52 @@
+"""ids dos pedidos sem reutilizacao
+
+Revision ID: 707b02493c18
+Revises: b96cba39c141
+Create Date: 2026-10-17 01:26:14.104804
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '707b02493c18'
+down_revision = 'b96cba39c141'
+branch_labels = None
+depends_on = None
+
+
+# (tabela ativa, tabela de arquivo) cujos ids passam para o arquivo
+TABELAS = (
+    ('pedido', 'pedido_arquivado'),
+    ('item_pedido', 'item_pedido_arquivado'),
+    ('historico_status_pedido', 'historico_status_pedido_arquivado'),
+)
+
+
+def _recriar(autoincrement):
+    # Só o SQLite reutiliza ids (max(rowid) + 1); no Postgres as sequências
+    # nunca voltam atrás
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for tabela, _ in TABELAS:
+        with op.batch_alter_table(tabela, recreate='always',
+                                  table_kwargs={'sqlite_autoincrement': autoincrement}):
+            pass
+
+
+def upgrade():
+    _recriar(True)
+    if op.get_bind().dialect.name == 'sqlite':
+        # A sequência começa depois do maior id já usado, também no arquivo
+        for tabela, arquivo in TABELAS:
+            op.execute(f"DELETE FROM sqlite_sequence WHERE name = '{tabela}'")
+            op.execute(
+                f"INSERT INTO sqlite_sequence (name, seq) SELECT '{tabela}', MAX(id) FROM ("
+                f"SELECT MAX(id) AS id FROM {tabela} UNION ALL SELECT MAX(id) FROM {arquivo}"
+                f") AS t HAVING MAX(id) IS NOT NULL"
+            )
+
+
+def downgrade():
+    _recriar(False)
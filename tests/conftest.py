@@ -0,0 +1,68 @@
+# tests/conftest.py
+# Cada teste tem a sua aplicação sobre um SQLite novo (ficheiro, para as
+# threads dos testes de concorrência verem o mesmo banco).
+import os
+import pytest
+
+os.environ.setdefault('MP_ACCESS_TOKEN', 'TEST-testes')
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    from app.config import Config
+    # A Config lê o ambiente quando é importada: os valores do teste entram
+    # diretamente na classe, antes de create_app() os copiar
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'loja.db'}")
+    monkeypatch.setattr(Config, 'BCRYPT_LOG_ROUNDS', 4)
+
+    from app import create_app, db
+    from app.pesquisa import garantir_indice
+    app = create_app('web')
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with app.app_context():
+        db.create_all()
+        garantir_indice()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def criar_utilizador(app):
+    from app import db
+    from app.models import User
+
+    def criar(nome='cliente', senha='senha-teste', is_admin=False):
+        with app.app_context():
+            user = User(username=nome, email=f'{nome}@loja-x.com', password_hash=app.senhas.gerar_hash(senha),
+                        is_admin=is_admin)
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+    return criar
+
+
+@pytest.fixture
+def contar_consultas(app):
+    """Devolve um contador das instruções SQL executadas (lista de SQL)."""
+    from sqlalchemy import event
+    from app import db
+
+    with app.app_context():
+        engine = db.engine
+    instrucoes = []
+
+    def antes(conn, cursor, statement, parameters, context, executemany):
+        instrucoes.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', antes)
+    yield instrucoes
+    event.remove(engine, 'before_cursor_execute', antes)
+
+
+def entrar(cliente, nome='cliente', senha='senha-teste'):
+    resposta = cliente.post('/login', data={'email': f'{nome}@loja-x.com', 'password': senha})
+    assert resposta.status_code == 302
+    return cliente
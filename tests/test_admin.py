@@ -0,0 +1,89 @@
+# tests/test_admin.py
+import re
+import pytest
+from app import db
+from app.models import Pedido
+from tests.conftest import entrar
+
+
+@pytest.fixture
+def admin(app, criar_utilizador):
+    criar_utilizador('admin', is_admin=True)
+    return entrar(app.test_client(), 'admin')
+
+
+def _criar_pedidos(app, quantidade):
+    with app.app_context():
+        db.session.add_all(Pedido(user_id=1, total=1, status='Pendente', token='t') for _ in range(quantidade))
+        db.session.commit()
+
+
+def _ids_da_lista(html):
+    return [int(i) for i in re.findall(r'name="id" type="hidden" value="(\d+)"', html)]
+
+
+def _link_da_pagina(html, pagina):
+    link = re.search(r'href="([^"]*[?&]page=%d[^"]*)"' % pagina, html).group(1)
+    return link.replace('&amp;', '&')
+
+
+def test_lista_de_pedidos_continua_pela_fronteira_do_url(app, admin):
+    _criar_pedidos(app, 25)
+    html = admin.get('/admin/pedido/?page_size=10').get_data(as_text=True)
+    primeira = _ids_da_lista(html)
+    assert primeira == list(range(25, 15, -1))
+    seguinte = _link_da_pagina(html, 1)
+    assert 'depois=16' in seguinte
+
+    # Pedidos novos entre as duas páginas não fazem repetir nem saltar linhas
+    _criar_pedidos(app, 5)
+    html = admin.get(seguinte).get_data(as_text=True)
+    assert _ids_da_lista(html) == list(range(15, 5, -1))
+    # Só o link da página seguinte leva a fronteira nova; o regresso depois
+    # de editar volta à mesma página
+    links = re.findall(r'href="(/admin/pedido/\?[^"]*depois=[^"]*)"', html)
+    assert links and all('page=2' in link and 'depois=6' in link for link in links)
+    assert 'page%3D1%26depois%3D16' in html
+
+
+def test_salto_de_pagina_sem_fronteira_usa_offset(app, admin):
+    _criar_pedidos(app, 25)
+    html = admin.get('/admin/pedido/?page=2&page_size=10').get_data(as_text=True)
+    assert _ids_da_lista(html) == list(range(5, 0, -1))
+
+
+def test_estado_do_pedido_nao_se_edita_no_formulario(app):
+    from app.admin_views import PedidoView
+
+    with app.test_request_context():
+        vista = next(v for v in app.extensions['admin'][0]._views if isinstance(v, PedidoView))
+        formulario = vista.get_form()
+    assert hasattr(formulario, 'total')
+    assert not hasattr(formulario, 'status')
+
+
+def test_acao_do_admin_passa_pela_maquina_de_estados(app, admin):
+    from app.models import HistoricoStatusPedido, Produto, ReservaEstoque
+    from app.pedidos import criar_pedido
+
+    with app.app_context():
+        produto = Produto(nome='Caneca', preco=10, estoque=3)
+        db.session.add(produto)
+        db.session.commit()
+        produto_id = produto.id
+        pendente = criar_pedido(1, [produto], {produto.id: 2}, 'chave', 3600).id
+        pago = criar_pedido(1, [produto], {produto.id: 1}, 'outra', 3600).id
+        db.session.execute(db.update(Pedido).where(Pedido.id == pago).values(status='Pago'))
+        db.session.commit()
+
+    resposta = admin.post('/admin/pedido/action/', data={'action': 'cancelar', 'rowid': [pendente, pago]},
+                          follow_redirects=True)
+    assert "1 pedido(s) passaram a &#39;Cancelado&#39;; 1 ignorado(s)" in resposta.get_data(as_text=True)
+    with app.app_context():
+        assert db.session.get(Pedido, pendente).status == 'Cancelado'
+        assert db.session.get(Pedido, pago).status == 'Pago'
+        historico = db.session.scalars(db.select(HistoricoStatusPedido)).all()
+        assert [(h.pedido_id, h.status_novo, h.origem) for h in historico] == [(pendente, 'Cancelado', 'admin')]
+        # A reserva do pedido cancelado voltou ao estoque
+        assert db.session.get(Produto, produto_id).estoque == 2
+        assert db.session.scalar(db.select(db.func.count()).select_from(ReservaEstoque)) == 1
@@ -0,0 +1,72 @@
+# tests/test_arquivo.py
+import datetime
+from app import db
+from app.models import (HistoricoStatusPedido, ItemPedido, Pedido, PedidoArquivado, ItemPedidoArquivado,
+                        HistoricoStatusPedidoArquivado, Produto)
+from app.arquivo import arquivar_concluidos
+from app.pedidos import criar_pedido, descartar_pedido, historico_pedidos, transitar_status
+from app.relatorios import resumo_vendas
+
+
+def _comprar(user_id, produto, chave, status=None, dias=0):
+    pedido_id = criar_pedido(user_id, [produto], {produto.id: 1}, chave, 3600).id
+    if status:
+        transitar_status([pedido_id], status, 'teste')
+    db.session.execute(
+        db.update(Pedido).where(Pedido.id == pedido_id)
+        .values(data_pedido=datetime.datetime.utcnow() - datetime.timedelta(days=dias))
+    )
+    db.session.commit()
+    return pedido_id
+
+
+def _contagem():
+    return {linha['status']: linha['pedidos'] for linha in resumo_vendas()['status']}
+
+
+def test_arquivar_mantem_historico_e_contagens(app, criar_utilizador):
+    user_id = criar_utilizador()
+    with app.app_context():
+        produto = Produto(nome='Caneca', preco=10)
+        db.session.add(produto)
+        db.session.commit()
+        antigos = [_comprar(user_id, produto, f'antigo-{n}', 'Pago', dias=400) for n in range(3)]
+        cancelado = _comprar(user_id, produto, 'cancelado', 'Cancelado', dias=400)
+        recente = _comprar(user_id, produto, 'recente', 'Pago', dias=1)
+        pendente = _comprar(user_id, produto, 'pendente', dias=400)
+        contagem = _contagem()
+
+        assert arquivar_concluidos(retencao_dias=365, tamanho_lote=2) == 4
+
+        assert set(db.session.scalars(db.select(PedidoArquivado.id))) == {*antigos, cancelado}
+        assert set(db.session.scalars(db.select(Pedido.id))) == {recente, pendente}
+        assert db.session.scalar(db.select(db.func.count()).select_from(ItemPedido)) == 2
+        assert db.session.scalar(db.select(db.func.count()).select_from(ItemPedidoArquivado)) == 4
+        assert db.session.scalar(db.select(db.func.count()).select_from(HistoricoStatusPedidoArquivado)) == 4
+        assert _contagem() == contagem
+
+        pagina = historico_pedidos(user_id, por_pagina=10)
+        assert pagina.total == 6
+        assert [p.id for p in pagina.items] == [recente, pendente, cancelado, *reversed(antigos)]
+        assert all(len(p.itens) == 1 for p in pagina.items)
+
+
+def test_ids_arquivados_nao_sao_reutilizados(app, criar_utilizador):
+    user_id = criar_utilizador()
+    with app.app_context():
+        produto = Produto(nome='Caneca', preco=10)
+        db.session.add(produto)
+        db.session.commit()
+        pago = _comprar(user_id, produto, 'pago', 'Pago', dias=400)
+        # O pedido mais recente é descartado (falha ao criar a preferência)
+        descartar_pedido(_comprar(user_id, produto, 'descartado'))
+        assert arquivar_concluidos(retencao_dias=365) == 1
+        assert db.session.scalar(db.select(db.func.count()).select_from(Pedido)) == 0
+
+        # Com as tabelas ativas vazias, os ids novos continuam depois dos usados
+        novo = _comprar(user_id, produto, 'novo', 'Pago', dias=400)
+        assert novo > pago
+        assert arquivar_concluidos(retencao_dias=365) == 1
+        assert db.session.scalar(db.select(db.func.count()).select_from(ItemPedidoArquivado)) == 2
+        assert db.session.scalar(db.select(db.func.count()).select_from(HistoricoStatusPedidoArquivado)) == 2
+        assert db.session.scalar(db.select(db.func.count()).select_from(HistoricoStatusPedido)) == 0
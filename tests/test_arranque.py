@@ -0,0 +1,14 @@
+# tests/test_arranque.py
+import os
+import pytest
+from benchmarks.arranque import PROIBIDOS, ambiente_arranque, medir, proibidos_carregados
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize('modo', sorted(PROIBIDOS))
+def test_arranque_nao_importa_modulos_adiados(modo):
+    # Um processo novo por modo: os imports dos outros testes não contam
+    _, modulos = medir(modo, ambiente_arranque(RAIZ))
+    assert modulos, 'a saída de -X importtime veio vazia'
+    assert proibidos_carregados(modo, {nome for nome, _, _ in modulos}) == []
@@ -0,0 +1,82 @@
+# tests/test_cache_produtos.py
+from app import db
+from app.models import Produto
+from tests.conftest import entrar
+
+
+def test_carrinho_mostra_o_preco_atual_mesmo_com_o_cache_desatualizado(app, criar_utilizador):
+    from app.cache import ProdutoSnapshot
+
+    criar_utilizador()
+    with app.app_context():
+        produto = Produto(nome='Caneca', preco=10)
+        db.session.add(produto)
+        db.session.commit()
+        produto_id = produto.id
+        # Preço alterado noutro worker: este processo não recebeu a invalidação
+        db.session.execute(db.update(Produto).where(Produto.id == produto_id).values(preco=25))
+        db.session.commit()
+        app.cache_produtos.guardar(produto_id, ProdutoSnapshot(produto_id, 'Caneca', 10, None))
+
+    cliente = entrar(app.test_client())
+    cliente.post(f'/add_to_cart/{produto_id}')
+    html = cliente.get('/cart').get_data(as_text=True)
+    assert 'R$ 25.00' in html
+    assert 'R$ 10.00' not in html
+
+
+def _criar_produto(app, nome='Caneca'):
+    with app.app_context():
+        produto = Produto(nome=nome, preco=10)
+        db.session.add(produto)
+        db.session.commit()
+        return produto.id
+
+
+def test_pagina_inicial_responde_304_com_o_mesmo_etag(app):
+    _criar_produto(app)
+    cliente = app.test_client()
+    primeira = cliente.get('/')
+    assert primeira.status_code == 200
+    etag = primeira.headers['ETag']
+
+    segunda = cliente.get('/', headers={'If-None-Match': etag})
+    assert segunda.status_code == 304
+    assert segunda.headers['ETag'] == etag
+    assert segunda.get_data() == b''
+    assert cliente.get('/', headers={'If-None-Match': '"outro"'}).status_code == 200
+
+
+def test_mensagens_pendentes_nao_usam_a_pagina_guardada(app):
+    _criar_produto(app)
+    cliente = app.test_client()
+    etag = cliente.get('/').headers['ETag']
+
+    with cliente.session_transaction() as sessao:
+        sessao['_flashes'] = [('info', 'Mensagem só para este visitante')]
+    resposta = cliente.get('/', headers={'If-None-Match': etag})
+    assert resposta.status_code == 200
+    assert 'ETag' not in resposta.headers
+    assert 'Mensagem só para este visitante' in resposta.get_data(as_text=True)
+
+    # A mensagem foi mostrada: volta a página guardada, sem ela
+    resposta = cliente.get('/', headers={'If-None-Match': etag})
+    assert resposta.status_code == 304
+
+
+def test_edicao_no_admin_muda_de_geracao(app, criar_utilizador):
+    produto_id = _criar_produto(app)
+    visitante = app.test_client()
+    etag = visitante.get('/').headers['ETag']
+    geracao = app.cache_paginas.geracao
+
+    criar_utilizador('admin', is_admin=True)
+    admin = entrar(app.test_client(), 'admin')
+    resposta = admin.post(f'/admin/produto/edit/?id={produto_id}', data={'nome': 'Caneca azul', 'preco': '10'})
+    assert resposta.status_code == 302
+    assert app.cache_paginas.geracao > geracao
+
+    resposta = visitante.get('/', headers={'If-None-Match': etag})
+    assert resposta.status_code == 200
+    assert resposta.headers['ETag'] != etag
+    assert 'Caneca azul' in resposta.get_data(as_text=True)
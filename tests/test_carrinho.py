@@ -0,0 +1,92 @@
+# tests/test_carrinho.py
+import datetime
+import threading
+from app import db
+from app.models import Carrinho, ItemCarrinho, Produto
+
+
+def criar_produtos(app, quantidade=2):
+    with app.app_context():
+        produtos = [Produto(nome=f'Produto {i}', preco=10) for i in range(quantidade)]
+        db.session.add_all(produtos)
+        db.session.commit()
+        return [p.id for p in produtos]
+
+
+def test_adicoes_simultaneas_nao_se_perdem(app):
+    produto_id, = criar_produtos(app, 1)
+    threads, adicoes = 8, 25
+    erros = []
+    barreira = threading.Barrier(threads)
+
+    def cliente():
+        with app.app_context():
+            barreira.wait()
+            try:
+                for _ in range(adicoes):
+                    app.carrinho.adicionar('u1', produto_id)
+            except Exception as e:
+                erros.append(e)
+            db.session.remove()
+
+    trabalhadores = [threading.Thread(target=cliente) for _ in range(threads)]
+    for trabalhador in trabalhadores:
+        trabalhador.start()
+    for trabalhador in trabalhadores:
+        trabalhador.join()
+
+    assert erros == []
+    with app.app_context():
+        assert app.carrinho.obter('u1') == {produto_id: threads * adicoes}
+        assert app.carrinho.contar('u1') == threads * adicoes
+
+
+def test_definir_remover_e_contagem(app):
+    a, b = criar_produtos(app)
+    with app.app_context():
+        app.carrinho.adicionar('u1', a, 2)
+        app.carrinho.definir('u1', b, 5)
+        app.carrinho.definir('u1', a, 1)
+        assert app.carrinho.contar('u1') == 6
+        app.carrinho.remover('u1', b)
+        assert app.carrinho.obter('u1') == {a: 1}
+        assert app.carrinho.contar('u1') == 1
+        app.carrinho.remover('nao-existe', a)
+        assert db.session.get(Carrinho, 'nao-existe') is None
+
+
+def test_mesclar_ignora_produtos_apagados(app):
+    a, b = criar_produtos(app)
+    with app.app_context():
+        app.carrinho.adicionar('anonimo', a, 2)
+        app.carrinho.adicionar('anonimo', b, 1)
+        app.carrinho.adicionar('u1', a, 1)
+        ItemCarrinho.query.filter_by(produto_id=b).delete()  # Como se o produto tivesse sido apagado
+        db.session.add(ItemCarrinho(chave='anonimo', produto_id=b + 100, quantidade=1))
+        db.session.commit()
+        app.carrinho.mesclar('anonimo', 'u1')
+        assert app.carrinho.obter('u1') == {a: 3}
+        assert app.carrinho.contar('u1') == 3
+        assert db.session.get(Carrinho, 'anonimo') is None
+
+
+def test_adicionar_produto_inexistente_responde_404(app):
+    cliente = app.test_client()
+    assert cliente.post('/add_to_cart/999').status_code == 404
+    with app.app_context():
+        assert ItemCarrinho.query.count() == 0
+
+
+def test_expirar_so_apaga_carrinhos_anonimos_antigos(app):
+    from app.carrinho import expirar_carrinhos_anonimos
+
+    produto_id, = criar_produtos(app, 1)
+    with app.app_context():
+        for chave in ('u7', 'anonimo-antigo', 'ua1b2', 'anonimo-recente'):
+            app.carrinho.adicionar(chave, produto_id)
+        antigo = datetime.datetime.utcnow() - datetime.timedelta(days=31)
+        db.session.execute(db.update(Carrinho).where(Carrinho.chave != 'anonimo-recente').values(atualizado_em=antigo))
+        db.session.commit()
+        assert expirar_carrinhos_anonimos(30, tamanho_lote=1) == 2
+        assert sorted(c.chave for c in Carrinho.query) == ['anonimo-recente', 'u7']
+        assert sorted(i.chave for i in ItemCarrinho.query) == ['anonimo-recente', 'u7']
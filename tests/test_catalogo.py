@@ -0,0 +1,78 @@
+# tests/test_catalogo.py
+import base64
+import json
+from decimal import Decimal
+import pytest
+from app import db
+from app.models import Produto
+
+# Preços e nomes repetidos: a ordem e o cursor desempatam pelo id
+PRODUTOS = [
+    ('Caneca', '10.00'), ('Bloco', '5.50'), ('Caneca', '5.50'), ('Agenda', '10.00'),
+    ('Bloco', '10.00'), ('Caneca', '2.00'), ('Agenda', '5.50'), ('Lápis', '1.00'),
+]
+
+ESPERADO = {
+    'id': lambda p: p[0],
+    'preco': lambda p: (p[2], p[0]),
+    '-preco': lambda p: (-p[2], -p[0]),
+    'nome': lambda p: (p[1], p[0]),
+}
+
+
+@pytest.fixture
+def catalogo(app):
+    app.config['CATALOGO_POR_PAGINA'] = 3
+    with app.app_context():
+        db.session.add_all(Produto(nome=nome, preco=Decimal(preco)) for nome, preco in PRODUTOS)
+        db.session.commit()
+        return [(p.id, p.nome, p.preco) for p in db.session.scalars(db.select(Produto))]
+
+
+def _percorrer(cliente, ordem):
+    ids, paginas, cursor = [], 0, None
+    while True:
+        parametros = {'ordem': ordem} | ({'apos': cursor} if cursor else {})
+        resposta = cliente.get('/api/produtos', query_string=parametros)
+        assert resposta.status_code == 200
+        dados = resposta.get_json()
+        assert dados['ordem'] == ordem
+        ids.extend(p['id'] for p in dados['produtos'])
+        paginas += 1
+        cursor = dados['proximo']
+        if cursor is None:
+            return ids, paginas
+
+
+@pytest.mark.parametrize('ordem', sorted(ESPERADO))
+def test_cursor_percorre_o_catalogo_sem_repetir_nem_saltar(app, catalogo, ordem):
+    ids, paginas = _percorrer(app.test_client(), ordem)
+    assert ids == [p[0] for p in sorted(catalogo, key=ESPERADO[ordem])]
+    assert paginas == 3
+
+
+def test_ordem_desconhecida_usa_a_padrao(app, catalogo):
+    dados = app.test_client().get('/api/produtos?ordem=qualquer').get_json()
+    assert dados['ordem'] == 'id'
+    assert [p['id'] for p in dados['produtos']] == sorted(p[0] for p in catalogo)[:3]
+
+
+def _cursor(valor):
+    return base64.urlsafe_b64encode(json.dumps(valor).encode()).decode().rstrip('=')
+
+
+@pytest.mark.parametrize('ordem, cursor', [
+    ('id', 'não-é-base64!'),
+    ('id', _cursor('texto')),
+    ('id', _cursor([1, 2, 3])),
+    ('id', _cursor(['abc', 1])),
+    ('preco', _cursor(['barato', 1])),
+    ('preco', _cursor([None, 1])),
+    ('preco', _cursor(['NaN', 1])),
+    ('-preco', _cursor(['Infinity', 1])),
+    ('nome', _cursor(['Caneca', 'x'])),
+    ('nome', base64.urlsafe_b64encode(b'\xff\xfe').decode()),
+])
+def test_cursor_adulterado_da_400(app, catalogo, ordem, cursor):
+    resposta = app.test_client().get('/api/produtos', query_string={'ordem': ordem, 'apos': cursor})
+    assert resposta.status_code == 400
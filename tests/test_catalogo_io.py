@@ -0,0 +1,100 @@
+# tests/test_catalogo_io.py
+import pytest
+from app import db
+from app.models import Produto
+
+PRODUTOS = [
+    {'nome': 'Caneca térmica, 500 ml', 'preco': '19.90', 'imagem': 'caneca.jpg'},
+    {'nome': 'Camisola "clássica"', 'preco': '45.00', 'imagem': None},
+    {'nome': 'Bloco A5', 'preco': '0.99', 'imagem': 'bloco.png'},
+]
+
+
+def _produtos(app):
+    with app.app_context():
+        return [
+            (p.id, p.nome, str(p.preco), p.imagem)
+            for p in db.session.scalars(db.select(Produto).order_by(Produto.id))
+        ]
+
+
+@pytest.mark.parametrize('extensao', ['csv', 'jsonl'])
+def test_exportar_e_importar_devolve_o_mesmo_catalogo(app, tmp_path, extensao):
+    with app.app_context():
+        db.session.add_all(Produto(**dados) for dados in PRODUTOS)
+        db.session.commit()
+    antes = _produtos(app)
+    caminho = str(tmp_path / f'catalogo.{extensao}')
+    runner = app.test_cli_runner()
+
+    resultado = runner.invoke(args=['exportar-produtos', caminho])
+    assert resultado.exit_code == 0, resultado.output
+    with app.app_context():
+        db.session.execute(db.delete(Produto))
+        db.session.commit()
+    resultado = runner.invoke(args=['importar-produtos', caminho])
+    assert resultado.exit_code == 0, resultado.output
+    assert '3 lidos, 3 gravados, 0 inválidos' in resultado.output
+    assert _produtos(app) == antes
+
+
+def test_importar_atualiza_pelo_id_e_insere_sem_id(app, tmp_path):
+    with app.app_context():
+        db.session.add(Produto(id=7, nome='Antigo', preco=1))
+        db.session.commit()
+    caminho = tmp_path / 'catalogo.jsonl'
+    caminho.write_text(
+        '{"id": 7, "nome": "Novo", "preco": "2.5"}\n'
+        '{"nome": "Sem id", "preco": 3}\n',
+        encoding='utf-8',
+    )
+    resultado = app.test_cli_runner().invoke(args=['importar-produtos', str(caminho)])
+    assert resultado.exit_code == 0, resultado.output
+    assert _produtos(app) == [(7, 'Novo', '2.50', None), (8, 'Sem id', '3.00', None)]
+
+
+def test_registos_invalidos_sao_indicados_pela_linha(app, tmp_path):
+    caminho = tmp_path / 'catalogo.csv'
+    caminho.write_text(
+        'id,nome,preco,imagem\n'
+        ',Caneca,10,\n'
+        ',Copo,NaN,\n'
+        ',Prato,Infinity,\n'
+        ',Mesa,100000000,\n'
+        f",Jarra,5,{'x' * 201}\n"
+        ',,5,\n'
+        ',Taça,-1,\n'
+        'abc,Garfo,1,\n',
+        encoding='utf-8',
+    )
+    resultado = app.test_cli_runner().invoke(args=['importar-produtos', str(caminho)])
+    assert resultado.exit_code == 0, resultado.output
+    for linha, mensagem in [
+        (3, "preço inválido: 'NaN'"),
+        (4, "preço inválido: 'Infinity'"),
+        (5, 'preço acima de 99999999.99'),
+        (6, 'imagem com mais de 200 caracteres'),
+        (7, 'nome em falta'),
+        (8, 'preço negativo'),
+        (9, "id inválido: 'abc'"),
+    ]:
+        assert f'Linha {linha}: {mensagem}' in resultado.output
+    assert '8 lidos, 1 gravados, 7 inválidos' in resultado.output
+    assert [nome for _, nome, _, _ in _produtos(app)] == ['Caneca']
+
+
+def test_importacao_para_ao_atingir_max_erros(app, tmp_path):
+    caminho = tmp_path / 'catalogo.jsonl'
+    caminho.write_text(
+        '{"nome": "Caneca", "preco": 10}\n'
+        'isto não é JSON\n'
+        '{"nome": "Copo", "preco": "NaN"}\n'
+        '{"nome": "Prato", "preco": 5}\n',
+        encoding='utf-8',
+    )
+    resultado = app.test_cli_runner().invoke(args=['importar-produtos', str(caminho), '--max-erros', '2'])
+    assert resultado.exit_code != 0
+    assert 'Linha 2: JSON inválido' in resultado.output
+    assert 'Importação interrompida: 2 registos inválidos.' in resultado.output
+    # O que foi lido antes do limite fica gravado
+    assert [nome for _, nome, _, _ in _produtos(app)] == ['Caneca']
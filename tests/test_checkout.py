@@ -0,0 +1,104 @@
+# tests/test_checkout.py
+import datetime
+import pytest
+from app import db
+from app.models import Pedido, Produto
+from tests.conftest import entrar
+
+
+class SdkPreferencias:
+    def __init__(self):
+        self.criadas = 0
+
+    def preference(self):
+        return self
+
+    def create(self, dados):
+        self.criadas += 1
+        return {"status": 201, "response": {"id": f"pref-{self.criadas}", **dados}}
+
+
+@pytest.fixture
+def cliente(app, criar_utilizador):
+    app.sdk = SdkPreferencias()
+    criar_utilizador()
+    return entrar(app.test_client())
+
+
+def criar_produto(app, **campos):
+    with app.app_context():
+        produto = Produto(nome='Caneca', preco=10, **campos)
+        db.session.add(produto)
+        db.session.commit()
+        return produto.id
+
+
+def test_carrinho_so_com_produtos_apagados_volta_ao_carrinho(app, cliente):
+    produto_id = criar_produto(app)
+    cliente.post(f'/add_to_cart/{produto_id}')
+    with app.app_context():
+        db.session.execute(db.delete(Produto).where(Produto.id == produto_id))
+        db.session.commit()
+    resposta = cliente.get('/checkout')
+    assert resposta.status_code == 302 and resposta.location.endswith('/cart')
+    with app.app_context():
+        assert Pedido.query.count() == 0
+
+
+def test_segundo_pedido_pendente_com_a_mesma_chave_e_recusado(app, criar_utilizador):
+    from app.pedidos import criar_pedido, PedidoDuplicado
+
+    user_id = criar_utilizador()
+    produto_id = criar_produto(app)
+    with app.app_context():
+        produto = db.session.get(Produto, produto_id)
+        primeiro = criar_pedido(user_id, [produto], {produto_id: 1}, 'chave', 3600)
+        # Como um checkout simultâneo que não viu o primeiro pedido
+        with pytest.raises(PedidoDuplicado) as erro:
+            criar_pedido(user_id, [produto], {produto_id: 1}, 'chave', 3600)
+        assert erro.value.pedido_id == primeiro.id
+        assert Pedido.query.count() == 1
+
+
+def test_pendente_fora_da_janela_expira_e_da_lugar_ao_novo(app, criar_utilizador):
+    from app.pedidos import criar_pedido
+
+    user_id = criar_utilizador()
+    produto_id = criar_produto(app, estoque=5)
+    with app.app_context():
+        produto = db.session.get(Produto, produto_id)
+        antigo = criar_pedido(user_id, [produto], {produto_id: 2}, 'chave', 3600)
+        db.session.execute(db.update(Pedido).values(data_pedido=datetime.datetime.utcnow() - datetime.timedelta(hours=1)))
+        db.session.commit()
+        novo = criar_pedido(user_id, [produto], {produto_id: 2}, 'chave', 3600, janela_idempotencia=1800)
+        assert db.session.get(Pedido, antigo.id).status == 'Expirado'
+        assert db.session.get(Pedido, novo.id).status == 'Pendente'
+        assert db.session.get(Produto, produto_id).estoque == 3  # A reserva do antigo voltou ao estoque
+
+
+def test_checkout_repetido_reutiliza_o_pedido(app, cliente):
+    produto_id = criar_produto(app)
+    cliente.post(f'/add_to_cart/{produto_id}')
+    assert cliente.get('/checkout').status_code == 200
+    cliente.post(f'/add_to_cart/{produto_id}')
+    assert cliente.get('/checkout').status_code == 200
+    cliente.post(f'/add_to_cart/{produto_id}')
+    assert cliente.get('/checkout').status_code == 200
+    with app.app_context():
+        assert Pedido.query.count() == 1
+    assert app.sdk.criadas == 1
+
+
+def test_espera_pela_preferencia_e_limitada(app, criar_utilizador, monkeypatch):
+    import time
+    from app import pedidos
+
+    monkeypatch.setattr(pedidos, 'ESPERA_PREFERENCIA_MAXIMA', 0.3)
+    user_id = criar_utilizador()
+    with app.app_context():
+        pedido = Pedido(user_id=user_id, total=1, status='Pendente', token='t')
+        db.session.add(pedido)
+        db.session.commit()
+        inicio = time.monotonic()
+        assert pedidos.aguardar_preferencia(pedido.id, 60) is None
+        assert time.monotonic() - inicio < 1
@@ -0,0 +1,99 @@
+# tests/test_estoque.py
+import threading
+from app import db
+from app.models import Pedido, Produto, ReservaEstoque
+from app.estoque import EstoqueInsuficiente, produtos_vendidos_a_mais
+from app.pedidos import criar_pedido, transitar_status
+
+ESTOQUE_INICIAL = 40
+THREADS = 8
+TENTATIVAS_POR_THREAD = 10
+
+
+def _criar_produto(app, estoque):
+    with app.app_context():
+        produto = Produto(nome='Caneca', preco=10, estoque=estoque)
+        db.session.add(produto)
+        db.session.commit()
+        return produto.id
+
+
+def test_compras_simultaneas_nao_vendem_a_mais(app, criar_utilizador):
+    user_id = criar_utilizador()
+    produto_id = _criar_produto(app, ESTOQUE_INICIAL)
+    vendidos, recusados, erros = [], [], []
+    partida = threading.Barrier(THREADS)
+
+    def comprar(n):
+        with app.app_context():
+            partida.wait()
+            for tentativa in range(TENTATIVAS_POR_THREAD):
+                produto = db.session.get(Produto, produto_id)
+                try:
+                    pedido = criar_pedido(user_id, [produto], {produto_id: 1}, f'chave-{n}-{tentativa}', 3600)
+                except EstoqueInsuficiente:
+                    recusados.append(n)
+                except Exception as e:
+                    erros.append(e)
+                else:
+                    vendidos.append(pedido.id)
+                finally:
+                    db.session.remove()
+
+    threads = [threading.Thread(target=comprar, args=(n,)) for n in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert erros == []
+    assert len(vendidos) == ESTOQUE_INICIAL
+    assert len(recusados) == THREADS * TENTATIVAS_POR_THREAD - ESTOQUE_INICIAL
+    with app.app_context():
+        assert db.session.get(Produto, produto_id).estoque == 0
+        reservado = db.session.scalar(db.select(db.func.sum(ReservaEstoque.quantidade)))
+        assert reservado == ESTOQUE_INICIAL
+        assert db.session.scalar(db.select(db.func.count()).select_from(Pedido)) == ESTOQUE_INICIAL
+
+
+def test_pagamento_tardio_marca_a_venda_a_mais(app, criar_utilizador, caplog):
+    user_id = criar_utilizador()
+    produto_id = _criar_produto(app, 1)
+    with app.app_context():
+        produto = db.session.get(Produto, produto_id)
+        expirado = criar_pedido(user_id, [produto], {produto_id: 1}, 'chave-1', 3600).id
+        transitar_status([expirado], 'Expirado', 'teste')
+        db.session.commit()
+        # A unidade libertada é vendida a outro pedido antes do pagamento tardio
+        criar_pedido(user_id, [produto], {produto_id: 1}, 'chave-2', 3600)
+        assert produtos_vendidos_a_mais() == []
+
+        with caplog.at_level('WARNING', logger='loja.estoque'):
+            assert transitar_status([expirado], 'Pago', 'teste') == [expirado]
+            db.session.commit()
+
+        assert db.session.get(Produto, produto_id).estoque == -1
+        assert [p.id for p in produtos_vendidos_a_mais()] == [produto_id]
+        assert f'produto {produto_id} com estoque -1' in caplog.text
+
+
+def test_checkout_nao_invalida_caches_nem_pesquisa(app, criar_utilizador):
+    from app.cache import ProdutoSnapshot
+
+    user_id = criar_utilizador()
+    produto_id = _criar_produto(app, 5)
+    with app.app_context():
+        app.cache_produtos.guardar(produto_id, ProdutoSnapshot(produto_id, 'Caneca', 10, None))
+        geracao = app.cache_paginas.geracao
+        app.pesquisa.completar('can')
+        assert not app.pesquisa._desatualizado
+
+        produto = db.session.get(Produto, produto_id)
+        pedido = criar_pedido(user_id, [produto], {produto_id: 1}, 'chave-1', 3600)
+        transitar_status([pedido.id], 'Expirado', 'teste')
+        db.session.commit()
+
+        assert db.session.get(Produto, produto_id).estoque == 5
+        assert app.cache_produtos.obter(produto_id) is not None
+        assert app.cache_paginas.geracao == geracao
+        assert not app.pesquisa._desatualizado
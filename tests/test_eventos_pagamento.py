@@ -0,0 +1,60 @@
+# tests/test_eventos_pagamento.py
+import json
+import threading
+import time
+from tests.conftest import entrar
+
+
+def criar_pedido_pendente(app, user_id):
+    from app import db
+    from app.models import Pedido
+
+    with app.app_context():
+        pedido = Pedido(user_id=user_id, total=10, status='Pendente', token='t', preference_id='pref-1')
+        db.session.add(pedido)
+        db.session.commit()
+        return pedido.id
+
+
+def eventos(texto):
+    return [json.loads(linha[len('data: '):])['status'] for linha in texto.splitlines() if linha.startswith('data: ')]
+
+
+def test_sem_sse_responde_o_estado_e_fecha(app, criar_utilizador):
+    app.config['PAGAMENTO_SSE'] = False
+    pedido_id = criar_pedido_pendente(app, criar_utilizador())
+    cliente = entrar(app.test_client())
+    inicio = time.monotonic()
+    resposta = cliente.get(f'/eventos_pagamento/{pedido_id}')
+    assert eventos(resposta.get_data(as_text=True)) == ['Pendente']
+    assert time.monotonic() - inicio < 1
+
+
+def test_com_sse_entrega_o_estado_publicado(app, criar_utilizador):
+    from app.notificacoes import central_pagamentos, entregar_notificacao
+
+    app.config.update(PAGAMENTO_SSE=True, PAGAMENTO_SSE_DURACAO=10, PAGAMENTO_SSE_INTERVALO_VERIFICACAO=10)
+    pedido_id = criar_pedido_pendente(app, criar_utilizador())
+    cliente = entrar(app.test_client())
+
+    def publicar_quando_assinado():
+        while pedido_id not in central_pagamentos._assinantes:
+            time.sleep(0.01)
+        # Como chega um NOTIFY de outro processo
+        entregar_notificacao(central_pagamentos, json.dumps({'status': 'Pago', 'ids': [pedido_id]}))
+
+    threading.Thread(target=publicar_quando_assinado, daemon=True).start()
+    inicio = time.monotonic()
+    resposta = cliente.get(f'/eventos_pagamento/{pedido_id}')
+    assert eventos(resposta.get_data(as_text=True)) == ['Pendente', 'Pago']
+    assert time.monotonic() - inicio < 5
+
+
+def test_pagina_de_pagamento_so_usa_sse_quando_ligado(app):
+    from flask import render_template
+
+    for ligado in (False, True):
+        with app.test_request_context():
+            html = render_template('pagamento.html', preference_id='p', public_key='k', pedido_id=1, total=1,
+                                   usar_sse=ligado)
+        assert f"if (!{'true' if ligado else 'false'} || !window.EventSource)" in html
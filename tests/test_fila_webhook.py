@@ -0,0 +1,117 @@
+# tests/test_fila_webhook.py
+import datetime
+import pytest
+from app import db
+from app.models import NotificacaoWebhook, Pedido
+
+
+class SdkPagamentos:
+    """payment().get devolve o pagamento registado em `pagamentos`."""
+
+    def __init__(self, pagamentos):
+        self.pagamentos = pagamentos
+
+    def payment(self):
+        return self
+
+    def get(self, payment_id):
+        return {"status": 200, "response": self.pagamentos[payment_id]}
+
+
+def notificar(payment_id):
+    from app.fila_webhook import enfileirar_notificacao
+    return enfileirar_notificacao({'type': 'payment', 'data': {'id': payment_id}})
+
+
+def test_repeticao_pendente_nao_e_enfileirada(app):
+    with app.app_context():
+        assert notificar('1') is not None
+        assert notificar('1') is None
+
+
+def test_notificacao_durante_o_processamento_da_anterior_e_aplicada(app, criar_utilizador):
+    from app.fila_webhook import _reservar_lote, processar_fila
+
+    user_id = criar_utilizador()
+    with app.app_context():
+        pedido = Pedido(user_id=user_id, total=1, status='Pendente', token='t')
+        db.session.add(pedido)
+        db.session.commit()
+        pedido_id = pedido.id
+
+        # Um worker fica com a primeira e consulta o pagamento ainda 'in_process'
+        notificar('1')
+        primeira, = _reservar_lote(10, datetime.datetime.utcnow())
+        # Entretanto o pagamento é aprovado e chega a notificação seguinte
+        assert notificar('1') is not None
+        primeira.status = 'processada'
+        db.session.commit()
+
+        sdk = SdkPagamentos({'1': {'status': 'approved', 'external_reference': f'{pedido_id}-123'}})
+        assert processar_fila(sdk, threads=1)['processadas'] == 1
+        assert db.session.get(Pedido, pedido_id).status == 'Pago'
+
+
+def test_duas_reservas_nao_ficam_com_a_mesma_notificacao(app):
+    from app.fila_webhook import _reservar_lote
+
+    with app.app_context():
+        for payment_id in ('1', '2', '3'):
+            notificar(payment_id)
+        agora = datetime.datetime.utcnow()
+        primeiro = _reservar_lote(10, agora)
+        segundo = _reservar_lote(10, agora)
+        assert len(primeiro) == 3
+        assert segundo == []
+
+
+def test_reserva_volta_a_verificar_o_estado(app):
+    # Simula outro worker a reservar entre o SELECT e o UPDATE
+    from app.fila_webhook import _reservar_lote
+
+    with app.app_context():
+        notificar('1')
+        agora = datetime.datetime.utcnow()
+        original = db.session.scalars
+
+        def escolher_e_ser_ultrapassado(*args, **kwargs):
+            resultado = original(*args, **kwargs)
+            db.session.execute(db.update(NotificacaoWebhook).values(status='processada'))
+            return resultado
+
+        db.session.scalars = escolher_e_ser_ultrapassado
+        try:
+            assert _reservar_lote(10, agora) == []
+        finally:
+            del db.session.scalars
+
+
+def test_erro_do_banco_reagenda_a_notificacao(app, monkeypatch):
+    from app import fila_webhook
+
+    def falhar_no_flush(pedido_ids, status_novo, origem):
+        db.session.add(Pedido())  # Colunas obrigatórias em falta
+        db.session.flush()
+
+    monkeypatch.setattr(fila_webhook, 'transitar_status', falhar_no_flush)
+    with app.app_context():
+        notificar('1')
+        sdk = SdkPagamentos({'1': {'status': 'approved', 'external_reference': '7-123'}})
+        resumo = fila_webhook.processar_fila(sdk, threads=1)
+        assert resumo['reagendadas'] == 1
+        notificacao = NotificacaoWebhook.query.one()
+        assert (notificacao.status, notificacao.tentativas) == ('pendente', 1)
+        assert 'NOT NULL' in notificacao.ultimo_erro
+
+
+@pytest.mark.parametrize('referencia', ['abc-123', 'sem-numero'])
+def test_referencia_invalida_falha_sem_gastar_tentativas(app, referencia):
+    from app.fila_webhook import processar_fila
+
+    with app.app_context():
+        notificar('1')
+        sdk = SdkPagamentos({'1': {'status': 'approved', 'external_reference': referencia}})
+        resumo = processar_fila(sdk, threads=1, max_tentativas=5)
+        assert resumo['falhas'] == 1
+        notificacao = NotificacaoWebhook.query.one()
+        assert (notificacao.status, notificacao.tentativas) == ('falhou', 1)
@@ -0,0 +1,57 @@
+# tests/test_historico_pedidos.py
+import datetime
+import pytest
+from sqlalchemy import insert
+from tests.conftest import entrar
+
+# Instruções SQL de um pedido a /minha_conta (utilizador já em cache): contagem
+# do histórico, ids da página, pedidos, itens, produtos e badge do carrinho
+CONSULTAS_POR_PAGINA = 6
+
+
+def semear_pedidos(app, user_id, quantidade, itens_por_pedido=3):
+    from app import db
+    from app.models import Produto, Pedido, ItemPedido
+
+    with app.app_context():
+        produtos = [Produto(nome=f'Produto {i}', preco=10 + i) for i in range(itens_por_pedido * 2)]
+        db.session.add_all(produtos)
+        db.session.flush()
+        inicio = datetime.datetime(2025, 1, 1)
+        db.session.execute(insert(Pedido), [
+            {'user_id': user_id, 'data_pedido': inicio + datetime.timedelta(hours=i), 'status': 'Pago',
+             'total': 30, 'token': f'token-{i}'}
+            for i in range(quantidade)
+        ])
+        ids = db.session.scalars(db.select(Pedido.id).where(Pedido.user_id == user_id)).all()
+        db.session.execute(insert(ItemPedido), [
+            {'pedido_id': pedido_id, 'produto_id': produtos[(pedido_id + j) % len(produtos)].id,
+             'quantidade': 1, 'preco_unitario': 10}
+            for pedido_id in ids for j in range(itens_por_pedido)
+        ])
+        db.session.commit()
+
+
+@pytest.mark.parametrize('pedidos', [25, 250])
+def test_consultas_por_pagina_nao_dependem_da_pagina_nem_dos_pedidos(app, criar_utilizador, contar_consultas, pedidos):
+    user_id = criar_utilizador()
+    semear_pedidos(app, user_id, pedidos)
+    cliente = entrar(app.test_client())
+    cliente.get('/minha_conta')  # Carrega o utilizador no cache
+
+    ultima = -(-pedidos // app.config['PEDIDOS_POR_PAGINA'])
+    for pagina in (1, 2, ultima):
+        contar_consultas.clear()
+        resposta = cliente.get(f'/minha_conta?pagina={pagina}')
+        assert resposta.status_code == 200
+        assert len(contar_consultas) == CONSULTAS_POR_PAGINA, contar_consultas
+
+
+def test_paginas_seguem_do_mais_recente_para_o_mais_antigo(app, criar_utilizador):
+    user_id = criar_utilizador()
+    semear_pedidos(app, user_id, 12)  # 10 por página: ids 12..3 e depois 2..1
+    cliente = entrar(app.test_client())
+    primeira = cliente.get('/minha_conta?pagina=1').get_data(as_text=True)
+    segunda = cliente.get('/minha_conta?pagina=2').get_data(as_text=True)
+    assert 'Pedido #12<' in primeira and 'Pedido #3<' in primeira and 'Pedido #2<' not in primeira
+    assert 'Pedido #2<' in segunda and 'Pedido #1<' in segunda and 'Pedido #3<' not in segunda
@@ -0,0 +1,23 @@
+# tests/test_instrumentacao.py
+import time
+import pytest
+from flask import g
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app import db
+
+
+def test_consulta_que_falha_nao_desacerta_as_seguintes(app):
+    with app.test_request_context():
+        g.metricas_pedido = {'inicio': time.perf_counter(), 'consultas': 0, 'tempo_bd_ms': 0.0, 'tempo_sdk_ms': 0.0}
+        with db.engine.connect() as conexao:
+            for _ in range(3):
+                with pytest.raises(OperationalError):
+                    conexao.execute(text('SELECT * FROM tabela_que_nao_existe'))
+                conexao.rollback()
+            time.sleep(0.05)
+            conexao.execute(text('SELECT 1'))
+            assert 'inicio_consultas' not in conexao.info
+        # Só a consulta que correu conta, com a sua própria duração
+        assert g.metricas_pedido['consultas'] == 1
+        assert g.metricas_pedido['tempo_bd_ms'] < 40
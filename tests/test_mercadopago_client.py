@@ -0,0 +1,53 @@
+# tests/test_mercadopago_client.py
+import pytest
+import requests
+from app.mercadopago_client import ClienteHttpMercadoPago, DisjuntorCircuito, CircuitoAberto
+
+
+class Resposta:
+    status_code = 200
+    content = b'{}'
+
+    def json(self):
+        return {}
+
+
+def cliente_meio_aberto(request):
+    disjuntor = DisjuntorCircuito(limite_falhas=1, tempo_reabertura=0)
+    disjuntor.registar_falha()
+    assert disjuntor.estado == 'meio-aberto'
+    cliente = ClienteHttpMercadoPago(url_base='http://mp.invalid', disjuntor=disjuntor)
+    cliente.sessao.request = request
+    return cliente
+
+
+@pytest.mark.parametrize('erro', [requests.ConnectionError('rede'), RuntimeError('timeout do gevent')])
+def test_chamada_de_teste_que_falha_liberta_o_estado_meio_aberto(erro):
+    def falhar(*args, **kwargs):
+        raise erro
+
+    cliente = cliente_meio_aberto(falhar)
+    with pytest.raises(type(erro)):
+        cliente.request('GET', 'http://mp.invalid/v1/payments/1')
+    assert cliente.disjuntor._teste_em_curso is False
+    # Passado o tempo de reabertura, outra chamada de teste pode passar
+    cliente.sessao.request = lambda *args, **kwargs: Resposta()
+    assert cliente.request('GET', 'http://mp.invalid/v1/payments/1')['status'] == 200
+    assert cliente.disjuntor.estado == 'fechado'
+
+
+def test_ouvinte_com_erro_nao_prende_o_circuito():
+    cliente = cliente_meio_aberto(lambda *args, **kwargs: Resposta())
+    cliente.ouvintes.append(lambda operacao, duracao_ms: 1 / 0)
+    assert cliente.request('GET', 'http://mp.invalid/v1/payments/1')['status'] == 200
+    assert cliente.disjuntor.estado == 'fechado'
+    assert cliente.disjuntor._teste_em_curso is False
+
+
+def test_circuito_aberto_recusa_sem_chamar():
+    disjuntor = DisjuntorCircuito(limite_falhas=1, tempo_reabertura=60)
+    disjuntor.registar_falha()
+    cliente = ClienteHttpMercadoPago(url_base='http://mp.invalid', disjuntor=disjuntor)
+    cliente.sessao.request = lambda *args, **kwargs: pytest.fail('não devia chamar')
+    with pytest.raises(CircuitoAberto):
+        cliente.request('GET', 'http://mp.invalid/v1/payments/1')
@@ -0,0 +1,22 @@
+# tests/test_mercadopago_fake.py
+import pytest
+from app.mercadopago_fake import criar_servidor_fake
+
+
+@pytest.mark.parametrize('taxa_erro', [-0.1, 1.5, 3])
+def test_taxa_erro_fora_do_intervalo(taxa_erro):
+    with pytest.raises(ValueError):
+        criar_servidor_fake(taxa_erro=taxa_erro)
+
+
+@pytest.mark.parametrize('taxa_erro, esperados', [(0, 0), (1, 200)])
+def test_taxa_erro_nos_extremos(taxa_erro, esperados):
+    cliente = criar_servidor_fake(taxa_erro=taxa_erro).test_client()
+    respostas = [cliente.get('/v1/payments/1').status_code for _ in range(200)]
+    assert respostas.count(503) == esperados
+
+
+def test_taxa_erro_e_a_fracao_das_chamadas_com_503():
+    cliente = criar_servidor_fake(taxa_erro=0.25, semente=7).test_client()
+    respostas = [cliente.get('/v1/payments/1').status_code for _ in range(2000)]
+    assert 400 <= respostas.count(503) <= 600
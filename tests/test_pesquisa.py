@@ -0,0 +1,100 @@
+# tests/test_pesquisa.py
+import pytest
+from app import db
+from app.models import Produto
+from app.pesquisa import incluir_na_migracao, pesquisar, sugestoes
+
+NOMES = ['Calça jeans', 'Camiseta básica', 'Camiseta estampada', 'Camisola de lã', 'Caneca térmica']
+
+
+@pytest.fixture
+def catalogo(app):
+    with app.app_context():
+        db.session.add_all(Produto(nome=nome, preco=10) for nome in NOMES)
+        db.session.commit()
+    return app
+
+
+def _nomes(texto):
+    return sorted(produto.nome for produto in pesquisar(texto).produtos)
+
+
+def _no_indice(palavra):
+    # Diretamente na tabela FTS5, sem passar pelo vocabulário
+    return sorted(db.session.scalars(db.text(
+        "SELECT p.nome FROM produto_fts JOIN produto p ON p.id = produto_fts.rowid "
+        "WHERE produto_fts MATCH :palavra"
+    ), {'palavra': palavra}))
+
+
+def test_pesquisa_ignora_acentos_e_maiusculas(catalogo):
+    with catalogo.app_context():
+        assert _nomes('calca') == ['Calça jeans']
+        assert _nomes('CALÇA') == ['Calça jeans']
+        assert _nomes('termica caneca') == ['Caneca térmica']
+
+
+def test_palavra_com_um_erro_e_corrigida(catalogo):
+    with catalogo.app_context():
+        resultado = pesquisar('camizeta')
+        assert resultado.correcoes == {'camizeta': ['camiseta']}
+        assert sorted(p.nome for p in resultado.produtos) == ['Camiseta básica', 'Camiseta estampada']
+        # Palavras curtas não são corrigidas
+        assert pesquisar('lan').produtos == []
+
+
+def test_ultima_palavra_e_completada(catalogo):
+    with catalogo.app_context():
+        assert sugestoes('cam') == ['camiseta', 'camisola']
+        assert sugestoes('camiseta es') == ['camiseta estampada']
+        assert sugestoes('c') == []
+        assert _nomes('camis') == ['Camiseta básica', 'Camiseta estampada', 'Camisola de lã']
+
+
+def test_triggers_mantem_o_indice_do_banco(app):
+    with app.app_context():
+        # Inserção em massa: não passa pelos eventos do ORM
+        db.session.execute(db.insert(Produto), [{'nome': 'Garrafa azul', 'preco': 5}])
+        db.session.commit()
+        assert _no_indice('garrafa') == ['Garrafa azul']
+
+        db.session.execute(db.update(Produto).values(nome='Garrafa verde'))
+        db.session.commit()
+        assert _no_indice('azul') == []
+        assert _no_indice('verde') == ['Garrafa verde']
+
+        db.session.execute(db.delete(Produto))
+        db.session.commit()
+        assert _no_indice('garrafa') == []
+
+
+def test_commits_do_orm_atualizam_o_vocabulario_sem_o_reconstruir(catalogo, criar_utilizador):
+    from app.pedidos import criar_pedido
+
+    with catalogo.app_context():
+        assert sugestoes('gar') == []
+        vocabulario = catalogo.pesquisa._vocabulario
+        produto = Produto(nome='Garrafa térmica', preco=8, estoque=5)
+        db.session.add(produto)
+        db.session.commit()
+        assert sugestoes('gar') == ['garrafa']
+
+        # Escritas que não mudam nomes de produtos: checkout e utilizadores
+        user_id = criar_utilizador()
+        criar_pedido(user_id, [produto], {produto.id: 1}, 'chave', 3600)
+        assert not catalogo.pesquisa._desatualizado
+        assert not catalogo.pesquisa._a_reconstruir
+        assert catalogo.pesquisa._vocabulario is vocabulario
+
+
+@pytest.mark.parametrize('tipo, nome, incluido', [
+    ('table', 'produto_fts', False),
+    ('table', 'produto_fts_vocab', False),
+    ('table', 'produto_fts_data', False),
+    ('index', 'ix_produto_nome_tsv', False),
+    ('index', 'ix_produto_nome_trgm', False),
+    ('table', 'produto', True),
+    ('index', 'ix_produto_nome_id', True),
+])
+def test_migracao_ignora_o_indice_de_pesquisa(tipo, nome, incluido):
+    assert incluir_na_migracao(None, nome, tipo, True, None) is incluido
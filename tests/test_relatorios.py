@@ -0,0 +1,42 @@
+# tests/test_relatorios.py
+import datetime
+from app import db
+from app.models import ContagemStatusPedido, Pedido, Produto
+from app.arquivo import arquivar_concluidos
+from app.pedidos import criar_pedido, transitar_status
+from app.relatorios import recalcular_relatorios, resumo_vendas
+
+
+def _contagem():
+    return {linha['status']: linha['pedidos'] for linha in resumo_vendas()['status']}
+
+
+def test_contagem_por_estado_sem_contador_no_checkout(app, criar_utilizador):
+    user_id = criar_utilizador()
+    with app.app_context():
+        produto = Produto(nome='Caneca', preco=10, estoque=100)
+        db.session.add(produto)
+        db.session.commit()
+        ids = [
+            criar_pedido(user_id, [produto], {produto.id: 1}, f'chave-{n}', 3600).id
+            for n in range(5)
+        ]
+        # O checkout não escreve na tabela de contagem
+        assert db.session.scalar(db.select(db.func.count()).select_from(ContagemStatusPedido)) == 0
+
+        transitar_status(ids[:3], 'Pago', 'teste')
+        db.session.commit()
+        assert _contagem() == {'Pago': 3, 'Pendente': 2}
+
+        # Os pagos antigos vão para o arquivo; a contagem não muda
+        db.session.execute(
+            db.update(Pedido).where(Pedido.id.in_(ids[:3]))
+            .values(data_pedido=datetime.datetime.utcnow() - datetime.timedelta(days=400))
+        )
+        db.session.commit()
+        assert arquivar_concluidos(retencao_dias=365) == 3
+        assert db.session.get(ContagemStatusPedido, 'Pago').pedidos == 3
+        assert _contagem() == {'Pago': 3, 'Pendente': 2}
+
+        recalcular_relatorios()
+        assert _contagem() == {'Pago': 3, 'Pendente': 2}
@@ -0,0 +1,32 @@
+# tests/test_senhas.py
+from app.senhas import ServicoSenhas
+
+
+def test_hash_ficticio_e_gerado_ao_criar_o_servico(app):
+    servico = ServicoSenhas(rounds=4)
+    hash_ficticio = servico._hash_ficticio.result(5)
+    assert servico.precisa_rehash(hash_ficticio) is False
+
+    chamadas = []
+    original = servico._gerar
+    servico._gerar = lambda senha: chamadas.append(senha) or original(senha)
+    with app.app_context():
+        assert servico.verificar_login(None, 'qualquer') is False
+    # O login com um e-mail desconhecido só verifica: não gera nenhum hash
+    assert chamadas == []
+
+
+def test_sem_antecipar_o_hash_ficticio_nada_corre_no_pool():
+    servico = ServicoSenhas(rounds=4, antecipar_hash_ficticio=False)
+    assert servico._hash_ficticio is None
+    assert servico._executor._threads == set()
+
+    assert servico.verificar_login(None, 'qualquer') is False
+    assert servico.precisa_rehash(servico._hash_ficticio.result(5)) is False
+
+
+def test_comandos_da_cli_nao_geram_o_hash_ficticio(app):
+    from app import create_app
+
+    assert create_app('cli').senhas._hash_ficticio is None
+    assert app.senhas._hash_ficticio is not None